@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+城市边界获取
+按顺序查询多个边界来源，命中即返回：
+1. 本地行政区划边界文件：boundaries/ 目录下的GeoPackage（.gpkg）或GeoJSON（.geojson/.json），
+   读取一次后按名称建立索引，并带有空间索引（按坐标查找所在城市）；
+2. 本地缓存：以前在线查询得到的边界，按规范化后的城市名保存在 boundaries/cache/ 下；
+3. Nominatim在线查询（osmnx，可选）：依次尝试几种查询格式，结果写入本地缓存，之后不再联网。
+离线运行时（offline=True）只使用前两种来源。
+"""
+
+import os
+import json
+import time
+import unicodedata
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import Point, mapping, shape
+from shapely.geometry.base import BaseGeometry
+
+try:
+    import osmnx as ox
+except ImportError:
+    ox = None
+
+BOUNDARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'boundaries')
+CACHE_DIR = os.path.join(BOUNDARY_DIR, 'cache')
+BOUNDARY_EXTENSIONS = ('.gpkg', '.geojson', '.json')
+# 本地边界文件中可能保存城市名的列（按顺序使用存在的列）
+NAME_FIELDS = ('name', 'name_zh', 'NAME', 'city', 'city_name', '市', 'ct_name', 'NAME_2', 'NL_NAME_2')
+# 城市名规范化时去掉的后缀，使“合肥”和“合肥市”对应同一个边界
+NAME_SUFFIXES = ('市',)
+
+
+def is_network_available() -> bool:
+    """osmnx是否可用（在线查询边界需要）"""
+    return ox is not None
+
+
+def normalize_name(city_name: str) -> str:
+    """规范化城市名（全角转半角、去空白、小写、去掉“市”后缀），作为索引和缓存的键"""
+    name = unicodedata.normalize('NFKC', str(city_name)).strip().lower().replace(' ', '')
+    for suffix in NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+class LocalBoundaryProvider:
+    """本地行政区划边界文件（GeoPackage/GeoJSON），首次查询时读取并建立名称索引和空间索引"""
+
+    source = 'local'
+
+    def __init__(self, paths: Iterable[str], name_fields: Iterable[str] = NAME_FIELDS):
+        self.paths = list(paths)
+        self.name_fields = list(name_fields)
+        self._gdf = None
+        self._name_index: Dict[str, int] = {}
+
+    @classmethod
+    def from_dir(cls, boundary_dir: str = BOUNDARY_DIR) -> 'LocalBoundaryProvider':
+        """boundary_dir下的所有边界文件（不含缓存目录）"""
+        paths = []
+        if os.path.isdir(boundary_dir):
+            paths = [os.path.join(boundary_dir, filename) for filename in sorted(os.listdir(boundary_dir))
+                     if filename.lower().endswith(BOUNDARY_EXTENSIONS)]
+        return cls(paths)
+
+    def _load(self) -> gpd.GeoDataFrame:
+        if self._gdf is not None:
+            return self._gdf
+        frames = []
+        for path in self.paths:
+            try:
+                gdf = gpd.read_file(path)
+            except Exception as e:
+                print(f"读取边界文件 {path} 时出错: {e}")
+                continue
+            if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+                gdf = gdf.to_crs(epsg=4326)
+            fields = [field for field in self.name_fields if field in gdf.columns]
+            if not fields:
+                print(f"边界文件 {path} 中没有城市名列（{', '.join(self.name_fields)}），跳过")
+                continue
+            frames.append(gpd.GeoDataFrame({'names': gdf[fields].astype(str).values.tolist()},
+                                           geometry=gdf.geometry.values, crs='EPSG:4326'))
+        self._gdf = (gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs='EPSG:4326') if frames
+                     else gpd.GeoDataFrame({'names': []}, geometry=[], crs='EPSG:4326'))
+
+        # 名称索引：每一行的所有名称列都可以查到该行，先出现的文件和行优先
+        for row, names in enumerate(self._gdf['names']):
+            for name in names:
+                # 空的名称列在pandas 3中astype(str)后仍为NaN
+                if isinstance(name, str) and name and name.lower() not in ('none', 'nan'):
+                    self._name_index.setdefault(normalize_name(name), row)
+        if self.paths:
+            print(f"已加载本地边界 {len(self._gdf)} 个（{len(self._name_index)} 个名称）")
+        return self._gdf
+
+    def get(self, city_name: str) -> Optional[BaseGeometry]:
+        self._load()
+        row = self._name_index.get(normalize_name(city_name))
+        return None if row is None else self._gdf.geometry.iloc[row]
+
+    def locate(self, lat: float, lng: float) -> Optional[str]:
+        """坐标所在的城市名（空间索引查询），不在任何边界内时返回None"""
+        gdf = self._load()
+        if gdf.empty:
+            return None
+        rows = gdf.sindex.query(Point(lng, lat), predicate='intersects')
+        return gdf['names'].iloc[int(rows[0])][0] if len(rows) else None
+
+
+class CacheBoundaryProvider:
+    """以前查询得到的边界的本地缓存，每个城市一个GeoJSON文件，以规范化后的城市名命名"""
+
+    source = 'cache'
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def get_path(self, city_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{normalize_name(city_name)}.geojson")
+
+    def get(self, city_name: str) -> Optional[BaseGeometry]:
+        path = self.get_path(city_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return shape(json.load(f)['geometry'])
+        except Exception as e:
+            print(f"读取边界缓存 {path} 时出错: {e}")
+            return None
+
+    def put(self, city_name: str, geometry: BaseGeometry, source: str) -> str:
+        """写入缓存（先写临时文件再替换），返回缓存路径"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(city_name)
+        feature = {
+            'type': 'Feature',
+            'properties': {'city_name': city_name, 'source': source,
+                           'cached_at': time.strftime("%Y-%m-%d %H:%M:%S")},
+            'geometry': mapping(geometry)
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(feature, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class NominatimBoundaryProvider:
+    """通过osmnx查询Nominatim，依次尝试几种查询格式"""
+
+    source = 'nominatim'
+
+    def __init__(self, pause: float = 1.0):
+        self.pause = pause
+
+    def get(self, city_name: str) -> Optional[BaseGeometry]:
+        if ox is None:
+            print("osmnx不可用，无法在线查询城市边界")
+            return None
+        for query in (f"{city_name}, China", f"{city_name}", f"{city_name}, 中国"):
+            try:
+                print(f"正在查询: {query}")
+                gdf = ox.geocode_to_gdf(query)
+                if gdf is not None and not gdf.empty:
+                    return gdf.geometry.iloc[0]
+                time.sleep(self.pause)  # 避免请求过于频繁
+            except Exception as e:
+                print(f"查询 {query} 失败: {e}")
+        return None
+
+
+class BoundaryProvider:
+    """按顺序查询本地边界文件、本地缓存和（可选的）在线查询，在线查询的结果写入缓存"""
+
+    def __init__(self, local: Optional[LocalBoundaryProvider] = None, cache: Optional[CacheBoundaryProvider] = None,
+                 network: Optional[NominatimBoundaryProvider] = None):
+        self.local = local if local is not None else LocalBoundaryProvider.from_dir()
+        self.cache = cache if cache is not None else CacheBoundaryProvider()
+        self.network = network
+
+    def get(self, city_name: str, offline: bool = False) -> Optional[BaseGeometry]:
+        """城市的边界（Polygon或MultiPolygon），所有来源都没有时返回None"""
+        for provider in (self.local, self.cache):
+            geometry = provider.get(city_name)
+            if geometry is not None and not geometry.is_empty:
+                print(f"{city_name} 的边界来自{provider.source}")
+                return geometry
+        if offline or self.network is None:
+            print(f"本地没有 {city_name} 的边界" + ("（离线模式，不在线查询）" if offline else ""))
+            return None
+        geometry = self.network.get(city_name)
+        if geometry is not None and not geometry.is_empty:
+            path = self.cache.put(city_name, geometry, self.network.source)
+            print(f"{city_name} 的边界已缓存到: {path}")
+            return geometry
+        return None
+
+    def locate(self, lat: float, lng: float) -> Optional[str]:
+        """坐标所在的城市名（只查询本地边界文件）"""
+        return self.local.locate(lat, lng)
+
+
+_default_provider = None
+
+
+def default_provider() -> BoundaryProvider:
+    """默认的边界来源：boundaries/ 下的边界文件、boundaries/cache/ 缓存和Nominatim在线查询"""
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = BoundaryProvider(network=NominatimBoundaryProvider())
+    return _default_provider
+
+
+def get_boundary(city_name: str, offline: bool = False) -> Optional[BaseGeometry]:
+    """用默认的边界来源获取城市边界"""
+    return default_provider().get(city_name, offline)
+
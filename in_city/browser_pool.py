@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+浏览器池
+需要由浏览器截取HTML地图时（png_mode='browser'），整个运行过程共用一组无头Chrome，
+N个浏览器并行截图，而不是每张图启动一个新的Chrome。
+生成的地图HTML中注入渲染完成标记（window.__mapRenderComplete）：地图和所有瓦片图层加载完成并绘制后置为true，
+截图前等待该标记，而不是固定等待5秒+2秒。
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Optional, Tuple
+
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError:
+    webdriver = None
+
+RENDER_FLAG = 'window.__mapRenderComplete'
+DEFAULT_POOL_SIZE = 4
+WINDOW_SIZE = (1920, 1080)
+# 等待渲染完成标记的最长时间（秒），超时后仍然截图
+RENDER_TIMEOUT = 30
+# 没有渲染完成标记的旧HTML，加载完成后的固定等待时间（秒）
+LEGACY_WAIT = 5
+
+
+class RenderSignal(MacroElement):
+    """地图渲染完成标记：地图就绪且所有瓦片图层加载完成（包括加载失败）后，再等两帧绘制置为true"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var pending = 1;
+            """ + RENDER_FLAG + """ = false;
+            function finish() {
+                pending -= 1;
+                if (pending > 0) { return; }
+                requestAnimationFrame(function() {
+                    requestAnimationFrame(function() { """ + RENDER_FLAG + """ = true; });
+                });
+            }
+            map.eachLayer(function(layer) {
+                if (layer instanceof L.GridLayer && layer._loading) {
+                    pending += 1;
+                    layer.once('load', finish);
+                }
+            });
+            map.whenReady(finish);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = 'RenderSignal'
+
+
+def add_render_signal(m: folium.Map) -> folium.Map:
+    """在保存地图前调用，使其脚本在所有图层之后执行"""
+    RenderSignal().add_to(m)
+    return m
+
+
+def is_available() -> bool:
+    """selenium是否可用"""
+    return webdriver is not None
+
+
+class BrowserPool:
+    """共用的无头Chrome池，submit提交的截图由size个浏览器并行完成"""
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, timeout: float = RENDER_TIMEOUT):
+        if webdriver is None:
+            raise ImportError("Selenium不可用，无法使用浏览器池")
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._drivers = queue.Queue()
+        self._started = []
+        # 已启动和正在启动的浏览器数量，在锁内预留，避免并发时启动超过size个
+        self._slots = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='browser')
+        self._futures: List[Tuple[str, Future]] = []
+
+    def _new_driver(self):
+        options = Options()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-extensions')
+        options.add_argument(f'--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}')
+        driver = webdriver.Chrome(options=options)
+        try:
+            driver.set_window_size(*WINDOW_SIZE)
+        except Exception:
+            driver.quit()
+            raise
+        with self._lock:
+            self._started.append(driver)
+        return driver
+
+    def _acquire(self):
+        """取一个空闲的浏览器，不足size个时启动新的"""
+        try:
+            return self._drivers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_start = self._slots < self.size
+            if can_start:
+                self._slots += 1
+        if not can_start:
+            return self._drivers.get()
+        try:
+            return self._new_driver()
+        except Exception:
+            # 启动失败时释放预留的名额
+            with self._lock:
+                self._slots -= 1
+            raise
+
+    def _discard(self, driver) -> None:
+        """出错的浏览器直接关闭，之后按需重新启动"""
+        with self._lock:
+            if driver in self._started:
+                self._started.remove(driver)
+                self._slots -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _wait_rendered(self, driver) -> None:
+        """等待渲染完成标记；没有标记的旧HTML加载完成后固定等待"""
+        WebDriverWait(driver, self.timeout).until(
+            lambda d: d.execute_script("return document.readyState") == 'complete')
+        if driver.execute_script(f"return typeof {RENDER_FLAG} === 'undefined'"):
+            time.sleep(LEGACY_WAIT)
+            return
+        try:
+            WebDriverWait(driver, self.timeout, poll_frequency=0.1).until(
+                lambda d: d.execute_script(f"return {RENDER_FLAG} === true"))
+        except Exception:
+            print(f"等待地图渲染超时（{self.timeout}s），直接截图")
+
+    def screenshot(self, html_path: str, png_path: str) -> bool:
+        """在池中的一个浏览器里打开HTML并截图"""
+        if not os.path.exists(html_path):
+            print(f"HTML文件不存在: {html_path}")
+            return False
+        try:
+            driver = self._acquire()
+        except Exception as e:
+            print(f"启动浏览器失败: {e}")
+            return False
+        try:
+            driver.get(f"file:///{os.path.abspath(html_path).replace(os.sep, '/')}")
+            self._wait_rendered(driver)
+            os.makedirs(os.path.dirname(os.path.abspath(png_path)), exist_ok=True)
+            driver.save_screenshot(png_path)
+        except Exception as e:
+            print(f"截取 {os.path.basename(html_path)} 失败: {e}")
+            self._discard(driver)
+            return False
+        self._drivers.put(driver)
+        print(f"PNG截图已保存到: {png_path}")
+        return True
+
+    def submit(self, html_path: str, png_path: str) -> Future:
+        """提交一张截图，立即返回；结果由wait统一等待"""
+        future = self._executor.submit(self.screenshot, html_path, png_path)
+        self._futures.append((png_path, future))
+        return future
+
+    def wait(self) -> Tuple[int, List[str]]:
+        """等待所有已提交的截图，返回 (成功数量, 失败的PNG路径列表)"""
+        succeeded, failed = 0, []
+        for png_path, future in self._futures:
+            if future.result():
+                succeeded += 1
+            else:
+                failed.append(png_path)
+        self._futures = []
+        return succeeded, failed
+
+    def close(self) -> None:
+        """等待剩余截图并关闭所有浏览器"""
+        self.wait()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            drivers, self._started = self._started, []
+            self._slots = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self) -> 'BrowserPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def screenshot(html_path: str, png_path: str, pool: Optional[BrowserPool] = None) -> bool:
+    """有浏览器池时提交到池中（异步，返回True表示已提交），否则临时启动一个浏览器截图"""
+    if pool is not None:
+        pool.submit(html_path, png_path)
+        return True
+    with BrowserPool(size=1) as single:
+        return single.screenshot(html_path, png_path)
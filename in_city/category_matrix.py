@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+hex × POI类别 稀疏计数矩阵
+每个城市一个矩阵，行为城市网格中的hex（按网格ID排序），列为字典编码后的
+big_type / mid_type / small_type / big_type|mid_type 类别，保存在 xx市_poi_category_matrix.npz 中。
+任意一组hex的类别统计都可以通过对行切片求和得到，而不需要读取POI记录。
+"""
+
+import os
+import json
+import h3
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional
+
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+
+MATRIX_SUFFIX = '_poi_category_matrix.npz'
+GRID_SUFFIX = '_h3_grid.json'
+
+# 列分块：类别名 -> 构造该列取值的POI字段
+BLOCKS = ['big_type', 'mid_type', 'small_type', 'type_pair']
+
+
+def is_available() -> bool:
+    """scipy是否可用"""
+    return sp is not None
+
+
+def get_matrix_path(json_file_path: str) -> str:
+    """根据网格JSON路径得到对应的类别矩阵路径"""
+    directory, filename = os.path.split(json_file_path)
+    city_name = filename[:-len(GRID_SUFFIX)] if filename.endswith(GRID_SUFFIX) else os.path.splitext(filename)[0]
+    return os.path.join(directory, f"{city_name}{MATRIX_SUFFIX}")
+
+
+def type_pairs(big_types: np.ndarray, mid_types: np.ndarray) -> np.ndarray:
+    """生成 "大类|中类" 组合，任一为空时为None"""
+    big = pd.Series(big_types, dtype=object)
+    mid = pd.Series(mid_types, dtype=object)
+    valid = big.notna() & mid.notna() & (big != '') & (mid != '')
+    pairs = pd.Series(None, index=big.index, dtype=object)
+    pairs[valid] = big[valid].astype(str) + '|' + mid[valid].astype(str)
+    return pairs.to_numpy()
+
+
+class CategoryMatrix:
+    """hex × 类别 稀疏计数矩阵"""
+
+    def __init__(self, cells: np.ndarray, matrix, vocab: Dict[str, List[str]], poi_counts: np.ndarray):
+        self.cells = cells
+        self.matrix = matrix.tocsr()
+        self.vocab = vocab
+        self.poi_counts = poi_counts
+
+        self.block_slices = {}
+        offset = 0
+        for block in BLOCKS:
+            size = len(vocab.get(block, []))
+            self.block_slices[block] = slice(offset, offset + size)
+            offset += size
+
+    def column(self, block: str, name: str) -> Optional[int]:
+        """返回某个类别对应的列号，不存在时返回None"""
+        try:
+            return self.block_slices[block].start + self.vocab[block].index(name)
+        except ValueError:
+            return None
+
+    def rows_for(self, h3_ids: List[str]) -> np.ndarray:
+        """返回hex列表对应的行号（不在城市网格中的hex被忽略）"""
+        if not h3_ids:
+            return np.zeros(0, dtype=np.int64)
+        keys = np.array([h3.str_to_int(h) for h in h3_ids], dtype=np.uint64)
+        pos = np.searchsorted(self.cells, keys)
+        pos_clipped = np.minimum(pos, len(self.cells) - 1)
+        found = (pos < len(self.cells)) & (self.cells[pos_clipped] == keys)
+        return pos[found]
+
+    def column_counts(self, block: str, name: str) -> np.ndarray:
+        """每个hex中某个类别的POI数量"""
+        col = self.column(block, name)
+        if col is None:
+            return np.zeros(len(self.cells), dtype=np.int64)
+        return np.asarray(self.matrix[:, col].todense()).ravel()
+
+    def aggregate(self, rows: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """对指定行求和，返回每个分块中非零类别的计数"""
+        totals = np.asarray(self.matrix[rows].sum(axis=0)).ravel()
+        return self.block_counts(totals)
+
+    def block_counts(self, totals: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """把按列的计数向量拆分为每个分块中非零类别的计数"""
+        result = {}
+        for block in BLOCKS:
+            block_totals = totals[self.block_slices[block]]
+            names = self.vocab.get(block, [])
+            result[block] = {names[i]: int(block_totals[i]) for i in np.flatnonzero(block_totals)}
+        return result
+
+    def save(self, path: str) -> None:
+        """保存为npz文件（先写临时文件再替换）"""
+        csr = self.matrix.tocsr()
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            cells=self.cells,
+            data=csr.data,
+            indices=csr.indices,
+            indptr=csr.indptr,
+            shape=np.array(csr.shape),
+            poi_counts=self.poi_counts,
+            vocab=np.array(json.dumps(self.vocab, ensure_ascii=False))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CategoryMatrix':
+        """从npz文件加载"""
+        with np.load(path) as data:
+            matrix = sp.csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+            return cls(data['cells'], matrix, json.loads(str(data['vocab'])), data['poi_counts'])
+
+
+class CategoryMatrixBuilder:
+    """分块累加POI类别计数，最后生成CategoryMatrix"""
+
+    def __init__(self, cells: np.ndarray):
+        self.cells = cells
+        self.vocab = {block: {} for block in BLOCKS}
+        self.poi_counts = np.zeros(len(cells), dtype=np.int64)
+        self.parts = []
+
+    @classmethod
+    def from_matrix(cls, matrix: CategoryMatrix) -> 'CategoryMatrixBuilder':
+        """以已有矩阵为起点继续累加（用于增量更新）"""
+        builder = cls(matrix.cells)
+        builder.poi_counts = matrix.poi_counts.astype(np.int64).copy()
+        for block in BLOCKS:
+            builder.vocab[block] = {name: i for i, name in enumerate(matrix.vocab.get(block, []))}
+
+        coo = matrix.matrix.tocoo()
+        block_of_col = np.zeros(coo.shape[1], dtype=np.int64)
+        local_col = np.zeros(coo.shape[1], dtype=np.int64)
+        for b, block in enumerate(BLOCKS):
+            block_slice = matrix.block_slices[block]
+            block_of_col[block_slice] = b
+            local_col[block_slice] = np.arange(block_slice.stop - block_slice.start)
+        builder.parts.append((block_of_col[coo.col], coo.row.astype(np.int64), local_col[coo.col],
+                              coo.data.astype(np.int64)))
+        return builder
+
+    def _encode(self, block: str, values: np.ndarray) -> np.ndarray:
+        """把类别名编码为该分块内的列号，空值为-1"""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        vocab = self.vocab[block]
+        mapping = np.array([vocab.setdefault(name, len(vocab)) for name in uniques.tolist()] + [-1], dtype=np.int64)
+        return mapping[codes]
+
+    def add(self, cells: np.ndarray, big_types: np.ndarray, mid_types: np.ndarray,
+            small_types: np.ndarray, sign: int = 1) -> None:
+        """累加一批POI（cells为其res7网格ID，必须都在城市网格内），sign为-1时表示减去"""
+        if len(cells) == 0:
+            return
+        rows = np.searchsorted(self.cells, cells)
+        self.poi_counts += sign * np.bincount(rows, minlength=len(self.cells))
+
+        values = {
+            'big_type': big_types,
+            'mid_type': mid_types,
+            'small_type': small_types,
+            'type_pair': type_pairs(big_types, mid_types)
+        }
+        for b, block in enumerate(BLOCKS):
+            cols = self._encode(block, values[block])
+            valid = cols >= 0
+            # 先在本批内按 (行, 列) 合并，减少保存的三元组数量
+            grouped = pd.DataFrame({'row': rows[valid], 'col': cols[valid]}).value_counts()
+            index = grouped.index
+            self.parts.append((
+                np.full(len(grouped), b, dtype=np.int64),
+                index.get_level_values('row').to_numpy(dtype=np.int64),
+                index.get_level_values('col').to_numpy(dtype=np.int64),
+                sign * grouped.to_numpy(dtype=np.int64)
+            ))
+
+    def build(self) -> CategoryMatrix:
+        """生成CategoryMatrix，计数为0的类别列会被去掉"""
+        offsets = {}
+        offset = 0
+        for block in BLOCKS:
+            offsets[block] = offset
+            offset += len(self.vocab[block])
+
+        if self.parts:
+            blocks, rows, cols, data = (np.concatenate(arrays) for arrays in zip(*self.parts))
+            block_offsets = np.array([offsets[block] for block in BLOCKS], dtype=np.int64)
+            cols = block_offsets[blocks] + cols
+        else:
+            rows = cols = data = np.zeros(0, dtype=np.int64)
+
+        matrix = sp.coo_matrix((data, (rows, cols)), shape=(len(self.cells), offset)).tocsr()
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+
+        # 去掉已经没有POI的类别列，并重新编号
+        used = np.flatnonzero(np.asarray(abs(matrix).sum(axis=0)).ravel())
+        names_by_col = []
+        for block in BLOCKS:
+            names_by_col.extend((block, name) for name in self.vocab[block])
+        vocab = {block: [] for block in BLOCKS}
+        for col in used.tolist():
+            block, name = names_by_col[col]
+            vocab[block].append(name)
+
+        return CategoryMatrix(self.cells, matrix[:, used], vocab, self.poi_counts.copy())
+
+
+def load_for_grid(city_data: Dict[str, Any], json_file_path: str) -> Optional[CategoryMatrix]:
+    """加载网格数据中category_matrix指向的矩阵，没有或无法加载时返回None"""
+    matrix_info = city_data.get('category_matrix')
+    if not matrix_info or not is_available():
+        return None
+
+    path = os.path.join(os.path.dirname(json_file_path), matrix_info['path'])
+    try:
+        return CategoryMatrix.load(path)
+    except Exception as e:
+        print(f"加载类别矩阵 {path} 时出错: {e}")
+        return None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+城市网格摘要
+poi_hex 保存网格时同时写出 xx市_hex_summary.json，只包含每个hex的ID、POI数量和中心点（按列保存），
+汇总地图只读取这些摘要文件，不再加载包含全部hex边界和POI信息的网格JSON。
+低缩放级别使用按H3父网格（分辨率5/6）聚合后的摘要，减少绘制的要素数量。
+"""
+
+import os
+import json
+import h3
+import numpy as np
+from typing import Dict, List, Any, Iterator
+
+import grid_geometry
+
+
+SUMMARY_SUFFIX = '_hex_summary.json'
+GRID_SUFFIX = '_h3_grid.json'
+SUMMARY_VERSION = 1
+# 汇总地图的多级显示：分辨率 -> 显示该分辨率的最小缩放级别
+LOD_MIN_ZOOM = {5: 0, 6: 8, 7: 10}
+
+
+def get_summary_path(json_file_path: str) -> str:
+    """根据网格JSON路径得到对应的摘要文件路径"""
+    directory, filename = os.path.split(json_file_path)
+    city_name = filename[:-len(GRID_SUFFIX)] if filename.endswith(GRID_SUFFIX) else os.path.splitext(filename)[0]
+    return os.path.join(directory, f"{city_name}{SUMMARY_SUFFIX}")
+
+
+def build_summary(city_data: Dict[str, Any]) -> Dict[str, Any]:
+    """由网格数据生成摘要：hex ID、POI数量、中心点按列保存，另附城市级的统计"""
+    hexes = city_data.get('hexes', [])
+    poi_counts = [int(hex_info.get('poi_count', 0)) for hex_info in hexes]
+    # 中心点由网格ID一次算出
+    lat, lng = grid_geometry.grid_geometry(city_data).centers()
+    lats = np.round(lat, 6).tolist()
+    lngs = np.round(lng, 6).tolist()
+    return {
+        'version': SUMMARY_VERSION,
+        'city_name': city_data.get('city_name'),
+        'resolution': city_data.get('resolution', 7),
+        'total_hexes': len(hexes),
+        'total_pois': sum(poi_counts),
+        'max_poi_count': max(poi_counts) if poi_counts else 0,
+        'center': [sum(lats) / len(lats), sum(lngs) / len(lngs)] if hexes else None,
+        'h3_index': [hex_info['h3_index'] for hex_info in hexes],
+        'poi_count': poi_counts,
+        'lat': lats,
+        'lng': lngs
+    }
+
+
+def write_summary(json_file_path: str, city_data: Dict[str, Any]) -> str:
+    """写出网格对应的摘要文件（先写临时文件再替换），返回摘要路径"""
+    summary_path = get_summary_path(json_file_path)
+    tmp_path = summary_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(build_summary(city_data), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, summary_path)
+    return summary_path
+
+
+def load_summary(summary_path: str) -> Dict[str, Any]:
+    """加载摘要文件"""
+    try:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"加载摘要文件 {summary_path} 时出错: {e}")
+        return {}
+
+
+def ensure_summary(json_file_path: str) -> Dict[str, Any]:
+    """读取网格的摘要；摘要不存在或比网格旧时由网格重新生成（只在旧数据上发生一次）"""
+    summary_path = get_summary_path(json_file_path)
+    if os.path.exists(summary_path) and os.path.getmtime(summary_path) >= os.path.getmtime(json_file_path):
+        summary = load_summary(summary_path)
+        if summary.get('version') == SUMMARY_VERSION:
+            return summary
+    try:
+        city_data = grid_geometry.load_grid(json_file_path)
+        city_data.setdefault('city_name', os.path.basename(json_file_path).replace(GRID_SUFFIX, ''))
+        summary = build_summary(city_data)
+    except Exception as e:
+        # 单个城市的网格损坏时跳过该城市，不影响汇总地图
+        print(f"加载文件 {json_file_path} 时出错: {e}")
+        return {}
+    print(f"为 {os.path.basename(json_file_path)} 生成摘要文件")
+    write_summary(json_file_path, city_data)
+    return summary
+
+
+def iter_summaries(json_dir: str) -> Iterator[Dict[str, Any]]:
+    """逐个城市读取json_dir中所有网格的摘要（同一时间只有一个城市的摘要在内存中）"""
+    for filename in sorted(os.listdir(json_dir)):
+        if filename.endswith(GRID_SUFFIX) and not filename.startswith('all_cities'):
+            summary = ensure_summary(os.path.join(json_dir, filename))
+            if summary:
+                if not summary.get('city_name'):
+                    summary['city_name'] = filename.replace(GRID_SUFFIX, '')
+                yield summary
+
+
+def aggregate_to_parent(summary: Dict[str, Any], resolution: int) -> Dict[str, Any]:
+    """把摘要中的hex按分辨率为resolution的H3父网格聚合，POI数量求和，中心点为父网格中心"""
+    if resolution >= summary.get('resolution', 7):
+        return {key: summary[key] for key in ('h3_index', 'poi_count', 'lat', 'lng')}
+    parents = [h3.cell_to_parent(h3_index, resolution) for h3_index in summary['h3_index']]
+    unique, inverse = np.unique(np.array(parents, dtype=object), return_inverse=True)
+    counts = np.bincount(inverse, weights=summary['poi_count'], minlength=len(unique)).astype(np.int64)
+    centers = [h3.cell_to_latlng(parent) for parent in unique.tolist()]
+    return {
+        'h3_index': unique.tolist(),
+        'poi_count': counts.tolist(),
+        'lat': [round(lat, 6) for lat, _ in centers],
+        'lng': [round(lng, 6) for _, lng in centers]
+    }
+
+
+def summary_records(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按列保存的摘要转换为hex字典列表（h3_index、poi_count、lat、lng）"""
+    return [{'h3_index': h3_index, 'poi_count': poi_count, 'lat': lat, 'lng': lng}
+            for h3_index, poi_count, lat, lng in zip(summary['h3_index'], summary['poi_count'],
+                                                     summary['lat'], summary['lng'])]
@@ -1,11 +1,14 @@
+import argparse
 import pandas as pd
 import h3
-import json
 import os
-import osmnx as ox
-import geopandas as gpd
-from shapely.geometry import Polygon
-import time
+
+from shapely.ops import unary_union
+
+import boundary_provider
+import grid_geometry
+import grid_manifest
+from hex_coverage import CompactCoverage
 
 
 def get_city_names_from_csv():
@@ -30,37 +33,22 @@ def get_city_names_from_csv():
     return city_names
 
 
-def get_city_boundary(city_name):
-    """获取城市边界"""
+def get_city_boundary(city_name, offline=False):
+    """获取城市边界（本地边界文件 -> 本地缓存 -> Nominatim在线查询，见boundary_provider）"""
     try:
-        # 尝试不同的查询格式
-        query_formats = [
-            f"{city_name}, China",
-            f"{city_name}",
-            f"{city_name}, 中国"
-        ]
-        
-        gdf = None
-        for query in query_formats:
-            try:
-                print(f"正在查询: {query}")
-                gdf = ox.geocode_to_gdf(query)
-                if gdf is not None and not gdf.empty:
-                    break
-                time.sleep(1)  # 避免请求过于频繁
-            except Exception as e:
-                print(f"查询 {query} 失败: {e}")
-                continue
-        
-        if gdf is None or gdf.empty:
+        polygon = boundary_provider.get_boundary(city_name, offline=offline)
+        if polygon is None:
             print(f"无法找到城市 {city_name} 的边界")
             return None
-            
-        polygon = gdf.geometry.iloc[0]
         
-        # 如果是多边形集合，选择面积最大的
-        if hasattr(polygon, 'geom_type') and polygon.geom_type == 'MultiPolygon': # type: ignore
-            polygon = max(polygon.geoms, key=lambda a: a.area) # type: ignore
+        # 多边形集合的所有部分（海岛、飞地等）都保留；几何集合中只保留面状部分
+        if polygon.geom_type == 'GeometryCollection':
+            polygon = unary_union([part for part in polygon.geoms if part.geom_type in ('Polygon', 'MultiPolygon')])
+        if polygon.is_empty or polygon.geom_type not in ('Polygon', 'MultiPolygon'):
+            print(f"城市 {city_name} 的边界不是面状几何")
+            return None
+        if polygon.geom_type == 'MultiPolygon':
+            print(f"城市 {city_name} 的边界包含 {len(polygon.geoms)} 个部分")
         
         return polygon
         
@@ -70,39 +58,26 @@ def get_city_boundary(city_name):
 
 
 def generate_h3_grid(polygon, resolution=7):
-    """为给定的多边形生成H3网格"""
+    """为给定的多边形（Polygon或MultiPolygon的所有部分）生成H3网格
+
+    每个hex只保存网格ID，边界和中心点按需由网格ID计算，见grid_geometry
+    """
     try:
-        # 将polygon转换为H3可识别的格式
+        # 将polygon转换为H3可识别的格式（MultiPolygon转换为LatLngMultiPoly，所有部分一起填充）
         h3shape = h3.geo_to_h3shape(polygon.__geo_interface__)
         
         # 获取覆盖多边形的H3六边形
         hexes = h3.polygon_to_cells(h3shape, resolution)
         
-        hex_data = []
-        for hex_id in hexes:
-            # 获取六边形边界
-            boundary = [(lng, lat) for lat, lng in h3.cell_to_boundary(hex_id)]
-            
-            # 获取六边形中心点
-            center = h3.cell_to_latlng(hex_id)
-            
-            hex_data.append({
-                "h3_index": hex_id,
-                "boundary": boundary,
-                "center": center,
-                "lat": center[0],
-                "lng": center[1]
-            })
-        
-        return hex_data
+        return grid_geometry.make_hexes(sorted(set(hexes)))
         
     except Exception as e:
         print(f"生成H3网格时出错: {e}")
         return []
 
 
-def process_cities():
-    """处理所有城市，生成H3网格"""
+def process_cities(offline=False):
+    """处理所有城市，生成H3网格（offline为True时只使用本地的城市边界，不在线查询）"""
     # 获取所有城市名
     city_names = get_city_names_from_csv()
     print(f"找到 {len(city_names)} 个城市: {city_names}")
@@ -112,7 +87,7 @@ def process_cities():
     json_output_dir = os.path.join(script_dir, "json")
     os.makedirs(json_output_dir, exist_ok=True)
     
-    all_results = {}
+    processed_cities = []
     
     for city_name in city_names:
         print(f"\n正在处理城市: {city_name}")
@@ -120,22 +95,13 @@ def process_cities():
         # 检查是否已经存在该城市的H3网格文件
         city_output_file = os.path.join(json_output_dir, f"{city_name}_h3_grid.json")
         if os.path.exists(city_output_file):
+            # 已有网格不再读取，清单在最后统一检查（只重新读取变化的网格）
             print(f"城市 {city_name} 的H3网格文件已存在，跳过处理")
-            # 读取已存在的文件并加入汇总结果
-            try:
-                with open(city_output_file, "r", encoding="utf-8") as f:
-                    existing_data = json.load(f)
-                    all_results[city_name] = {
-                        "total_hexes": existing_data.get("total_hexes", 0),
-                        "hexes": existing_data.get("hexes", [])
-                    }
-                print(f"已加载 {city_name} 的现有数据：{existing_data.get('total_hexes', 0)} 个H3网格")
-            except Exception as e:
-                print(f"读取现有文件 {city_output_file} 时出错: {e}")
+            processed_cities.append(city_name)
             continue
         
         # 获取城市边界
-        polygon = get_city_boundary(city_name)
+        polygon = get_city_boundary(city_name, offline=offline)
         if polygon is None:
             print(f"跳过城市 {city_name}")
             continue
@@ -148,37 +114,35 @@ def process_cities():
             
             # 保存单个城市的结果
             city_output_file = os.path.join(json_output_dir, f"{city_name}_h3_grid.json")
-            with open(city_output_file, "w", encoding="utf-8") as f:
-                json.dump({
-                    "city_name": city_name,
-                    "total_hexes": len(hex_data),
-                    "resolution": 7,
-                    "hexes": hex_data
-                }, f, ensure_ascii=False, indent=2)
-            
-            all_results[city_name] = {
+            city_data = {
+                "city_name": city_name,
                 "total_hexes": len(hex_data),
-                "hexes": hex_data
+                "resolution": 7,
+                "hexes": hex_data,
+                # 压缩后的混合分辨率网格集合：沿父网格判断点是否在城市内，或直接展开到更细的分辨率
+                "compact_cells": CompactCoverage.from_cells([hex_info['h3_index'] for hex_info in hex_data], 7).to_dict()
             }
+            grid_geometry.save_grid(city_output_file, city_data)
+            
+            # 每个城市完成后立即更新网格清单
+            grid_manifest.update_city(json_output_dir, city_output_file, city_data)
+            processed_cities.append(city_name)
         else:
             print(f"未能为 {city_name} 生成H3网格")
     
-    # 保存所有城市的汇总结果
-    if all_results:
-        summary_file = os.path.join(json_output_dir, "all_cities_h3_summary.json")
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump({
-                "processed_cities": list(all_results.keys()),
-                "total_cities": len(all_results),
-                "generation_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "cities": all_results
-            }, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n处理完成！共处理了 {len(all_results)} 个城市")
+    # 更新网格清单（代替原来的all_cities_h3_summary.json）
+    if processed_cities:
+        manifest = grid_manifest.refresh_manifest(json_output_dir)
+        total_hexes = sum(entry['total_hexes'] for entry in manifest['cities'].values())
+        print(f"\n处理完成！共处理了 {len(processed_cities)} 个城市，清单中共 {total_hexes} 个H3网格")
         print(f"JSON结果保存在: {json_output_dir}")
+        print(f"网格清单: {grid_manifest.get_manifest_path(json_output_dir)}")
     else:
         print("没有成功处理任何城市")
 
 
 if __name__ == "__main__":
-    process_cities()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="为每个城市生成H3网格")
+    parser.add_argument('--offline', action='store_true', help="只使用本地边界文件和缓存，不在线查询城市边界")
+    args = parser.parse_args()
+    process_cities(offline=args.offline)
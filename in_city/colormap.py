@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+POI密度配色
+一次为整个城市（或汇总地图的一个显示级别）的所有hex计算颜色：POI数量数组按缩放方式归一化后查颜色表，
+得到#rrggbb颜色数组。缩放的分段值（breaks）在创建ColorScale时计算一次，HTML图例、PNG图例和瓦片渲染共用，
+保证同一张地图上各处的颜色和图例一致。
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# linear: 线性；sqrt: 平方根（拉开低密度之间的颜色差距，默认）；log: log(1+x)；quantile: 按非零POI数量的分位数分档
+SCALES = ('linear', 'sqrt', 'log', 'quantile')
+DEFAULT_SCALE = 'sqrt'
+QUANTILE_CLASSES = 7
+LUT_SIZE = 256
+# 没有POI数据（最大POI数量为0）时的颜色
+EMPTY_COLOR = '#444444'
+# 颜色方案: 深灰 -> 黄 -> 白，适配深色底图
+RAMP = ((0.0, (0x44, 0x44, 0x44), '深灰', '最低密度'),
+        (0.5, (0xff, 0xff, 0x00), '黄色', '中等密度'),
+        (1.0, (0xff, 0xff, 0xff), '白色', '最高密度'))
+# HTML图例中显示的归一化位置（从高到低）
+LEGEND_POSITIONS = (1.0, 0.75, 0.5, 0.25, 0.0)
+
+
+def check_scale(scale: str) -> None:
+    if scale not in SCALES:
+        raise ValueError(f"未知的颜色缩放方式: {scale}，可选: {', '.join(SCALES)}")
+
+
+@lru_cache(maxsize=None)
+def color_lut(size: int = LUT_SIZE) -> np.ndarray:
+    """颜色表：归一化位置 i/(size-1) 对应的#rrggbb颜色"""
+    positions = np.linspace(0.0, 1.0, size)
+    stops = [stop[0] for stop in RAMP]
+    channels = [np.interp(positions, stops, [stop[1][c] for stop in RAMP]).astype(np.int64) for c in range(3)]
+    return np.array([f'#{r:02x}{g:02x}{b:02x}' for r, g, b in zip(*channels)])
+
+
+class ColorScale:
+    """一组POI数量的颜色缩放：归一化参数和分段值在创建时计算一次
+
+    vmax不为None时按该值归一化（如多张地图共用同一个最大值），否则取counts的最大值
+    """
+
+    def __init__(self, counts: Sequence[float], scale: str = DEFAULT_SCALE, vmax: Optional[float] = None,
+                 classes: int = QUANTILE_CLASSES, lut_size: int = LUT_SIZE):
+        check_scale(scale)
+        counts = np.asarray(counts, dtype=np.float64)
+        self.scale = scale
+        self.vmax = float(counts.max()) if vmax is None and len(counts) else float(vmax or 0)
+        self.lut = color_lut(lut_size)
+        # 分位数分档的边界（非零POI数量的分位数，0单独为最低一档）
+        self.edges = None
+        if scale == 'quantile':
+            positive = counts[counts > 0]
+            quantiles = np.quantile(positive, np.linspace(0, 1, classes + 1)[1:-1]) if len(positive) else []
+            self.edges = np.unique(np.concatenate([[0.0, 1.0], quantiles, [max(self.vmax, 1.0)]]))
+        self.breaks = self.values_at(LEGEND_POSITIONS)
+
+    def normalize(self, counts: Sequence[float]) -> np.ndarray:
+        """POI数量归一化到 [0, 1]"""
+        counts = np.clip(np.asarray(counts, dtype=np.float64), 0, None)
+        if self.vmax <= 0:
+            return np.zeros(len(counts))
+        if self.scale == 'linear':
+            ratio = counts / self.vmax
+        elif self.scale == 'sqrt':
+            ratio = np.sqrt(counts / self.vmax)
+        elif self.scale == 'log':
+            ratio = np.log1p(counts) / np.log1p(self.vmax)
+        else:
+            classes = len(self.edges) - 1
+            ratio = np.searchsorted(self.edges[1:-1], counts, side='right') / max(classes - 1, 1)
+        return np.clip(ratio, 0.0, 1.0)
+
+    def values_at(self, positions: Sequence[float]) -> np.ndarray:
+        """归一化位置对应的POI数量（normalize的逆），用于图例"""
+        positions = np.asarray(positions, dtype=np.float64)
+        if self.scale == 'linear':
+            return positions * self.vmax
+        if self.scale == 'sqrt':
+            return positions ** 2 * self.vmax
+        if self.scale == 'log':
+            return np.expm1(positions * np.log1p(self.vmax))
+        classes = len(self.edges) - 1
+        return self.edges[np.rint(positions * max(classes - 1, 1)).astype(np.int64).clip(0, classes - 1)]
+
+    def colors(self, counts: Sequence[float]) -> np.ndarray:
+        """POI数量数组对应的#rrggbb颜色数组"""
+        if self.vmax <= 0:
+            return np.full(len(counts), EMPTY_COLOR)
+        return self.lut[np.rint(self.normalize(counts) * (len(self.lut) - 1)).astype(np.int64)]
+
+    def legend_entries(self) -> List[Tuple[str, str]]:
+        """图例的 (颜色, POI数量) 列表，从高到低"""
+        colors = self.lut[np.rint(np.asarray(LEGEND_POSITIONS) * (len(self.lut) - 1)).astype(np.int64)]
+        entries = []
+        for color, value in zip(colors, self.breaks):
+            label = f"≥ {value:.0f}" if value > 0 else '0'
+            if not entries or entries[-1][1] != label:
+                entries.append((str(color), label))
+        return entries
+
+    def legend_lines(self) -> List[str]:
+        """PNG图例的文字行（颜色名 = 密度 (POI数量)）"""
+        values = self.values_at([stop[0] for stop in RAMP])
+        return [f"{name} = {level} ({value:.0f})" for (_, _, name, level), value in zip(RAMP[::-1], values[::-1])]
+
+    def legend_html(self, extra_lines: Sequence[str] = ()) -> str:
+        """地图右上角的图例：每个分段一个色块和对应的POI数量"""
+        rows = ''.join(
+            f'    <p style="margin: 0; font-size: 14px;"><span style="display: inline-block; width: 12px; height: 12px; '
+            f'background: {color}; margin-right: 6px;"></span>POI {label}</p>\n'
+            for color, label in self.legend_entries()
+        )
+        rows += ''.join(f'    <p style="margin: 0; font-size: 14px;">{line}</p>\n' for line in extra_lines)
+        return f'''
+<div style="position: fixed; top: 10px; right: 10px; z-index: 9999; background-color: rgba(0, 0, 0, 0.7); padding: 10px; border-radius: 5px; color: white;">
+    <h4 style="margin: 0; font-size: 16px;">图例（{self.scale}）</h4>
+{rows}</div>
+'''
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑hex图层（render_mode='compact'）
+HTML中只嵌入网格ID（uint64）、颜色索引和数值列几个base64编码的数组，hex边界由浏览器中的
+static/h3_boundary.js（与H3 cellToBoundary相同的算法）计算，Python端不再计算或复制任何hex边界坐标。
+该脚本内联到地图HTML中，同一张地图只嵌入一次，HTML不依赖外部文件。
+"""
+
+import os
+import base64
+import h3
+import numpy as np
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple, Union
+
+import folium
+from branca.element import Element
+from folium.map import Layer
+from jinja2 import Template
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+H3_SCRIPT_PATH = os.path.join(STATIC_DIR, 'h3_boundary.js')
+
+Column = Tuple[str, Sequence[Any]]
+
+_h3_script = None
+
+
+def h3_script() -> str:
+    """浏览器端H3边界计算脚本的内容"""
+    global _h3_script
+    if _h3_script is None:
+        with open(H3_SCRIPT_PATH, 'r', encoding='utf-8') as f:
+            _h3_script = f.read()
+    return _h3_script
+
+
+def cell_array(h3_indices: Union[np.ndarray, Iterable[Union[str, int]]]) -> np.ndarray:
+    """网格ID（字符串或整数）转换为uint64数组"""
+    if isinstance(h3_indices, np.ndarray) and h3_indices.dtype == np.uint64:
+        return h3_indices
+    return np.array([h3.str_to_int(h) if isinstance(h, str) else int(h) for h in h3_indices], dtype=np.uint64)
+
+
+def encode_array(values: np.ndarray) -> str:
+    """数组按小端字节序编码为base64字符串"""
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+
+def _index_type(size: int) -> str:
+    return 'uint8' if size <= 256 else 'uint16' if size <= 65536 else 'uint32'
+
+
+def encode_lookup(values: Sequence[Any]) -> Dict[str, Any]:
+    """重复较多的值（颜色、城市名等）编码为查找表 + 索引数组"""
+    table, index = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    index_type = _index_type(len(table))
+    return {'lookup': table.tolist(), 'values': encode_array(index.astype(index_type)), 'type': index_type}
+
+
+def encode_column(values: Sequence[Any]) -> Dict[str, Any]:
+    """一列数值编码为对应类型的数组，字符串列编码为查找表"""
+    array = np.asarray(values)
+    if array.dtype.kind in 'iub':
+        if len(array) == 0 or (array.min() >= 0 and array.max() < 2 ** 32):
+            array = array.astype(np.uint32)
+        else:
+            array = array.astype(np.int32)
+    elif array.dtype.kind == 'f':
+        array = array.astype(np.float64)
+    else:
+        return encode_lookup(values)
+    return {'lookup': None, 'values': encode_array(array), 'type': array.dtype.name}
+
+
+class CompactHexLayer(Layer):
+    """由网格ID数组在浏览器中生成的hex图层（Canvas绘制），可加入LayerControl和按缩放级别切换
+
+    marker为True时每个网格绘制为中心点上的圆点标记，而不是hex多边形
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var cells = h3Boundary.decodeCells({{ this.cells|tojson }});
+            var colors = {{ this.colors|tojson }};
+            colors.index = h3Boundary.decodeValues(colors.values, colors.type);
+            var columns = {{ this.columns|tojson }};
+            columns.forEach(function(column) {
+                column.array = h3Boundary.decodeValues(column.values, column.type);
+            });
+            var style = {{ this.style|tojson }};
+            var childRes = {{ this.children_res|tojson }};
+            var renderer = L.canvas();
+
+            function cellId(n) {
+                return cells[2 * n].toString(16) + ('00000000' + cells[2 * n + 1].toString(16)).slice(-8);
+            }
+            function describe(n, withId) {
+                var lines = withId ? ['H3 ID: ' + cellId(n)] : [];
+                columns.forEach(function(column) {
+                    var value = column.array[n];
+                    lines.push(column.label + ': ' + (column.lookup ? column.lookup[value] : value));
+                });
+                return lines.join('<br>');
+            }
+
+            var edges = {{ this.edge_colors|tojson }};
+            if (edges) { edges.index = h3Boundary.decodeValues(edges.values, edges.type); }
+            var radii = {{ this.radii|tojson }};
+            if (radii) { radii.array = h3Boundary.decodeValues(radii.values, radii.type); }
+
+            var layers = [];
+            for (var n = 0; n < cells.length / 2; n++) {
+                var hi = cells[2 * n], lo = cells[2 * n + 1];
+                var color = colors.lookup[colors.index[n]];
+                var options = L.Util.extend({color: edges ? edges.lookup[edges.index[n]] : color}, style,
+                                            {fillColor: color, renderer: renderer});
+                var shape;
+                {%- if this.marker %}
+                if (radii) { options.radius = radii.array[n]; }
+                shape = L.circleMarker(h3Boundary.cellToLatLng(hi, lo), options);
+                {%- else %}
+                var rings = childRes === null ? h3Boundary.cellToBoundary(hi, lo)
+                    : h3Boundary.cellToChildren(hi, lo, childRes).map(function(child) {
+                        return [h3Boundary.cellToBoundary(child[0], child[1])];
+                    });
+                shape = L.polygon(rings, options);
+                {%- endif %}
+                shape.cellIndex = n;
+                {%- if this.tooltip %}
+                shape.bindTooltip(function(layer) { return describe(layer.cellIndex, false); }, {sticky: true});
+                {%- endif %}
+                {%- if this.popup %}
+                shape.bindPopup(function(layer) { return describe(layer.cellIndex, true); });
+                {%- endif %}
+                layers.push(shape);
+            }
+            return L.featureGroup(layers);
+        })();
+        {%- if this.show %}
+        {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {%- endif %}
+        {% endmacro %}
+    """)
+
+    def __init__(self, cells: np.ndarray, colors: Dict[str, Any], columns: List[Dict[str, Any]],
+                 style: Dict[str, Any], children_res: Optional[int] = None, name: Optional[str] = None,
+                 tooltip: bool = True, popup: bool = True, show: bool = True, marker: bool = False,
+                 edge_colors: Optional[Dict[str, Any]] = None, radii: Optional[Dict[str, Any]] = None):
+        super().__init__(name=name, overlay=True, control=name is not None, show=show)
+        self._name = 'CompactHexLayer'
+        self.cells = encode_array(cells)
+        self.colors = colors
+        self.columns = columns
+        self.style = style
+        self.children_res = children_res
+        self.tooltip = tooltip
+        self.popup = popup
+        self.marker = marker
+        self.edge_colors = edge_colors
+        self.radii = radii
+
+    def render(self, **kwargs):
+        # 边界计算脚本放在页面头部，同一张地图只加入一次
+        self.get_root().header.add_child(Element(f"<script>{h3_script()}</script>"), name='h3_boundary_js')
+        super().render(**kwargs)
+
+
+def add_compact_layer(m: folium.Map, h3_indices: Union[np.ndarray, Iterable[Union[str, int]]],
+                      colors: Union[str, Sequence[str]], style: Dict[str, Any],
+                      columns: Optional[Sequence[Column]] = None, name: Optional[str] = None,
+                      children_res: Optional[int] = None, popup: bool = True, marker: bool = False,
+                      edge_colors: Optional[Sequence[str]] = None,
+                      radius: Optional[Sequence[float]] = None) -> Optional[CompactHexLayer]:
+    """把一组hex作为一个紧凑图层加入地图
+
+    colors为统一的填充色或与h3_indices对应的颜色列表；style为Leaflet路径样式（weight、fillOpacity等，
+    不指定color时边框与填充同色）；columns为 (显示名, 值列表) 列表，显示在tooltip和popup中；
+    children_res不为None时h3_indices为父网格，浏览器中展开为该分辨率的子网格，每个父网格绘制为一个多边形组；
+    marker为True时绘制为网格中心的圆点标记，edge_colors、radius为每个网格的边框颜色和标记半径（像素）
+    """
+    cells = cell_array(h3_indices)
+    if len(cells) == 0:
+        return None
+    if isinstance(colors, str):
+        colors = [colors] * len(cells)
+    layer = CompactHexLayer(
+        cells,
+        encode_lookup(colors),
+        [{'label': label, **encode_column(values)} for label, values in (columns or [])],
+        style,
+        children_res=children_res,
+        name=name,
+        tooltip=bool(columns),
+        popup=popup,
+        marker=marker,
+        edge_colors=encode_lookup(edge_colors) if edge_colors is not None else None,
+        radii=encode_column(radius) if radius is not None else None
+    )
+    layer.add_to(m)
+    return layer
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+in_city测试共用的数据：合肥市中心附近的一小块res7网格，以及落在其中的高德（GCJ-02）POI
+"""
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+import coord_transform
+import csv_converter
+import grid_geometry
+
+CENTER = (31.8206, 117.2272)  # 合肥市中心 (lat, lng)
+RESOLUTION = 7
+
+# (bigType, midType, smallType, 名称后缀)，其中前两个满足商场分类规则
+POI_TYPES = [
+    ('购物服务', '商场', '购物中心', '购物中心'),
+    ('购物服务', '超级市场', '超市', '超市'),
+    ('餐饮服务', '中餐厅', '中餐厅', '饭店'),
+    ('餐饮服务', '快餐厅', '快餐厅', '快餐'),
+    ('生活服务', '美容美发店', '美容美发店', '理发店'),
+    ('科教文化服务', '学校', '中学', '中学'),
+]
+
+
+def grid_cells(k: int = 1):
+    """城市网格的网格ID（字符串，已排序）"""
+    return sorted(h3.grid_disk(h3.latlng_to_cell(*CENTER, RESOLUTION), k))
+
+
+def make_city_grid(cells) -> dict:
+    return {'city_name': '合肥市', 'resolution': RESOLUTION, 'hexes': grid_geometry.make_hexes(cells)}
+
+
+def gcj_location(lat: float, lng: float) -> str:
+    """WGS-84坐标转换为高德CSV中的location字符串（"lng,lat"，GCJ-02）"""
+    gcj_lng, gcj_lat = coord_transform.wgs84_to_gcj02(np.array([lng]), np.array([lat]))
+    return f"{gcj_lng[0]:.6f},{gcj_lat[0]:.6f}"
+
+
+def make_pois(cells, per_cell: int = 5, seed: int = 0) -> pd.DataFrame:
+    """每个网格中心附近per_cell条POI，列与分类后的CSV相同"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for c, cell in enumerate(cells):
+        lat, lng = h3.cell_to_latlng(cell)
+        for i in range(per_cell):
+            big_type, mid_type, small_type, suffix = POI_TYPES[(c + i) % len(POI_TYPES)]
+            d_lat, d_lng = rng.uniform(-0.002, 0.002, 2)
+            rows.append({
+                'id': f"B0{c:03d}{i:03d}",
+                'name': f"测试{c}-{i}{suffix}",
+                'location': gcj_location(lat + d_lat, lng + d_lng),
+                'pname': '安徽省',
+                'cityname': '合肥市',
+                'adname': '蜀山区',
+                'bigType': big_type,
+                'midType': mid_type,
+                'smallType': small_type,
+            })
+    return pd.DataFrame(rows, columns=csv_converter.REQUIRED_COLUMNS)
+
+
+def outside_pois() -> pd.DataFrame:
+    """一条落在网格外（上海）和一条坐标无效的POI"""
+    rows = [
+        {'id': 'B1000000', 'name': '网格外商场', 'location': gcj_location(31.2304, 121.4737)},
+        {'id': 'B1000001', 'name': '坐标无效', 'location': 'unknown'},
+    ]
+    for row in rows:
+        row.update({'pname': '安徽省', 'cityname': '合肥市', 'adname': '蜀山区',
+                    'bigType': '餐饮服务', 'midType': '中餐厅', 'smallType': '中餐厅'})
+    return pd.DataFrame(rows, columns=csv_converter.REQUIRED_COLUMNS)
+
+
+@pytest.fixture
+def cells():
+    return grid_cells()
+
+
+@pytest.fixture
+def city_grid(cells):
+    return make_city_grid(cells)
+
+
+@pytest.fixture
+def pois(cells):
+    return make_pois(cells)
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """把POI写入tmp_path下的CSV，返回路径"""
+    def write(df: pd.DataFrame, name: str = '合肥市.csv') -> str:
+        path = str(tmp_path / name)
+        df.to_csv(path, index=False, encoding='utf-8')
+        return path
+    return write
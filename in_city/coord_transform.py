@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+坐标系转换
+高德POI使用GCJ-02坐标，osmnx获取的城市边界和H3网格使用WGS-84坐标，
+POI在分配到网格前需要先转换到WGS-84。所有函数都对numpy数组做向量化计算。
+"""
+
+import numpy as np
+from typing import Tuple
+
+
+# 克拉索夫斯基椭球参数
+_A = 6378245.0
+_EE = 0.00669342162296594323
+
+# 数据来源 -> 坐标系
+SOURCE_COORD_SYSTEMS = {
+    'amap': 'gcj02',
+    'gcj02': 'gcj02',
+    'osm': 'wgs84',
+    'wgs84': 'wgs84',
+}
+
+
+def out_of_china(lng: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """是否在中国范围外（范围外GCJ-02与WGS-84相同，不做偏移）"""
+    return (lng < 72.004) | (lng > 137.8347) | (lat < 0.8293) | (lat > 55.8271)
+
+
+def _transform_lat(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    ret = -100.0 + 2.0 * x + 3.0 * y + 0.2 * y * y + 0.1 * x * y + 0.2 * np.sqrt(np.abs(x))
+    ret += (20.0 * np.sin(6.0 * x * np.pi) + 20.0 * np.sin(2.0 * x * np.pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(y * np.pi) + 40.0 * np.sin(y / 3.0 * np.pi)) * 2.0 / 3.0
+    ret += (160.0 * np.sin(y / 12.0 * np.pi) + 320.0 * np.sin(y * np.pi / 30.0)) * 2.0 / 3.0
+    return ret
+
+
+def _transform_lng(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    ret = 300.0 + x + 2.0 * y + 0.1 * x * x + 0.1 * x * y + 0.1 * np.sqrt(np.abs(x))
+    ret += (20.0 * np.sin(6.0 * x * np.pi) + 20.0 * np.sin(2.0 * x * np.pi)) * 2.0 / 3.0
+    ret += (20.0 * np.sin(x * np.pi) + 40.0 * np.sin(x / 3.0 * np.pi)) * 2.0 / 3.0
+    ret += (150.0 * np.sin(x / 12.0 * np.pi) + 300.0 * np.sin(x / 30.0 * np.pi)) * 2.0 / 3.0
+    return ret
+
+
+def _gcj02_offset(lng: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """WGS-84坐标加密为GCJ-02时的偏移量（度）"""
+    dlat = _transform_lat(lng - 105.0, lat - 35.0)
+    dlng = _transform_lng(lng - 105.0, lat - 35.0)
+    rad_lat = lat / 180.0 * np.pi
+    magic = 1 - _EE * np.sin(rad_lat) ** 2
+    sqrt_magic = np.sqrt(magic)
+    dlat = (dlat * 180.0) / ((_A * (1 - _EE)) / (magic * sqrt_magic) * np.pi)
+    dlng = (dlng * 180.0) / (_A / sqrt_magic * np.cos(rad_lat) * np.pi)
+
+    outside = out_of_china(lng, lat)
+    dlng = np.where(outside, 0.0, dlng)
+    dlat = np.where(outside, 0.0, dlat)
+    return dlng, dlat
+
+
+def wgs84_to_gcj02(lng: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """WGS-84 -> GCJ-02"""
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    dlng, dlat = _gcj02_offset(lng, lat)
+    return lng + dlng, lat + dlat
+
+
+def gcj02_to_wgs84(lng: np.ndarray, lat: np.ndarray, iterations: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """GCJ-02 -> WGS-84
+
+    先用GCJ-02点处的偏移量做一次近似反算（误差约数米），再迭代修正，迭代1次后误差在厘米级
+    """
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+
+    dlng, dlat = _gcj02_offset(lng, lat)
+    wgs_lng = lng - dlng
+    wgs_lat = lat - dlat
+    for _ in range(iterations):
+        gcj_lng, gcj_lat = wgs84_to_gcj02(wgs_lng, wgs_lat)
+        wgs_lng -= gcj_lng - lng
+        wgs_lat -= gcj_lat - lat
+    return wgs_lng, wgs_lat
+
+
+def to_wgs84(lng: np.ndarray, lat: np.ndarray, source: str = 'amap') -> Tuple[np.ndarray, np.ndarray]:
+    """把指定来源的坐标转换为WGS-84，返回 (lng, lat)"""
+    coord_system = SOURCE_COORD_SYSTEMS.get(source)
+    if coord_system is None:
+        raise ValueError(f"未知的坐标来源: {source}，可选: {list(SOURCE_COORD_SYSTEMS)}")
+
+    if coord_system == 'gcj02':
+        return gcj02_to_wgs84(lng, lat)
+    return np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64)
@@ -1,6 +1,43 @@
 import os
 import pandas as pd
 
+# POI数据中需要保留的列
+REQUIRED_COLUMNS = ['id', 'name', 'location', 'pname', 'cityname', 'adname', 'bigType', 'midType', 'smallType']
+
+# 固定的列类型，行政区划和类别列取值重复度高，使用category
+CATEGORY_COLUMNS = ['pname', 'cityname', 'adname', 'bigType', 'midType', 'smallType']
+POI_CSV_DTYPES = {
+    'id': 'string',
+    'name': 'string',
+    'location': 'string',
+    **{column: 'category' for column in CATEGORY_COLUMNS}
+}
+
+# 每块读取的行数，峰值内存由块大小决定而不是文件大小
+CHUNK_SIZE = 200_000
+
+
+def read_csv_columns(csv_path, encoding='utf-8'):
+    """只读取CSV表头，返回列名列表"""
+    return list(pd.read_csv(csv_path, nrows=0, encoding=encoding).columns)
+
+
+def iter_poi_csv_chunks(csv_path, columns=None, chunksize=CHUNK_SIZE, encoding='utf-8'):
+    """分块读取POI CSV：解析时只读取需要的列，并使用固定的列类型
+
+    文件中不存在的列会被忽略
+    """
+    columns = REQUIRED_COLUMNS if columns is None else columns
+    existing = set(read_csv_columns(csv_path, encoding))
+    usecols = [col for col in columns if col in existing]
+    dtypes = {col: POI_CSV_DTYPES[col] for col in usecols if col in POI_CSV_DTYPES}
+
+    with pd.read_csv(csv_path, usecols=usecols, dtype=dtypes, chunksize=chunksize, encoding=encoding) as reader:
+        for chunk in reader:
+            # usecols按文件中的列顺序返回，这里恢复为请求的列顺序
+            yield chunk[usecols]
+
+
 def process_unclassified_csv():
     """
     处理csv目录中的CSV文件，仅保留指定的列
@@ -14,7 +51,7 @@ def process_unclassified_csv():
     os.makedirs(classified_dir, exist_ok=True)
     
     # 指定要保留的列
-    required_columns = ['id', 'name', 'location', 'pname', 'cityname', 'adname', 'bigType', 'midType', 'smallType']
+    required_columns = REQUIRED_COLUMNS
     
     total_processed = 0
     total_skipped = 0
@@ -65,15 +102,13 @@ def process_csv_files(csv_files, input_dir, output_dir, required_columns):
         try:
             print(f"正在处理: {filename}")
             
-            # 读取CSV文件
-            df = pd.read_csv(input_path, encoding='utf-8')
-            
-            # 检查哪些必需列存在
+            # 只读取表头，检查哪些必需列存在
+            header = read_csv_columns(input_path, encoding='utf-8')
             existing_columns = []
             missing_columns = []
             
             for col in required_columns:
-                if col in df.columns:
+                if col in header:
                     existing_columns.append(col)
                 else:
                     missing_columns.append(col)
@@ -82,12 +117,17 @@ def process_csv_files(csv_files, input_dir, output_dir, required_columns):
                 print(f"  警告: 文件 {filename} 缺少列: {missing_columns}")
             
             if existing_columns:
-                # 只保留存在的必需列
-                df_filtered = df[existing_columns].copy()
-                
-                # 保存处理后的文件到classified目录
-                df_filtered.to_csv(output_path, index=False, encoding='utf-8-sig')
-                print(f"  处理完成: {filename} (保留了 {len(existing_columns)} 列)")
+                # 分块读取并只保留存在的必需列，先写入临时文件，完成后再替换为目标文件
+                tmp_path = output_path + '.tmp'
+                row_count = 0
+                for i, chunk in enumerate(iter_poi_csv_chunks(input_path, existing_columns, encoding='utf-8')):
+                    chunk.to_csv(tmp_path, index=False, encoding='utf-8-sig' if i == 0 else 'utf-8',
+                                 mode='w' if i == 0 else 'a', header=(i == 0))
+                    row_count += len(chunk)
+                if row_count == 0:
+                    pd.DataFrame(columns=existing_columns).to_csv(tmp_path, index=False, encoding='utf-8-sig')
+                os.replace(tmp_path, output_path)
+                print(f"  处理完成: {filename} (保留了 {len(existing_columns)} 列, {row_count} 行)")
                 print(f"  保留的列: {existing_columns}")
                 processed_count += 1
             else:
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GeoJSON图层
+把一组hex（或中心点）整理为一个带属性的FeatureCollection，作为单个folium.GeoJson图层加入地图。
+样式、tooltip和popup都由每个要素的属性决定，而不是为每个hex创建一个folium.Polygon、CircleMarker和内联的popup HTML，
+res10细分网格这类几十万个hex的地图的HTML体积和浏览器加载时间都会大幅减少。
+"""
+
+import h3
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+from typing import Dict, List, Any, Callable, Iterable, Optional, Sequence, Tuple, Union
+
+# 可视化渲染方式：geojson为每个图层一个GeoJson，polygons为原有的每个hex一个folium.Polygon，
+# compact为只嵌入网格ID和数值数组、由浏览器计算hex边界（见compact_layer.py）
+RENDER_MODES = ('geojson', 'polygons', 'compact')
+DEFAULT_RENDER_MODE = 'geojson'
+
+# 坐标保留的小数位数（6位约0.1米）
+COORD_PRECISION = 6
+
+Style = Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]
+Fields = Sequence[Tuple[str, str]]
+
+
+def check_render_mode(render_mode: str) -> str:
+    """检查渲染方式是否受支持"""
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"不支持的渲染方式: {render_mode}，可选: {', '.join(RENDER_MODES)}")
+    return render_mode
+
+
+def hex_ring(h3_index: Optional[str] = None, boundary: Optional[List] = None,
+             precision: int = COORD_PRECISION) -> List[List[float]]:
+    """hex的闭合边界环（[lng, lat]）；boundary为网格数据中的[lng, lat]边界，没有时由h3_index计算"""
+    if boundary:
+        ring = [[round(lng, precision), round(lat, precision)] for lng, lat in boundary]
+    else:
+        ring = [[round(lng, precision), round(lat, precision)] for lat, lng in h3.cell_to_boundary(h3_index)]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def hex_polygon(h3_index: Optional[str] = None, boundary: Optional[List] = None) -> Dict[str, Any]:
+    """hex的GeoJSON多边形"""
+    return {'type': 'Polygon', 'coordinates': [hex_ring(h3_index, boundary)]}
+
+
+def hex_features(h3_indices: Iterable[str], properties: Optional[Iterable[Dict[str, Any]]] = None,
+                 boundaries: Optional[Iterable[List]] = None) -> List[Dict[str, Any]]:
+    """一组hex的要素列表；properties、boundaries与h3_indices按顺序对应，h3_index总会写入属性"""
+    h3_indices = list(h3_indices)
+    properties = list(properties) if properties is not None else [{} for _ in h3_indices]
+    boundaries = list(boundaries) if boundaries is not None else [None] * len(h3_indices)
+
+    features = []
+    for i, (h3_index, props, boundary) in enumerate(zip(h3_indices, properties, boundaries)):
+        features.append({
+            'type': 'Feature',
+            'id': i,
+            'geometry': hex_polygon(h3_index, boundary),
+            'properties': {'h3_index': h3_index, **props}
+        })
+    return features
+
+
+def hex_group_feature(h3_indices: Iterable[str], properties: Dict[str, Any], feature_id: int = 0,
+                      precision: int = COORD_PRECISION) -> Dict[str, Any]:
+    """一组hex合并为一个MultiPolygon要素（共用一份属性），用于几十万个细分网格这类不需要逐个hex属性的图层"""
+    return {
+        'type': 'Feature',
+        'id': feature_id,
+        'geometry': {'type': 'MultiPolygon',
+                     'coordinates': [[hex_ring(h3_index, precision=precision)] for h3_index in h3_indices]},
+        'properties': dict(properties)
+    }
+
+
+def point_features(points: Iterable[Sequence[float]], properties: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """一组中心点（[lat, lng]）的要素列表"""
+    return [
+        {
+            'type': 'Feature',
+            'id': i,
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(point[1], COORD_PRECISION), round(point[0], COORD_PRECISION)]},
+            'properties': dict(props)
+        }
+        for i, (point, props) in enumerate(zip(points, properties))
+    ]
+
+
+def add_geojson_layer(m: folium.Map, features: List[Dict[str, Any]], style: Style,
+                      name: Optional[str] = None, tooltip: Optional[Fields] = None,
+                      popup: Optional[Fields] = None, marker: Optional[folium.CircleMarker] = None) -> Optional[folium.GeoJson]:
+    """把要素作为一个GeoJson图层加入地图
+
+    style为固定的样式字典，或由要素属性得到样式字典的函数；
+    tooltip、popup为 (属性名, 显示名) 列表，由浏览器按属性生成内容；
+    marker用于点要素，每个点按样式绘制为圆点标记
+    """
+    if not features:
+        return None
+
+    if callable(style):
+        style_function = lambda feature: style(feature['properties'])
+    else:
+        style_function = lambda feature: style
+
+    layer = folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        name=name,
+        style_function=style_function,
+        marker=marker,
+        tooltip=folium.GeoJsonTooltip(fields=[f for f, _ in tooltip], aliases=[a for _, a in tooltip]) if tooltip else None,
+        popup=folium.GeoJsonPopup(fields=[f for f, _ in popup], aliases=[a for _, a in popup]) if popup else None,
+        control=name is not None
+    )
+    layer.add_to(m)
+    return layer
+
+
+class ZoomVisibility(MacroElement):
+    """按缩放级别切换图层：每个图层只在 [min_zoom, max_zoom] 范围内显示"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var levels = [
+                {%- for layer, min_zoom, max_zoom in this.levels %}
+                [{{ layer.get_name() }}, {{ min_zoom }}, {{ max_zoom }}],
+                {%- endfor %}
+            ];
+            function update() {
+                var zoom = map.getZoom();
+                levels.forEach(function(level) {
+                    var visible = zoom >= level[1] && zoom <= level[2];
+                    if (visible && !map.hasLayer(level[0])) { map.addLayer(level[0]); }
+                    if (!visible && map.hasLayer(level[0])) { map.removeLayer(level[0]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels: List[Tuple[folium.map.Layer, int, int]]):
+        super().__init__()
+        self._name = 'ZoomVisibility'
+        self.levels = levels
+
+
+def add_zoom_visibility(m: folium.Map, levels: List[Tuple[Optional[folium.map.Layer], int, int]]) -> None:
+    """levels为 (图层, 最小缩放级别, 最大缩放级别) 列表，需在所有图层加入地图之后调用"""
+    levels = [level for level in levels if level[0] is not None]
+    if levels:
+        ZoomVisibility(levels).add_to(m)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+不含几何的网格格式
+xx市_h3_grid.json 中只保存网格ID（uint64数组，base64编码）和按列保存的hex属性（poi_count等），
+不再保存可以由网格ID计算出的boundary、center、lat、lng。
+读取后每个hex仍是一个字典（LazyHex），访问boundary、center、lat、lng时由GridGeometry按需计算：
+中心点在第一次访问时对整个网格一次算出，边界按BATCH_SIZE个hex一批计算，计算结果都会缓存。
+旧格式（每个hex带有几何的hexes列表）的网格仍可直接读取，下次保存时转换为新格式。
+"""
+
+import os
+import json
+import base64
+import h3
+from h3.api import basic_int as h3_int
+import numpy as np
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple, Union
+
+GRID_FORMAT = 'h3_columnar'
+GRID_VERSION = 1
+# 由网格ID计算、不写入文件的字段
+GEOMETRY_KEYS = ('boundary', 'center', 'lat', 'lng')
+# 每次计算边界的hex数量
+BATCH_SIZE = 4096
+
+
+def cell_array(h3_indices: Iterable[Union[str, int]]) -> np.ndarray:
+    """网格ID（字符串或整数）转换为uint64数组"""
+    return np.array([h3.str_to_int(h) if isinstance(h, str) else int(h) for h in h3_indices], dtype=np.uint64)
+
+
+def encode_cells(cells: np.ndarray) -> str:
+    """uint64网格ID数组按小端字节序编码为base64字符串"""
+    return base64.b64encode(np.ascontiguousarray(cells, dtype='<u8').tobytes()).decode('ascii')
+
+
+def decode_cells(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype='<u8').astype(np.uint64)
+
+
+class GridGeometry:
+    """一个网格中所有hex的中心点和边界，按需计算并缓存"""
+
+    def __init__(self, cells: np.ndarray):
+        self.cells = np.asarray(cells, dtype=np.uint64)
+        self._lat = None
+        self._lng = None
+        self._boundaries: Dict[int, List[List[Tuple[float, float]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """所有hex的中心点纬度、经度数组（第一次调用时一次算出）"""
+        if self._lat is None:
+            latlng = np.array([h3_int.cell_to_latlng(cell) for cell in self.cells.tolist()],
+                              dtype=np.float64).reshape(-1, 2)
+            self._lat, self._lng = latlng[:, 0], latlng[:, 1]
+        return self._lat, self._lng
+
+    def center(self, row: int) -> Tuple[float, float]:
+        lat, lng = self.centers()
+        return float(lat[row]), float(lng[row])
+
+    def _boundary_batch(self, batch: int) -> List[List[Tuple[float, float]]]:
+        boundaries = self._boundaries.get(batch)
+        if boundaries is None:
+            cells = self.cells[batch * BATCH_SIZE:(batch + 1) * BATCH_SIZE].tolist()
+            boundaries = [[(lng, lat) for lat, lng in h3_int.cell_to_boundary(cell)] for cell in cells]
+            self._boundaries[batch] = boundaries
+        return boundaries
+
+    def boundary(self, row: int) -> List[Tuple[float, float]]:
+        """第row个hex的边界（[(lng, lat), ...]，与旧格式中的boundary相同）"""
+        return self._boundary_batch(row // BATCH_SIZE)[row % BATCH_SIZE]
+
+    def boundaries(self, rows: Optional[Sequence[int]] = None) -> List[List[Tuple[float, float]]]:
+        """一组hex（默认全部）的边界，按批计算"""
+        if rows is None:
+            rows = range(len(self.cells))
+        return [self.boundary(row) for row in rows]
+
+
+class LazyHex(dict):
+    """网格中的一个hex：属性保存在字典中，boundary、center、lat、lng由所属网格的GridGeometry按需计算"""
+
+    __slots__ = ('_geometry', '_row')
+
+    def __init__(self, attributes: Dict[str, Any], geometry: GridGeometry, row: int):
+        super().__init__(attributes)
+        self._geometry = geometry
+        self._row = row
+
+    def __missing__(self, key: str) -> Any:
+        if key == 'boundary':
+            return self._geometry.boundary(self._row)
+        if key == 'center':
+            return self._geometry.center(self._row)
+        if key == 'lat':
+            return self._geometry.center(self._row)[0]
+        if key == 'lng':
+            return self._geometry.center(self._row)[1]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self or key in GEOMETRY_KEYS:
+            return self[key]
+        return default
+
+    def copy(self) -> 'LazyHex':
+        return LazyHex(self, self._geometry, self._row)
+
+    def __reduce__(self):
+        return LazyHex, (dict(self), self._geometry, self._row)
+
+
+def grid_geometry(city_data: Dict[str, Any]) -> GridGeometry:
+    """网格数据对应的GridGeometry（新格式的网格共用读取时创建的对象，旧格式的网格由网格ID新建）"""
+    hexes = city_data.get('hexes', [])
+    if hexes and isinstance(hexes[0], LazyHex) and len(hexes[0]._geometry) == len(hexes):
+        return hexes[0]._geometry
+    return GridGeometry(cell_array(hex_info['h3_index'] for hex_info in hexes))
+
+
+def make_hexes(h3_indices: Iterable[Union[str, int]],
+               attributes: Optional[Dict[str, Sequence[Any]]] = None) -> List[LazyHex]:
+    """由网格ID和按列的属性（值为None的不写入hex）创建hex列表"""
+    cells = cell_array(h3_indices)
+    geometry = GridGeometry(cells)
+    attributes = attributes or {}
+    hexes = []
+    for row, h3_index in enumerate(h3.int_to_str(cell) for cell in cells.tolist()):
+        hex_info = {'h3_index': h3_index}
+        for key, values in attributes.items():
+            if values[row] is not None:
+                hex_info[key] = values[row]
+        hexes.append(LazyHex(hex_info, geometry, row))
+    return hexes
+
+
+def grid_to_json(city_data: Dict[str, Any]) -> Dict[str, Any]:
+    """网格数据转换为保存格式：网格ID数组 + 按列的hex属性（不含几何字段）"""
+    hexes = city_data.get('hexes', [])
+    keys = []
+    for hex_info in hexes:
+        keys.extend(key for key in hex_info if key not in keys)
+    keys = [key for key in keys if key != 'h3_index' and key not in GEOMETRY_KEYS]
+
+    data = {key: value for key, value in city_data.items() if key != 'hexes'}
+    data.update({
+        'format': GRID_FORMAT,
+        'grid_version': GRID_VERSION,
+        'total_hexes': len(hexes),
+        'cells': encode_cells(cell_array(hex_info['h3_index'] for hex_info in hexes)),
+        # dict.get 只取已保存的属性，不触发几何计算
+        'columns': {key: [dict.get(hex_info, key) for hex_info in hexes] for key in keys}
+    })
+    return data
+
+
+def grid_from_json(data: Dict[str, Any]) -> Dict[str, Any]:
+    """保存格式转换为网格数据（hexes为LazyHex列表）；旧格式原样返回"""
+    if data.get('format') != GRID_FORMAT:
+        return data
+    city_data = {key: value for key, value in data.items()
+                 if key not in ('format', 'grid_version', 'cells', 'columns')}
+    city_data['hexes'] = make_hexes(decode_cells(data['cells']), data.get('columns', {}))
+    return city_data
+
+
+def save_grid(json_file_path: str, city_data: Dict[str, Any]) -> None:
+    """保存网格（先写临时文件再替换，避免中断时留下不完整的文件）"""
+    tmp_path = json_file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(grid_to_json(city_data), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, json_file_path)
+
+
+def load_grid(json_file_path: str) -> Dict[str, Any]:
+    """读取网格（新旧格式都可以），出错时抛出异常"""
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        return grid_from_json(json.load(f))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+网格清单
+json目录下的grid_manifest.json记录每个城市网格的基本信息（hex数量、分辨率、文件路径、内容哈希、范围、生成时间），
+代替原来复制了所有城市全部hex的all_cities_h3_summary.json。清单按城市增量更新：
+只有文件大小或修改时间变化的网格才重新计算哈希和范围，下游可以不加载任何网格直接按清单安排处理。
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+import grid_geometry
+
+MANIFEST_FILENAME = 'grid_manifest.json'
+MANIFEST_VERSION = 1
+GRID_SUFFIX = '_h3_grid.json'
+
+
+def get_manifest_path(json_dir: str) -> str:
+    return os.path.join(json_dir, MANIFEST_FILENAME)
+
+
+def empty_manifest() -> Dict[str, Any]:
+    return {'version': MANIFEST_VERSION, 'updated_at': None, 'cities': {}}
+
+
+def load_manifest(json_dir: str) -> Dict[str, Any]:
+    """读取清单，不存在或版本不同时返回空清单"""
+    manifest_path = get_manifest_path(json_dir)
+    if not os.path.exists(manifest_path):
+        return empty_manifest()
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"读取网格清单 {manifest_path} 时出错: {e}")
+        return empty_manifest()
+    return manifest if manifest.get('version') == MANIFEST_VERSION else empty_manifest()
+
+
+def save_manifest(json_dir: str, manifest: Dict[str, Any]) -> str:
+    """保存清单（先写临时文件再替换），返回清单路径"""
+    manifest_path = get_manifest_path(json_dir)
+    manifest['updated_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest_path
+
+
+def file_hash(file_path: str) -> str:
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_current(entry: Optional[Dict[str, Any]], json_file_path: str) -> bool:
+    stat = os.stat(json_file_path)
+    return entry is not None and entry.get('file_size') == stat.st_size and entry.get('file_mtime') == stat.st_mtime
+
+
+def build_entry(json_file_path: str, city_data: Optional[Dict[str, Any]] = None,
+                previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """一个网格的清单条目；内容哈希与previous相同时保留原来的生成时间"""
+    if city_data is None:
+        city_data = grid_geometry.load_grid(json_file_path)
+    stat = os.stat(json_file_path)
+    content_hash = file_hash(json_file_path)
+    hexes = city_data.get('hexes', [])
+    bbox = None
+    if hexes:
+        coords = np.concatenate([np.asarray(ring) for ring in grid_geometry.grid_geometry(city_data).boundaries()])
+        bbox = [round(float(value), 6) for value in (*coords.min(axis=0), *coords.max(axis=0))]
+    unchanged = previous is not None and previous.get('content_hash') == content_hash
+    return {
+        'city_name': city_data.get('city_name', os.path.basename(json_file_path).replace(GRID_SUFFIX, '')),
+        'total_hexes': len(hexes),
+        'resolution': city_data.get('resolution', 7),
+        'path': os.path.basename(json_file_path),
+        'content_hash': content_hash,
+        'bbox': bbox,  # [最小经度, 最小纬度, 最大经度, 最大纬度]
+        'generated_at': previous['generated_at'] if unchanged else time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime)),
+        'file_size': stat.st_size,
+        'file_mtime': stat.st_mtime
+    }
+
+
+def update_city(json_dir: str, json_file_path: str, city_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """更新清单中一个城市的条目并保存清单（city_data为刚保存的网格数据时不再读取网格）"""
+    manifest = load_manifest(json_dir)
+    city_name = os.path.basename(json_file_path).replace(GRID_SUFFIX, '')
+    entry = build_entry(json_file_path, city_data, manifest['cities'].get(city_name))
+    manifest['cities'][city_name] = entry
+    save_manifest(json_dir, manifest)
+    return entry
+
+
+def refresh_manifest(json_dir: str) -> Dict[str, Any]:
+    """按json目录中的网格文件增量更新清单：只重新读取新增或变化的网格，删除已不存在的城市"""
+    manifest = load_manifest(json_dir)
+    cities = manifest['cities']
+    changed = False
+    grid_files = {filename.replace(GRID_SUFFIX, ''): os.path.join(json_dir, filename)
+                  for filename in sorted(os.listdir(json_dir))
+                  if filename.endswith(GRID_SUFFIX) and not filename.startswith('all_cities')}
+    for city_name in [name for name in cities if name not in grid_files]:
+        del cities[city_name]
+        changed = True
+    for city_name, json_file_path in grid_files.items():
+        if _is_current(cities.get(city_name), json_file_path):
+            continue
+        try:
+            cities[city_name] = build_entry(json_file_path, previous=cities.get(city_name))
+            changed = True
+        except Exception as e:
+            print(f"读取网格 {json_file_path} 时出错，未写入清单: {e}")
+    if changed or not os.path.exists(get_manifest_path(json_dir)):
+        save_manifest(json_dir, manifest)
+    return manifest
+
+
+def list_cities(json_dir: str) -> List[Dict[str, Any]]:
+    """清单中的所有城市条目（按hex数量从多到少），不读取任何网格"""
+    return sorted(load_manifest(json_dir)['cities'].values(), key=lambda entry: entry['total_hexes'], reverse=True)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+hex邻接矩阵与k圈邻域聚合
+每个城市只构建一次网格的稀疏邻接矩阵，由稀疏矩阵乘法得到所有hex的k圈（距离恰为k）和k盘（距离不超过k）选择矩阵，
+任意按hex的统计量（POI数量、类别矩阵等）乘以选择矩阵即得到所有hex的邻域统计，可按距离加衰减权重。
+"""
+
+import h3
+from h3.api import basic_int as h3_int
+import numpy as np
+from typing import List, Optional, Sequence
+
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+
+def is_available() -> bool:
+    """scipy是否可用"""
+    return sp is not None
+
+
+def decay_weights(max_k: int, decay: float) -> np.ndarray:
+    """按距离几何衰减的权重，第k圈的权重为 decay**k（k=0为hex自身）"""
+    return decay ** np.arange(max_k + 1, dtype=np.float64)
+
+
+def _neighbor_edges(cells: np.ndarray):
+    """返回cells中每个网格与其相邻网格组成的边 (网格ID, 相邻网格ID)"""
+    src, dst = [], []
+    for cell in cells.tolist():
+        neighbors = [n for n in h3_int.grid_disk(cell, 1) if n != cell]
+        src.extend([cell] * len(neighbors))
+        dst.extend(neighbors)
+    return np.array(src, dtype=np.uint64), np.array(dst, dtype=np.uint64)
+
+
+class HexAdjacency:
+    """城市网格的邻接关系
+
+    构建时在网格外额外扩展max_k圈，使网格边界凹陷处的k圈与H3网格距离一致；
+    所有选择矩阵的行和列都只包含城市网格内的hex（按网格ID排序）
+    """
+
+    def __init__(self, cells: np.ndarray, max_k: int = 1):
+        self.cells = np.sort(np.asarray(cells, dtype=np.uint64))
+        self.max_k = max_k
+
+        # 逐圈向外扩展，只对新增的一圈计算邻居
+        ext_cells = self.cells
+        frontier = self.cells
+        src_parts, dst_parts = [], []
+        for _ in range(max_k):
+            src, dst = _neighbor_edges(frontier)
+            src_parts.append(src)
+            dst_parts.append(dst)
+            frontier = np.setdiff1d(np.unique(dst), ext_cells)
+            ext_cells = np.union1d(ext_cells, frontier)
+
+        n_ext = len(ext_cells)
+        if src_parts:
+            src = np.searchsorted(ext_cells, np.concatenate(src_parts))
+            dst = np.searchsorted(ext_cells, np.concatenate(dst_parts))
+        else:
+            src = dst = np.zeros(0, dtype=np.int64)
+        edges = sp.coo_matrix((np.ones(len(src), dtype=np.int64), (src, dst)), shape=(n_ext, n_ext)).tocsr()
+        # 最外一圈没有计算邻居，由对称性补齐其与内圈的边
+        self.ext_matrix = ((edges + edges.T) > 0).astype(np.int64)
+        self.ext_cells = ext_cells
+
+        # disks[k]：城市网格hex × 扩展网格hex，距离不超过k的为1
+        grid_pos = np.searchsorted(ext_cells, self.cells)
+        disk = sp.csr_matrix((np.ones(len(grid_pos), dtype=np.int64), (np.arange(len(grid_pos)), grid_pos)),
+                             shape=(len(grid_pos), n_ext))
+        self._disks = [disk]
+        for _ in range(max_k):
+            disk = ((disk @ self.ext_matrix + disk) > 0).astype(np.int64)
+            self._disks.append(disk)
+        # 只保留城市网格内的列
+        self._disks = [d[:, grid_pos].tocsr() for d in self._disks]
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @property
+    def matrix(self):
+        """城市网格内的邻接矩阵（距离为1的为1）"""
+        return self.ring(1) if self.max_k >= 1 else sp.csr_matrix((len(self.cells), len(self.cells)), dtype=np.int64)
+
+    def rows_for(self, h3_ids: List[str]) -> np.ndarray:
+        """返回hex列表对应的行号（不在城市网格中的hex被忽略）"""
+        if not h3_ids or len(self.cells) == 0:
+            return np.zeros(0, dtype=np.int64)
+        keys = np.array([h3.str_to_int(h) for h in h3_ids], dtype=np.uint64)
+        pos = np.searchsorted(self.cells, keys)
+        pos_clipped = np.minimum(pos, len(self.cells) - 1)
+        found = (pos < len(self.cells)) & (self.cells[pos_clipped] == keys)
+        return pos[found]
+
+    def disk(self, k: int):
+        """k盘选择矩阵：hex × hex，距离不超过k的为1"""
+        if not 0 <= k <= self.max_k:
+            raise ValueError(f"k需要在0到{self.max_k}之间: {k}")
+        return self._disks[k]
+
+    def ring(self, k: int):
+        """k圈选择矩阵：hex × hex，距离恰为k的为1"""
+        if k == 0:
+            return self.disk(0)
+        return (self.disk(k) - self.disk(k - 1)).tocsr()
+
+    def ring_cells(self, row: int, k: int) -> np.ndarray:
+        """某个hex第k圈内城市网格中的hex"""
+        ring = self.ring(k)
+        return self.cells[np.sort(ring.indices[ring.indptr[row]:ring.indptr[row + 1]])]
+
+    def ring_sums(self, values, max_k: Optional[int] = None) -> List:
+        """所有hex在第0..max_k圈上的求和，values为按行对齐的向量、稠密矩阵或稀疏矩阵"""
+        max_k = self.max_k if max_k is None else max_k
+        return [self.ring(k) @ values for k in range(max_k + 1)]
+
+    def disk_sum(self, values, max_k: Optional[int] = None, weights: Optional[Sequence[float]] = None):
+        """所有hex在max_k盘内的求和，weights[k]为第k圈的权重（默认都为1）"""
+        max_k = self.max_k if max_k is None else max_k
+        if weights is None:
+            return self.disk(max_k) @ values
+
+        if len(weights) != max_k + 1:
+            raise ValueError(f"weights的长度需要为{max_k + 1}: {len(weights)}")
+        selection = sum(float(weights[k]) * self.ring(k).astype(np.float64) for k in range(max_k + 1))
+        return selection @ values
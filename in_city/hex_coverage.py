@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的H3网格覆盖
+一组父网格在目标分辨率下的全部子网格只保存为 父网格（经compact_cells压缩）+ 目标分辨率，
+需要子网格时再按需展开：逐个迭代（lazy），或一次性展开为uint64数组。
+res7父网格细分到res10时，每个父网格代替343个子网格。
+"""
+
+import h3
+from h3.api import basic_int as h3_int
+import numpy as np
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple, Union
+
+COVERAGE_FORMAT = 'h3_compact'
+
+
+def _to_int(cell: Union[str, int]) -> int:
+    return h3.str_to_int(cell) if isinstance(cell, str) else int(cell)
+
+
+class CompactCoverage:
+    """目标分辨率下的网格集合，以压缩后的父网格保存"""
+
+    def __init__(self, parents: Iterable[Union[str, int]], resolution: int):
+        self.resolution = resolution
+        cells = sorted({_to_int(cell) for cell in parents})
+        if any(h3_int.get_resolution(cell) > resolution for cell in cells):
+            raise ValueError(f"父网格的分辨率不能高于目标分辨率 {resolution}")
+
+        # 同一分辨率的父网格可以进一步压缩（7个兄弟网格合并为其父网格）
+        if cells and len({h3_int.get_resolution(cell) for cell in cells}) == 1:
+            cells = sorted(h3_int.compact_cells(cells))
+        self.parents = np.array(cells, dtype=np.uint64)
+        self._parent_set = set(cells)
+        self._parent_resolutions = sorted({h3_int.get_resolution(cell) for cell in cells})
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[Union[str, int]], resolution: int) -> 'CompactCoverage':
+        """由目标分辨率下已展开的网格构建（例如旧格式的网格列表）"""
+        cells = [_to_int(cell) for cell in cells]
+        if not cells:
+            return cls([], resolution)
+        return cls(h3_int.compact_cells(sorted(set(cells))), resolution)
+
+    def __len__(self) -> int:
+        return sum(h3_int.cell_to_children_size(cell, self.resolution) for cell in self.parents.tolist())
+
+    def __iter__(self) -> Iterator[str]:
+        """逐个返回子网格ID（字符串），不一次性展开"""
+        for cell in self.iter_int():
+            yield h3.int_to_str(cell)
+
+    def iter_int(self) -> Iterator[int]:
+        """逐个返回子网格ID（整数）"""
+        for parent in self.parents.tolist():
+            yield from h3_int.cell_to_children(parent, self.resolution)
+
+    def __contains__(self, cell: Union[str, int]) -> bool:
+        """网格是否在覆盖范围内（只沿父网格链查找，不展开子网格）"""
+        try:
+            cell = _to_int(cell)
+            if h3_int.get_resolution(cell) != self.resolution:
+                return False
+        except Exception:
+            return False
+        return any(h3_int.cell_to_parent(cell, res) in self._parent_set for res in self._parent_resolutions)
+
+    def to_array(self) -> np.ndarray:
+        """展开为排序后的uint64数组"""
+        if len(self.parents) == 0:
+            return np.zeros(0, dtype=np.uint64)
+        parts = [np.array(h3_int.cell_to_children(parent, self.resolution), dtype=np.uint64)
+                 for parent in self.parents.tolist()]
+        return np.sort(np.concatenate(parts))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON可序列化的紧凑表示"""
+        return {
+            'format': COVERAGE_FORMAT,
+            'resolution': self.resolution,
+            'parents': [h3.int_to_str(cell) for cell in self.parents.tolist()],
+            'count': len(self)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompactCoverage':
+        """由to_dict的结果恢复"""
+        if data.get('format', COVERAGE_FORMAT) != COVERAGE_FORMAT:
+            raise ValueError(f"不支持的覆盖格式: {data.get('format')}")
+        return cls(data.get('parents', []), data['resolution'])
+
+    def parent_ids(self) -> List[str]:
+        """压缩后的父网格ID"""
+        return [h3.int_to_str(cell) for cell in self.parents.tolist()]
+
+    def center(self) -> Optional[Tuple[float, float]]:
+        """覆盖范围的中心点 (lat, lng)：各父网格中心按其包含的子网格数加权平均，不逐个计算子网格中心；为空时返回None"""
+        if len(self.parents) == 0:
+            return None
+        parents = self.parents.tolist()
+        latlng = np.array([h3_int.cell_to_latlng(cell) for cell in parents], dtype=np.float64)
+        weights = np.array([h3_int.cell_to_children_size(cell, self.resolution) for cell in parents],
+                           dtype=np.float64)
+        lat, lng = np.average(latlng, axis=0, weights=weights)
+        return float(lat), float(lng)
+
+    def contains_point(self, lat: float, lng: float) -> bool:
+        """坐标是否在覆盖范围内（计算目标分辨率的网格后沿父网格链查找）"""
+        return h3_int.latlng_to_cell(lat, lng, self.resolution) in self
+
+    def at_resolution(self, resolution: int) -> 'CompactCoverage':
+        """同一组父网格在更细分辨率下的覆盖（不重新填充多边形，子网格按需展开）"""
+        if resolution < self.resolution:
+            raise ValueError(f"只能展开到不低于 {self.resolution} 的分辨率")
+        return CompactCoverage(self.parents.tolist(), resolution)
+
+
+def grid_coverage(city_data: Dict[str, Any]) -> CompactCoverage:
+    """城市网格的覆盖：优先使用网格中保存的compact_cells，旧网格由hex列表压缩得到"""
+    if city_data.get('compact_cells'):
+        return CompactCoverage.from_dict(city_data['compact_cells'])
+    return CompactCoverage.from_cells((hex_info['h3_index'] for hex_info in city_data.get('hexes', [])),
+                                      city_data.get('resolution', 7))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+城市hex索引
+对城市网格数据只遍历一次，建立 网格ID -> 行号 的映射，并预先计算每个hex的中心、POI数量和是否包含商场，
+之后对任意hex的查询都是O(1)的字典查找，而不需要再遍历 city_data['hexes']。
+"""
+
+import h3
+import numpy as np
+from typing import Dict, List, Any, Optional, Set
+
+import mall_classifier
+from category_matrix import CategoryMatrix
+from mall_classifier import MALL_TYPE_PAIR
+
+
+class HexIndex:
+    """城市网格的hex索引
+
+    has_mall按商场分类器的类型规则判断：优先使用导入时写入网格数据的每个hex的商场数量，
+    其次使用类别矩阵，否则对每个hex的pois列表批量分类；poi_count在提供类别矩阵时由矩阵得到
+    """
+
+    def __init__(self, city_data: Dict[str, Any], matrix: Optional[CategoryMatrix] = None):
+        self.hexes = city_data.get('hexes', [])
+        self.ids = [hex_info.get('h3_index', '') for hex_info in self.hexes]
+        self.row_of = {h3_index: row for row, h3_index in enumerate(self.ids)}
+        self.centers = [hex_info.get('center', []) for hex_info in self.hexes]
+
+        if matrix is not None:
+            self.poi_count, self.has_mall = self._columns_from_matrix(matrix)
+            if mall_classifier.has_hex_counts(city_data):
+                self.has_mall = mall_classifier.mall_hex_mask(city_data, 'type')
+        else:
+            self.poi_count = np.array([len(hex_info.get('pois', [])) for hex_info in self.hexes], dtype=np.int64)
+            self.has_mall = mall_classifier.mall_hex_mask(city_data, 'type')
+
+    def _columns_from_matrix(self, matrix: CategoryMatrix):
+        """把矩阵中（按网格ID排序）的POI数量和商场数量对齐到网格行"""
+        poi_count = np.zeros(len(self.ids), dtype=np.int64)
+        has_mall = np.zeros(len(self.ids), dtype=bool)
+        if not self.ids or len(matrix.cells) == 0:
+            return poi_count, has_mall
+
+        keys = np.array([h3.str_to_int(h) for h in self.ids], dtype=np.uint64)
+        pos = np.searchsorted(matrix.cells, keys)
+        pos_clipped = np.minimum(pos, len(matrix.cells) - 1)
+        found = (pos < len(matrix.cells)) & (matrix.cells[pos_clipped] == keys)
+
+        poi_count[found] = matrix.poi_counts[pos[found]]
+        has_mall[found] = matrix.column_counts('type_pair', MALL_TYPE_PAIR)[pos[found]] > 0
+        return poi_count, has_mall
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, h3_index: str) -> bool:
+        return h3_index in self.row_of
+
+    def row(self, h3_index: str) -> Optional[int]:
+        """hex对应的行号，不在城市网格中时返回None"""
+        return self.row_of.get(h3_index)
+
+    def rows_for(self, h3_indices: List[str]) -> List[int]:
+        """hex列表对应的行号（去重，按网格顺序排列，不在城市网格中的hex被忽略）"""
+        rows = {self.row_of[h] for h in h3_indices if h in self.row_of}
+        return sorted(rows)
+
+    def mart_hexes(self) -> Set[str]:
+        """包含商场POI的hex"""
+        return {self.ids[row] for row in np.flatnonzero(self.has_mall).tolist()}
+
+    def details(self, h3_index: str) -> Dict[str, Any]:
+        """单个hex的中心、POI数量和是否包含商场"""
+        row = self.row_of.get(h3_index)
+        if row is not None:
+            return {
+                'h3_index': h3_index,
+                'center': self.centers[row],
+                'poi_count': int(self.poi_count[row]),
+                'has_mall': bool(self.has_mall[row])
+            }
+
+        # 不在城市网格中的hex，返回基本信息
+        try:
+            center_coords = h3.cell_to_latlng(h3_index)
+            center = [center_coords[0], center_coords[1]]  # [lat, lng]
+        except Exception:
+            center = [0, 0]
+        return {
+            'h3_index': h3_index,
+            'center': center,
+            'poi_count': 0,
+            'has_mall': False
+        }
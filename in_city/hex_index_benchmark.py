@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+hex索引基准测试
+生成不同规模的模拟城市网格，比较商场hex分析中原有的逐个遍历hex列表的查找方式与HexIndex索引查找的耗时。
+原有方式每个商场hex要遍历整个hex列表10次（3次POI分布统计 + 7次hex详情），耗时随城市规模线性增长，
+索引方式只在建立索引时遍历一次。原有方式只对抽样的商场hex计时，再按商场hex总数外推。
+"""
+
+import time
+import random
+import argparse
+import h3
+from typing import Dict, List, Any
+
+import mart_mesh
+from hex_index import HexIndex
+from mall_classifier import MALL_BIG_TYPE, MALL_MID_TYPE
+
+# 模拟数据使用的POI类型
+POI_TYPES = [
+    ("餐饮服务", "中餐厅"),
+    ("餐饮服务", "快餐厅"),
+    ("生活服务", "便利店"),
+    ("购物服务", "超级市场"),
+    ("科教文化服务", "学校"),
+    (MALL_BIG_TYPE, MALL_MID_TYPE),
+]
+
+
+def build_city(grid_k: int, pois_per_hex: int = 8, mall_ratio: float = 0.07, seed: int = 0) -> Dict[str, Any]:
+    """以合肥市中心为圆心生成k圈的模拟城市网格，每个hex内嵌随机POI"""
+    rng = random.Random(seed)
+    cells = h3.grid_disk(h3.latlng_to_cell(31.82, 117.23, 7), grid_k)
+
+    hexes = []
+    for cell in cells:
+        lat, lng = h3.cell_to_latlng(cell)
+        pois = []
+        for _ in range(rng.randint(0, pois_per_hex * 2)):
+            big_type, mid_type = rng.choice(POI_TYPES[:-1])
+            pois.append({'big_type': big_type, 'mid_type': mid_type})
+        if rng.random() < mall_ratio:
+            pois.append({'big_type': MALL_BIG_TYPE, 'mid_type': MALL_MID_TYPE})
+        hexes.append({'h3_index': cell, 'center': [lat, lng], 'pois': pois})
+
+    return {'city_name': f'模拟城市_k{grid_k}', 'hexes': hexes}
+
+
+def legacy_poi_distribution(city_data: Dict[str, Any], hex_indices: List[str]) -> int:
+    """原有实现：遍历整个hex列表统计指定hex的POI"""
+    hex_index_set = set(hex_indices)
+    total = 0
+    for hex_info in city_data.get('hexes', []):
+        if hex_info.get('h3_index', '') in hex_index_set:
+            total += len(hex_info.get('pois', []))
+    return total
+
+
+def legacy_hex_details(city_data: Dict[str, Any], h3_index: str) -> Dict[str, Any]:
+    """原有实现：遍历整个hex列表查找单个hex"""
+    for hex_info in city_data.get('hexes', []):
+        if hex_info.get('h3_index') == h3_index:
+            return {'h3_index': h3_index, 'center': hex_info.get('center', []),
+                    'poi_count': len(hex_info.get('pois', []))}
+    return {'h3_index': h3_index, 'center': [0, 0], 'poi_count': 0}
+
+
+def time_legacy(city_data: Dict[str, Any], mart_hexes: List[str]) -> float:
+    """原有方式处理给定商场hex的耗时"""
+    start = time.perf_counter()
+    for mart_hex in mart_hexes:
+        neighbor_hexes = mart_mesh.get_hex_neighbors(mart_hex)
+        legacy_poi_distribution(city_data, [mart_hex])
+        legacy_poi_distribution(city_data, neighbor_hexes)
+        legacy_poi_distribution(city_data, [mart_hex] + neighbor_hexes)
+        legacy_hex_details(city_data, mart_hex)
+        for h in neighbor_hexes:
+            legacy_hex_details(city_data, h)
+    return time.perf_counter() - start
+
+
+def time_indexed(index: HexIndex, city_data: Dict[str, Any], mart_hexes: List[str]) -> float:
+    """索引方式处理给定商场hex的耗时"""
+    start = time.perf_counter()
+    for mart_hex in mart_hexes:
+        neighbor_hexes = mart_mesh.get_hex_neighbors(mart_hex)
+        mart_mesh.analyze_poi_distribution(city_data, [mart_hex], index=index)
+        mart_mesh.analyze_poi_distribution(city_data, neighbor_hexes, index=index)
+        mart_mesh.analyze_poi_distribution(city_data, [mart_hex] + neighbor_hexes, index=index)
+        index.details(mart_hex)
+        for h in neighbor_hexes:
+            index.details(h)
+    return time.perf_counter() - start
+
+
+def run_benchmark(grid_ks: List[int], sample: int) -> None:
+    """对每种城市规模打印两种方式的耗时和加速比"""
+    print(f"{'hex数':>8}{'商场hex':>9}{'原方式(s)':>12}{'建索引(s)':>12}{'索引方式(s)':>13}{'加速比':>10}")
+    for grid_k in grid_ks:
+        city_data = build_city(grid_k)
+
+        start = time.perf_counter()
+        index = HexIndex(city_data)
+        build_seconds = time.perf_counter() - start
+
+        mart_hexes = sorted(index.mart_hexes())
+        sampled = mart_hexes[:sample]
+
+        # 原方式只对抽样计时，按商场hex数量外推
+        legacy_seconds = time_legacy(city_data, sampled) * len(mart_hexes) / max(len(sampled), 1)
+        indexed_seconds = build_seconds + time_indexed(index, city_data, mart_hexes)
+        speedup = legacy_seconds / indexed_seconds if indexed_seconds > 0 else float('inf')
+
+        print(f"{len(index):>8}{len(mart_hexes):>9}{legacy_seconds:>12.3f}{build_seconds:>12.4f}"
+              f"{indexed_seconds:>13.4f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="商场hex分析：遍历查找与索引查找的耗时对比")
+    parser.add_argument('--grid-k', type=int, nargs='+', default=[10, 20, 40, 60, 100],
+                        help="模拟城市网格的圈数（hex数约为3k²+3k+1）")
+    parser.add_argument('--sample', type=int, default=50, help="原方式计时抽样的商场hex数量")
+    args = parser.parse_args()
+
+    run_benchmark(args.grid_k, args.sample)
@@ -3,68 +3,109 @@
 
 import json
 import os
+import argparse
+import h3
 import folium
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser_pool
+import city_summary
+import colormap
+import compact_layer
+import geojson_layer
+import grid_geometry
+import hex_coverage
+import mall_classifier
+import png_renderer
+import tile_pyramid
+from geojson_layer import DEFAULT_RENDER_MODE
+from png_renderer import DEFAULT_PNG_MODE
 
 
 def load_city_json(json_file_path: str) -> Dict[str, Any]:
     """加载单个城市的JSON文件"""
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        return grid_geometry.load_grid(json_file_path)
     except Exception as e:
         print(f"加载文件 {json_file_path} 时出错: {e}")
         return {}
 
 
-def get_color_from_density(poi_count: int, max_poi_count: int) -> str:
-    """根据POI密度生成颜色，适配深色底图"""
-    if max_poi_count == 0:
-        return '#444444'  # 默认深灰色
-
-    # 使用平方根缩放来增加颜色差距
-    if poi_count == 0:
-        density_ratio = 0
-    else:
-        density_ratio = np.sqrt(poi_count / max_poi_count)
-
-    # 颜色方案: 深灰 -> 黄 -> 白
-    # 0.0: #444444 (深灰)
-    # 0.5: #ffff00 (黄)
-    # 1.0: #ffffff (白)
-
-    if density_ratio < 0.5:
-        # 从深灰到黄
-        t = density_ratio * 2  # 0-1
-        r = int(0x44 + (0xff - 0x44) * t)
-        g = int(0x44 + (0xff - 0x44) * t)
-        b = int(0x44 + (0x00 - 0x44) * t)
-    else:
-        # 从黄到白
-        t = (density_ratio - 0.5) * 2  # 0-1
-        r = int(0xff + (0xff - 0xff) * t)
-        g = int(0xff + (0xff - 0xff) * t)
-        b = int(0x00 + (0xff - 0x00) * t)
-
-    # 确保颜色值在有效范围内
-    r = max(0, min(255, r))
-    g = max(0, min(255, g))
-    b = max(0, min(255, b))
-    
-    return f'#{r:02x}{g:02x}{b:02x}'
-
+def add_density_layer(m: folium.Map, hex_data: List[Dict[str, Any]], scale: colormap.ColorScale,
+                      weight: float, fill_opacity: float, with_city: bool = False, compact: bool = False) -> None:
+    """把所有hex作为一个GeoJson图层加入地图，颜色由scale按每个hex的poi_count一次计算
+
+    compact为True时改为紧凑图层（只嵌入网格ID、颜色和POI数量，边界由浏览器计算，popup中不含POI类型分布）
+    """
+    poi_counts = [hex_info.get('poi_count', 0) for hex_info in hex_data]
+    colors = scale.colors(poi_counts)
+    if compact:
+        city_column = [('城市', [hex_info.get('city_name', '未知') for hex_info in hex_data])] if with_city else []
+        compact_layer.add_compact_layer(
+            m, [hex_info['h3_index'] for hex_info in hex_data],
+            colors,
+            style={'weight': weight, 'fillOpacity': fill_opacity},
+            columns=city_column + [('POI数量', poi_counts)]
+        )
+        return
 
-def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: str) -> None:
-    """为单个城市创建H3网格可视化地图和PNG，并保存到指定目录"""
+    properties = []
+    for hex_info, poi_count, color in zip(hex_data, poi_counts, colors.tolist()):
+        props = {
+            'poi_count': poi_count,
+            'color': color,
+            'poi_type_distribution': json.dumps(hex_info.get('poi_type_distribution', {}), ensure_ascii=False)
+        }
+        if with_city:
+            props['city_name'] = hex_info.get('city_name', '未知')
+        properties.append(props)
+
+    city_field = [('city_name', '城市')] if with_city else []
+    geojson_layer.add_geojson_layer(
+        m,
+        geojson_layer.hex_features([hex_info['h3_index'] for hex_info in hex_data], properties,
+                                   [hex_info.get('boundary') for hex_info in hex_data]),
+        style=lambda props: {'color': props['color'], 'fillColor': props['color'],
+                             'weight': weight, 'fillOpacity': fill_opacity},
+        tooltip=city_field + [('poi_count', 'POI数量')],
+        popup=city_field + [('h3_index', 'H3 ID'), ('poi_count', 'POI数量'), ('poi_type_distribution', 'POI类型分布')]
+    )
+
+
+def save_density_png(hex_data: List[Dict[str, Any]], scale: colormap.ColorScale, title_lines: List[str],
+                     png_path: str, basemap_dir: Optional[str] = None) -> bool:
+    """不经过浏览器直接绘制POI密度PNG（颜色和图例与HTML地图使用同一个scale）"""
+    raster = png_renderer.RasterMap(title_lines, legend_lines=scale.legend_lines() + ['金色标记 = 密度最高区域'])
+    colors = scale.colors([hex_info.get('poi_count', 0) for hex_info in hex_data])
+    raster.add_hexes(png_renderer.hex_polygons(hex_data), colors.tolist(), linewidth=0.5, alpha=0.7)
+
+    # POI密度最高的hex标记
+    max_poi_hex = max(hex_data, key=lambda x: x.get('poi_count', 0))
+    if max_poi_hex.get('poi_count', 0) > 0:
+        max_lat, max_lng = h3.cell_to_latlng(max_poi_hex['h3_index'])
+        raster.add_points([max_lat], [max_lng], 15, 'red', edgecolors='gold', linewidth=4)
+        raster.add_points([max_lat], [max_lng], 6, 'yellow', edgecolors='white', linewidth=2)
+    return raster.save(png_path, basemap_dir)
+
+
+def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: str,
+                           render_mode: str = DEFAULT_RENDER_MODE, png_mode: str = DEFAULT_PNG_MODE,
+                           basemap_dir: Optional[str] = None,
+                           pool: Optional[browser_pool.BrowserPool] = None,
+                           scale: str = colormap.DEFAULT_SCALE) -> bool:
+    """为单个城市创建H3网格可视化地图和PNG，并保存到指定目录，返回地图是否已生成（或已存在）
+
+    render_mode为geojson时所有hex作为一个GeoJson图层绘制，为polygons时每个hex一个folium.Polygon，
+    为compact时只嵌入网格ID和POI数量，hex边界由浏览器计算；
+    png_mode为raster时由网格数据直接绘制PNG（可用basemap_dir指定本地XYZ瓦片底图），为browser时截取HTML地图，
+    提供pool时截图由浏览器池并行完成；scale为POI密度的颜色缩放方式（见colormap.SCALES）
+    """
+    geojson_layer.check_render_mode(render_mode)
+    png_renderer.check_png_mode(png_mode)
+    colormap.check_scale(scale)
     city_name = city_data.get('city_name', '未知城市')
     
     # 为每个城市创建独立的输出目录
@@ -80,24 +121,30 @@ def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: st
 
     if os.path.exists(html_filepath) and os.path.exists(png_filepath):
         print(f"城市 {city_name} 的HTML和PNG地图均已存在，跳过")
-        return
+        return True
 
     try:
         hex_data = city_data.get('hexes', [])
         
         if not hex_data:
             print(f"没有 {city_name} 的H3数据可供可视化")
-            return
+            return False
         
-        # 计算地图中心点
-        lats = [hex_info['lat'] for hex_info in hex_data]
-        lngs = [hex_info['lng'] for hex_info in hex_data]
-        center_lat = sum(lats) / len(lats)
-        center_lng = sum(lngs) / len(lngs)
+        # 计算地图中心点（compact模式由压缩后的父网格得到，不逐个计算hex中心）
+        if render_mode == 'compact':
+            center_lat, center_lng = hex_coverage.grid_coverage(city_data).center()
+        else:
+            lats = [hex_info['lat'] for hex_info in hex_data]
+            lngs = [hex_info['lng'] for hex_info in hex_data]
+            center_lat = sum(lats) / len(lats)
+            center_lng = sum(lngs) / len(lngs)
         
         # 获取最大POI数量用于归一化颜色
         poi_counts = [hex_info.get('poi_count', 0) for hex_info in hex_data]
         max_poi_count = max(poi_counts) if poi_counts else 1
+        # 整个城市的颜色一次计算，HTML、图例和PNG共用
+        color_scale = colormap.ColorScale(poi_counts, scale)
+        hex_colors = color_scale.colors(poi_counts).tolist()
         
         print(f"{city_name} 最大POI密度: {max_poi_count}")
         
@@ -109,40 +156,46 @@ def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: st
         )
         
         # 添加H3网格 - 颜色基于POI密度
-        for i, hex_info in enumerate(hex_data):
-            poi_count = hex_info.get('poi_count', 0)
-            hex_color = get_color_from_density(poi_count, max_poi_count)
+        if render_mode in ('geojson', 'compact'):
+            add_density_layer(m, hex_data, color_scale, weight=0.5, fill_opacity=0.7,
+                              compact=render_mode == 'compact')
+        else:
+            for i, hex_info in enumerate(hex_data):
+                poi_count = hex_info.get('poi_count', 0)
+                hex_color = hex_colors[i]
             
-            # 为每个H3六边形创建多边形
-            folium.Polygon(
-                locations=[(lat, lng) for lng, lat in hex_info['boundary']],
-                popup=f"""
-                    <b>H3网格信息</b><br>
-                    H3 ID: {hex_info['h3_index']}<br>
-                    POI数量: {poi_count}<br>
-                    POI类型分布: {hex_info.get('poi_type_distribution', {})}
-                """,
-                tooltip=f"H3网格 {i+1} - POI: {poi_count}个",
-                color=hex_color,
-                weight=0.5,  # 减少边框粗细
-                fillOpacity=0.7,  # 调整透明度
-                fillColor=hex_color
-            ).add_to(m)
+                # 为每个H3六边形创建多边形
+                folium.Polygon(
+                    locations=[(lat, lng) for lng, lat in hex_info['boundary']],
+                    popup=f"""
+                        <b>H3网格信息</b><br>
+                        H3 ID: {hex_info['h3_index']}<br>
+                        POI数量: {poi_count}<br>
+                        POI类型分布: {hex_info.get('poi_type_distribution', {})}
+                    """,
+                    tooltip=f"H3网格 {i+1} - POI: {poi_count}个",
+                    color=hex_color,
+                    weight=0.5,  # 减少边框粗细
+                    fillOpacity=0.7,  # 调整透明度
+                    fillColor=hex_color
+                ).add_to(m)
         
         # 添加POI密度最高的hex标记
         if poi_counts:
             max_poi_hex = max(hex_data, key=lambda x: x.get('poi_count', 0))
             max_poi_count_actual = max_poi_hex.get('poi_count', 0)
             if max_poi_count_actual > 0:
+                # 只计算这一个hex的中心
+                max_lat, max_lng = h3.cell_to_latlng(max_poi_hex['h3_index'])
                 # 添加大的圆形标记
                 folium.CircleMarker(
-                    location=[max_poi_hex['lat'], max_poi_hex['lng']],
+                    location=[max_lat, max_lng],
                     radius=15,
                     popup=f"""
                         <b>🏆 POI密度最高区域</b><br>
                         H3 ID: {max_poi_hex['h3_index']}<br>
                         POI数量: {max_poi_count_actual}<br>
-                        位置: {max_poi_hex['lat']:.6f}, {max_poi_hex['lng']:.6f}<br>
+                        位置: {max_lat:.6f}, {max_lng:.6f}<br>
                         <b>热点区域！</b>
                     """,
                     color='gold',
@@ -153,7 +206,7 @@ def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: st
                 
                 # 添加一个更小的内圈标记
                 folium.CircleMarker(
-                    location=[max_poi_hex['lat'], max_poi_hex['lng']],
+                    location=[max_lat, max_lng],
                     radius=6,
                     color='white',
                     fillColor='yellow',
@@ -171,15 +224,7 @@ def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: st
         m.get_root().html.add_child(folium.Element(title_html))
         
         # 修改标题和图例的HTML样式以去除顶部白色部分
-        legend_html = '''
-<div style="position: fixed; top: 10px; right: 10px; z-index: 9999; background-color: rgba(0, 0, 0, 0.7); padding: 10px; border-radius: 5px; color: white;">
-    <h4 style="margin: 0; font-size: 16px;">图例</h4>
-    <p style="margin: 0; font-size: 14px;">白色 = 最高密度</p>
-    <p style="margin: 0; font-size: 14px;">黄色 = 中等密度</p>
-    <p style="margin: 0; font-size: 14px;">深灰 = 最低密度</p>
-    <p style="margin: 0; font-size: 14px;">🏆 金色标记 = 密度最高区域</p>
-</div>
-'''
+        legend_html = color_scale.legend_html(['🏆 金色标记 = 密度最高区域'])
 
         m.get_root().html.add_child(folium.Element(legend_html))
         
@@ -196,25 +241,37 @@ def create_single_city_map(city_data: Dict[str, Any], html_dir: str, png_dir: st
         
         # 保存HTML地图
         if not os.path.exists(html_filepath):
+            browser_pool.add_render_signal(m)
             m.save(html_filepath)
             print(f"POI密度地图已保存到: {html_filepath}")
         else:
             print(f"HTML地图 {html_filepath} 已存在，跳过生成。")
 
-        # 生成PNG截图
+        # 生成PNG
         if not os.path.exists(png_filepath):
-            print(f"正在生成 {city_name} 的PNG截图...")
-            html_to_png(html_filepath, png_filepath)
+            if png_mode == 'raster':
+                save_density_png(hex_data, color_scale,
+                                 [f"{city_name} - H3网格POI密度可视化", f"网格数量: {len(hex_data)}",
+                                  f"分辨率: {city_data.get('resolution', 7)}", f"最大POI密度: {max_poi_count}"],
+                                 png_filepath, basemap_dir)
+            else:
+                print(f"正在生成 {city_name} 的PNG截图...")
+                html_to_png(html_filepath, png_filepath, pool)
         else:
             print(f"PNG截图 {png_filepath} 已存在，跳过生成。")
+        return True
 
     except Exception as e:
         print(f"创建 {city_name} POI密度地图时出错: {e}")
+        return False
+
 
+def html_to_png(html_path: str, png_path: str, pool: Optional[browser_pool.BrowserPool] = None):
+    """使用浏览器将HTML文件转换为PNG图像（等待地图中注入的渲染完成标记）
 
-def html_to_png(html_path: str, png_path: str):
-    """使用Selenium将HTML文件转换为PNG图像"""
-    if not webdriver:
+    提供浏览器池时截图提交到池中并行完成，否则临时启动一个浏览器
+    """
+    if not browser_pool.is_available():
         print("Selenium不可用，跳过PNG生成。")
         return
 
@@ -223,75 +280,105 @@ def html_to_png(html_path: str, png_path: str):
         return
 
     try:
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')  # 设置窗口大小
-
-        # 使用webdriver-manager自动管理ChromeDriver
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        # 将本地文件路径转换为URL格式
-        url = f"file:///{os.path.abspath(html_path)}"
-        driver.get(url)
-        
-        # 等待一段时间确保地图完全加载
-        time.sleep(5)
-        
-        driver.save_screenshot(png_path)
-        driver.quit()
-        print(f"PNG截图已保存到: {png_path}")
-        
+        browser_pool.screenshot(html_path, png_path, pool)
     except Exception as e:
         print(f"使用Selenium生成PNG时出错: {e}")
 
 
-def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "html") -> str:
-    """创建所有城市的汇总地图，使用POI密度颜色编码"""
+def load_all_cities(json_dir: str):
+    """读取所有单个城市的JSON文件，返回 ({城市名: 城市数据}, 所有hex列表)，每个hex带有city_name"""
+    all_cities_data = {}
+    all_hex_data = []
+    for filename in os.listdir(json_dir):
+        if filename.endswith('_h3_grid.json') and not filename.startswith('all_cities'):
+            json_path = os.path.join(json_dir, filename)
+            city_data = load_city_json(json_path)
+            if city_data:
+                city_name = city_data.get('city_name', filename.replace('_h3_grid.json', ''))
+                all_cities_data[city_name] = city_data
+                # 收集所有hex数据
+                hex_data = city_data.get('hexes', [])
+                for hex_info in hex_data:
+                    hex_info['city_name'] = city_name  # 添加城市名标识
+                    all_hex_data.append(hex_info)
+    return all_cities_data, all_hex_data
+
+
+def load_overview(json_dir: str):
+    """逐个城市读取摘要文件（不加载网格JSON），返回 (城市中心点列表, {分辨率: {h3_index: [POI数量, 城市名]}}, 全局POI最多的hex)
+
+    每个分辨率对应汇总地图的一个显示级别，低分辨率为按H3父网格聚合后的结果
+    """
+    all_centers = []
+    levels = {resolution: {} for resolution in city_summary.LOD_MIN_ZOOM}
+    global_max_hex = None
+    for summary in city_summary.iter_summaries(json_dir):
+        city_name = summary['city_name']
+        if not summary['h3_index']:
+            continue
+        all_centers.append((summary['center'][0], summary['center'][1], city_name,
+                            summary['total_hexes'], summary['total_pois']))
+
+        # 相邻城市共有的父网格合并POI数量
+        for resolution, cells in levels.items():
+            level = city_summary.aggregate_to_parent(summary, resolution)
+            for h3_index, poi_count in zip(level['h3_index'], level['poi_count']):
+                cell = cells.get(h3_index)
+                if cell is None:
+                    cells[h3_index] = [poi_count, city_name]
+                else:
+                    cell[0] += poi_count
+                    if city_name not in cell[1].split('/'):
+                        cell[1] += f"/{city_name}"
+
+        i = int(np.argmax(summary['poi_count']))
+        if global_max_hex is None or summary['poi_count'][i] > global_max_hex['poi_count']:
+            global_max_hex = {'city_name': city_name, 'h3_index': summary['h3_index'][i],
+                              'poi_count': summary['poi_count'][i], 'lat': summary['lat'][i], 'lng': summary['lng'][i]}
+    return all_centers, levels, global_max_hex
+
+
+def save_overview_png(json_dir: str, png_path: str, basemap_dir: Optional[str] = None,
+                      scale: str = colormap.DEFAULT_SCALE) -> bool:
+    """不经过浏览器直接绘制所有城市的汇总POI密度PNG（只读取摘要文件）"""
+    city_count = 0
+    all_hex_data = []
+    for summary in city_summary.iter_summaries(json_dir):
+        city_count += 1
+        all_hex_data.extend(city_summary.summary_records(summary))
+    if not all_hex_data:
+        print("没有找到城市数据文件")
+        return False
+    global_max_poi = max(hex_info['poi_count'] for hex_info in all_hex_data)
+    color_scale = colormap.ColorScale([hex_info['poi_count'] for hex_info in all_hex_data], scale)
+    return save_density_png(all_hex_data, color_scale,
+                            ["所有城市H3网格POI密度分布", f"总城市数量: {city_count}",
+                             f"总网格数量: {len(all_hex_data)}", f"全局最大POI密度: {global_max_poi}"],
+                            png_path, basemap_dir)
+
+
+def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "html",
+                                   render_mode: str = DEFAULT_RENDER_MODE,
+                                   scale: str = colormap.DEFAULT_SCALE) -> str:
+    """创建所有城市的汇总地图，使用POI密度颜色编码（scale为颜色缩放方式）
+
+    只读取每个城市的摘要文件（xx市_hex_summary.json，见city_summary）；render_mode为geojson或compact时按缩放级别
+    分别显示分辨率5、6的父网格聚合结果和原始的分辨率7网格，每一级按本级的POI数量分布着色
+    """
+    geojson_layer.check_render_mode(render_mode)
+    colormap.check_scale(scale)
     try:
-        all_cities_data = {}
-        all_hex_data = []
-        
-        # 读取所有单个城市的JSON文件
-        for filename in os.listdir(json_dir):
-            if filename.endswith('_h3_grid.json') and not filename.startswith('all_cities'):
-                json_path = os.path.join(json_dir, filename)
-                city_data = load_city_json(json_path)
-                if city_data:
-                    city_name = city_data.get('city_name', filename.replace('_h3_grid.json', ''))
-                    all_cities_data[city_name] = city_data
-                    # 收集所有hex数据
-                    hex_data = city_data.get('hexes', [])
-                    for hex_info in hex_data:
-                        hex_info['city_name'] = city_name  # 添加城市名标识
-                        all_hex_data.append(hex_info)
+        all_centers, levels, global_max_hex = load_overview(json_dir)
         
-        if not all_cities_data:
+        if not all_centers:
             print("没有找到城市数据文件")
             return None
         
-        # 计算全局最大POI数量用于颜色归一化
-        all_poi_counts = [hex_info.get('poi_count', 0) for hex_info in all_hex_data]
-        global_max_poi = max(all_poi_counts) if all_poi_counts else 1
+        full_resolution = max(levels)
+        total_hexes = sum(center[3] for center in all_centers)
+        global_max_poi = global_max_hex['poi_count'] or 1
         print(f"全局最大POI密度: {global_max_poi}")
         
-        # 收集所有城市的中心点
-        all_centers = []
-        for city_name, city_data in all_cities_data.items():
-            hex_data = city_data.get('hexes', [])
-            if hex_data:
-                lats = [hex_info['lat'] for hex_info in hex_data]
-                lngs = [hex_info['lng'] for hex_info in hex_data]
-                center_lat = sum(lats) / len(lats)
-                center_lng = sum(lngs) / len(lngs)
-                total_pois = sum(hex_info.get('poi_count', 0) for hex_info in hex_data)
-                all_centers.append((center_lat, center_lng, city_name, len(hex_data), total_pois))
-        
-        if not all_centers:
-            print("没有有效的城市中心点数据")
-            return None
-        
         # 计算总体地图中心
         overall_center_lat = sum([center[0] for center in all_centers]) / len(all_centers)
         overall_center_lng = sum([center[1] for center in all_centers]) / len(all_centers)
@@ -304,25 +391,55 @@ def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "ht
         )
         
         # 为所有H3网格添加基于POI密度的颜色多边形
-        for hex_info in all_hex_data:
-            poi_count = hex_info.get('poi_count', 0)
-            hex_color = get_color_from_density(poi_count, global_max_poi)
-            city_name = hex_info.get('city_name', '未知')
+        if render_mode in ('geojson', 'compact'):
+            zoom_levels = []
+            min_zooms = sorted(city_summary.LOD_MIN_ZOOM.items())
+            for i, (resolution, min_zoom) in enumerate(min_zooms):
+                cells = levels[resolution]
+                max_zoom = min_zooms[i + 1][1] - 1 if i + 1 < len(min_zooms) else 30
+                level_scale = colormap.ColorScale([cell[0] for cell in cells.values()], scale)
+                colors = level_scale.colors([cell[0] for cell in cells.values()]).tolist()
+                if render_mode == 'compact':
+                    layer = compact_layer.add_compact_layer(
+                        m, list(cells), colors,
+                        style={'weight': 0.3, 'fillOpacity': 0.6},
+                        columns=[('城市', [city_name for _, city_name in cells.values()]),
+                                 ('POI数量', [poi_count for poi_count, _ in cells.values()])]
+                    )
+                else:
+                    properties = [{'city_name': city_name, 'poi_count': poi_count, 'color': color}
+                                  for (poi_count, city_name), color in zip(cells.values(), colors)]
+                    layer = geojson_layer.add_geojson_layer(
+                        m,
+                        geojson_layer.hex_features(cells.keys(), properties),
+                        style=lambda props: {'color': props['color'], 'fillColor': props['color'],
+                                             'weight': 0.3, 'fillOpacity': 0.6},
+                        tooltip=[('city_name', '城市'), ('poi_count', 'POI数量')],
+                        popup=[('city_name', '城市'), ('h3_index', 'H3 ID'), ('poi_count', 'POI数量')]
+                    )
+                zoom_levels.append((layer, min_zoom, max_zoom))
+            geojson_layer.add_zoom_visibility(m, zoom_levels)
+            # 图例显示最高分辨率一级的分段
+            legend_scale = level_scale
+        else:
+            cells = levels[full_resolution]
+            legend_scale = colormap.ColorScale([cell[0] for cell in cells.values()], scale)
+            hex_colors = legend_scale.colors([cell[0] for cell in cells.values()]).tolist()
+            for (h3_index, (poi_count, city_name)), hex_color in zip(cells.items(), hex_colors):
             
-            folium.Polygon(
-                locations=[(lat, lng) for lng, lat in hex_info['boundary']],
-                popup=f"""
-                    <b>城市: {city_name}</b><br>
-                    H3 ID: {hex_info['h3_index']}<br>
-                    POI数量: {poi_count}<br>
-                    POI类型: {hex_info.get('poi_type_distribution', {})}
-                """,
-                tooltip=f"{city_name} - POI: {poi_count}",
-                color=hex_color,
-                weight=0.3,  # 更细的边框
-                fillOpacity=0.6,  # 适中的透明度
-                fillColor=hex_color
-            ).add_to(m)
+                folium.Polygon(
+                    locations=h3.cell_to_boundary(h3_index),
+                    popup=f"""
+                        <b>城市: {city_name}</b><br>
+                        H3 ID: {h3_index}<br>
+                        POI数量: {poi_count}
+                    """,
+                    tooltip=f"{city_name} - POI: {poi_count}",
+                    color=hex_color,
+                    weight=0.3,  # 更细的边框
+                    fillOpacity=0.6,  # 适中的透明度
+                    fillColor=hex_color
+                ).add_to(m)
         
         # 为每个城市添加中心点标记
         marker_colors = ['darkgreen', 'darkblue', 'darkred', 'purple', 'orange', 'black']
@@ -344,57 +461,47 @@ def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "ht
             ).add_to(m)
         
         # 添加全局POI密度最高的hex标记
-        if all_hex_data:
-            global_max_hex = max(all_hex_data, key=lambda x: x.get('poi_count', 0))
-            global_max_poi_count = global_max_hex.get('poi_count', 0)
-            if global_max_poi_count > 0:
-                # 添加全局最高密度标记
-                folium.CircleMarker(
-                    location=[global_max_hex['lat'], global_max_hex['lng']],
-                    radius=20,
-                    popup=f"""
-                        <b>🏆 全局POI密度最高区域</b><br>
-                        城市: {global_max_hex.get('city_name', '未知')}<br>
-                        H3 ID: {global_max_hex['h3_index']}<br>
-                        POI数量: {global_max_poi_count}<br>
-                        位置: {global_max_hex['lat']:.6f}, {global_max_hex['lng']:.6f}<br>
-                        <b>全局热点！</b>
-                    """,
-                    color='gold',
-                    fillColor='red',
-                    fillOpacity=1.0,
-                    weight=5
-                ).add_to(m)
-                
-                # 内圈标记
-                folium.CircleMarker(
-                    location=[global_max_hex['lat'], global_max_hex['lng']],
-                    radius=8,
-                    color='white',
-                    fillColor='yellow',
-                    fillOpacity=1.0,
-                    weight=3
-                ).add_to(m)
+        global_max_poi_count = global_max_hex['poi_count']
+        if global_max_poi_count > 0:
+            # 添加全局最高密度标记
+            folium.CircleMarker(
+                location=[global_max_hex['lat'], global_max_hex['lng']],
+                radius=20,
+                popup=f"""
+                    <b>🏆 全局POI密度最高区域</b><br>
+                    城市: {global_max_hex['city_name']}<br>
+                    H3 ID: {global_max_hex['h3_index']}<br>
+                    POI数量: {global_max_poi_count}<br>
+                    位置: {global_max_hex['lat']:.6f}, {global_max_hex['lng']:.6f}<br>
+                    <b>全局热点！</b>
+                """,
+                color='gold',
+                fillColor='red',
+                fillOpacity=1.0,
+                weight=5
+            ).add_to(m)
+            
+            # 内圈标记
+            folium.CircleMarker(
+                location=[global_max_hex['lat'], global_max_hex['lng']],
+                radius=8,
+                color='white',
+                fillColor='yellow',
+                fillOpacity=1.0,
+                weight=3
+            ).add_to(m)
         
         # 添加标题和图例
         title_html = f'''
                      <h3 align="center" style="font-size:20px; color:white;"><b>所有城市H3网格POI密度分布</b></h3>
-                     <p align="center" style="color:white;">总城市数量: {len(all_cities_data)}</p>
-                     <p align="center" style="color:white;">总网格数量: {len(all_hex_data)}</p>
+                     <p align="center" style="color:white;">总城市数量: {len(all_centers)}</p>
+                     <p align="center" style="color:white;">总网格数量: {total_hexes}</p>
                      <p align="center" style="color:white;">全局最大POI密度: {global_max_poi}</p>
                      '''
         m.get_root().html.add_child(folium.Element(title_html))
         
         # 修改标题和图例的HTML样式以去除顶部白色部分
-        legend_html = '''
-<div style="position: fixed; top: 10px; right: 10px; z-index: 9999; background-color: rgba(0, 0, 0, 0.7); padding: 10px; border-radius: 5px; color: white;">
-    <h4 style="margin: 0; font-size: 16px;">图例</h4>
-    <p style="margin: 0; font-size: 14px;">白色 = 最高密度</p>
-    <p style="margin: 0; font-size: 14px;">黄色 = 中等密度</p>
-    <p style="margin: 0; font-size: 14px;">深灰 = 最低密度</p>
-    <p style="margin: 0; font-size: 14px;">🏆 金色标记 = 密度最高区域</p>
-</div>
-'''
+        legend_html = legend_scale.legend_html(['🏆 金色标记 = 密度最高区域'])
 
         m.get_root().html.add_child(folium.Element(legend_html))
         
@@ -412,6 +519,7 @@ def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "ht
         # 保存地图
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, "all_cities_poi_density_overview.html")
+        browser_pool.add_render_signal(m)
         m.save(output_file)
         
         print(f"汇总POI密度地图已保存到: {output_file}")
@@ -422,8 +530,33 @@ def create_all_cities_overview_map(json_dir: str = "json", output_dir: str = "ht
         return None
 
 
-def visualize_all_cities(json_dir: str = "json", html_dir: str = "html", png_dir: str = "png"):
-    """可视化所有城市的H3网格"""
+def create_overview(json_dir: str, html_dir: str, png_dir: str, render_mode: str = DEFAULT_RENDER_MODE,
+                    png_mode: str = DEFAULT_PNG_MODE, basemap_dir: Optional[str] = None,
+                    pool: Optional[browser_pool.BrowserPool] = None, scale: str = colormap.DEFAULT_SCALE) -> bool:
+    """更新所有城市的汇总地图，PNG不存在时一并生成，返回汇总地图是否更新成功"""
+    overview_html_path = create_all_cities_overview_map(json_dir, html_dir, render_mode, scale)
+    if not overview_html_path:
+        print("汇总地图更新失败")
+        return False
+
+    print("汇总地图更新成功")
+    # 为汇总地图也生成PNG
+    overview_png_path = os.path.join(png_dir, "all_cities_poi_density_overview.png")
+    if not os.path.exists(overview_png_path):
+        if png_mode == 'raster':
+            save_overview_png(json_dir, overview_png_path, basemap_dir, scale)
+        else:
+            html_to_png(overview_html_path, overview_png_path, pool)
+    else:
+        print(f"汇总地图的PNG已存在于 {overview_png_path}，跳过生成。")
+    return True
+
+
+def visualize_all_cities(json_dir: str = "json", html_dir: str = "html", png_dir: str = "png",
+                         render_mode: str = DEFAULT_RENDER_MODE, png_mode: str = DEFAULT_PNG_MODE,
+                         basemap_dir: Optional[str] = None, pool: Optional[browser_pool.BrowserPool] = None,
+                         scale: str = colormap.DEFAULT_SCALE):
+    """可视化所有城市的H3网格（render_mode、png_mode、basemap_dir、pool、scale见create_single_city_map）"""
     print("开始可视化所有城市的H3网格...")
     
     # 获取脚本目录
@@ -451,24 +584,14 @@ def visualize_all_cities(json_dir: str = "json", html_dir: str = "html", png_dir
             city_data = load_city_json(json_filepath)
             
             if city_data:
-                create_single_city_map(city_data, html_dir, png_dir)
+                create_single_city_map(city_data, html_dir, png_dir, render_mode, png_mode, basemap_dir, pool, scale)
                 processed_cities += 1
             else:
                 print(f"加载 {filename} 数据失败")
     
     # 总是更新all_cities汇总地图
     print("\n更新所有城市的汇总地图...")
-    overview_html_path = create_all_cities_overview_map(json_dir, html_dir)
-    if overview_html_path:
-        print("汇总地图更新成功")
-        # 为汇总地图也生成PNG
-        overview_png_path = os.path.join(png_dir, "all_cities_poi_density_overview.png")
-        if not os.path.exists(overview_png_path):
-             html_to_png(overview_html_path, overview_png_path)
-        else:
-            print(f"汇总地图的PNG已存在于 {overview_png_path}，跳过生成。")
-    else:
-        print("汇总地图更新失败")
+    create_overview(json_dir, html_dir, png_dir, render_mode, png_mode, basemap_dir, pool, scale)
     
     print(f"\n可视化完成!")
     print(f"处理了 {processed_cities} 个城市")
@@ -476,5 +599,56 @@ def visualize_all_cities(json_dir: str = "json", html_dir: str = "html", png_dir
     print(f"PNG文件保存在: {png_dir}")
 
 
+def create_tile_pyramid(json_dir: str = "json", tiles_dir: str = "tiles", city_name: Optional[str] = None,
+                        zooms: Optional[List[int]] = None, workers: int = 1,
+                        scale: str = colormap.DEFAULT_SCALE) -> Optional[Dict[str, Any]]:
+    """为单个城市（city_name）或所有城市预渲染POI密度和商场hex的XYZ瓦片金字塔
+
+    瓦片和查看页面保存在 tiles/xx市/ 或 tiles/all_cities/ 下，再次运行时只重新渲染与变化的hex相交的瓦片
+    """
+    if not tile_pyramid.is_available():
+        print("PIL不可用，无法生成瓦片")
+        return None
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    json_dir = os.path.join(script_dir, json_dir)
+    tiles_dir = os.path.join(script_dir, tiles_dir)
+
+    if city_name:
+        city_data = load_city_json(os.path.join(json_dir, f"{city_name}_h3_grid.json"))
+        cities = {city_name: city_data} if city_data else {}
+    else:
+        cities, _ = load_all_cities(json_dir)
+    hex_data = [hex_info for city_data in cities.values() for hex_info in city_data.get('hexes', [])]
+    if not hex_data:
+        print("没有可生成瓦片的城市数据")
+        return None
+
+    # 颜色与HTML地图相同，按本次包含的所有hex归一化
+    color_scale = colormap.ColorScale([hex_info.get('poi_count', 0) for hex_info in hex_data], scale)
+    fill_colors = color_scale.colors([hex_info.get('poi_count', 0) for hex_info in hex_data]).tolist()
+    mall_flags = np.concatenate([mall_classifier.mall_hex_mask(city_data, 'type') for city_data in cities.values()])
+
+    name = city_name or 'all_cities'
+    result = tile_pyramid.build_tile_pyramid(hex_data, fill_colors, mall_flags, os.path.join(tiles_dir, name),
+                                             zooms=zooms, workers=workers, title=f"{name} H3网格POI密度",
+                                             legend=color_scale.legend_entries())
+    print(f"{name}: {result['hexes']} 个hex, 重新渲染 {result['rendered_tiles']} 个瓦片, "
+          f"耗时 {result['seconds']:.2f}s")
+    print(f"瓦片查看页面: {result['viewer']}")
+    return result
+
+
 if __name__ == "__main__":
-    visualize_all_cities()
+    parser = argparse.ArgumentParser(description="城市H3网格POI密度可视化")
+    parser.add_argument('--tiles', action='store_true', help="生成XYZ瓦片金字塔而不是HTML/PNG地图")
+    parser.add_argument('--city', default=None, help="只为该城市生成瓦片（默认所有城市）")
+    parser.add_argument('--zooms', type=int, nargs='+', default=tile_pyramid.DEFAULT_ZOOMS, help="瓦片缩放级别")
+    parser.add_argument('--workers', type=int, default=1, help="并行渲染瓦片的进程数")
+    parser.add_argument('--scale', choices=colormap.SCALES, default=colormap.DEFAULT_SCALE, help="POI密度的颜色缩放方式")
+    args = parser.parse_args()
+
+    if args.tiles:
+        create_tile_pyramid(city_name=args.city, zooms=args.zooms, workers=args.workers, scale=args.scale)
+    else:
+        visualize_all_cities(scale=args.scale)
@@ -14,8 +14,8 @@
 """
 
 import os
-import glob
 import sys
+import time
 
 # 将当前目录添加到系统路径，以便导入其他模块
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -29,11 +29,21 @@ try:
     import mart_mesh
     import json_visualization
     import mart_hex_visualize
+    import png_renderer
+    import browser_pool
+    import render_scheduler
 except ImportError as e:
     print(f"错误：无法导入必要的模块: {e}")
     print("请确保所有必需的 .py 文件 (xlsx_to_csv.py, csv_converter.py, etc.) 都存在于脚本目录中。")
     sys.exit(1)
 
+# PNG生成方式（见png_renderer.PNG_MODES）；browser方式时所有城市共用一个浏览器池，并行截图
+PNG_MODE = png_renderer.DEFAULT_PNG_MODE
+BROWSER_POOL_SIZE = browser_pool.DEFAULT_POOL_SIZE
+# 步骤6同时生成地图的进程数，为1时依次生成
+RENDER_WORKERS = render_scheduler.DEFAULT_WORKERS
+
+
 def main():
     """主函数，按顺序执行所有处理步骤"""
     print("🚀 开始执行数据处理与可视化流程...\n")
@@ -45,7 +55,6 @@ def main():
     # csv_classified_dir 在多个模块中硬编码，这里不需定义
     json_dir = os.path.join(base_dir, 'json')
     mart_analysis_dir = os.path.join(base_dir, 'mart_hex_analysis')
-    html_dir = os.path.join(base_dir, 'html')
 
     # --- 步骤 1: 执行数据转换 (XLS -> CSV) ---
     print("--- 步骤 1 of 6: XLS/XLSX to CSV 数据转换 ---")
@@ -79,20 +88,24 @@ def main():
     # --- 步骤 6: 可视化 ---
     print("--- 步骤 6 of 6: 生成可视化图表 ---")
     
-    # 6.1 城市POI密度可视化
-    print("  -> 6.1: 生成POI密度分布图...")
-    json_visualization.visualize_all_cities(json_dir, html_dir)
-    
-    # 6.2 城市商场Hex可视化
-    print("  -> 6.2: 生成商场Hex分析图...")
-    mart_analysis_files = glob.glob(os.path.join(mart_analysis_dir, '*_mart_hex_analysis.json'))
-    if not mart_analysis_files:
-        print("    - 未找到商场Hex分析文件，跳过可视化。")
-    else:
-        for json_path in mart_analysis_files:
-            city_name = os.path.basename(json_path).replace('_mart_hex_analysis.json', '')
-            print(f"    - 正在处理城市: {city_name}")
-            mart_hex_visualize.visualize_mart_hex_analysis(json_path, base_dir)
+    pool = browser_pool.BrowserPool(BROWSER_POOL_SIZE) if PNG_MODE == 'browser' and browser_pool.is_available() else None
+    start = time.perf_counter()
+    try:
+        # 6.1 城市POI密度图、6.2 商场Hex分析图和汇总地图由进程池并行生成，单个城市出错不影响其他城市
+        print("  -> 6.1/6.2: 生成POI密度分布图和商场Hex分析图...")
+        render_scheduler.render_all(json_dir, mart_analysis_dir, base_dir, workers=RENDER_WORKERS,
+                                    png_mode=PNG_MODE, pool=pool)
+
+        # 等待浏览器池中的截图全部完成
+        if pool is not None:
+            succeeded, failed = pool.wait()
+            print(f"  -> 截图完成: 成功 {succeeded} 张，失败 {len(failed)} 张")
+            for png_path in failed:
+                print(f"    - 失败: {png_path}")
+    finally:
+        if pool is not None:
+            pool.close()
+    print(f"  -> 可视化耗时: {time.perf_counter() - start:.1f}s")
             
     print("✅ 步骤 6 完成\n")
     
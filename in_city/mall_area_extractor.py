@@ -13,16 +13,19 @@ import osmnx as ox
 import geopandas as gpd
 from shapely.geometry import Point, Polygon
 import pandas as pd
+import numpy as np
 import time
 from typing import Dict, List, Any
 
+import poi_store
+import mall_classifier
+import grid_geometry
+
 
 def load_city_json(json_file_path: str) -> Dict[str, Any]:
     """加载单个城市的JSON文件"""
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        return grid_geometry.load_grid(json_file_path)
     except Exception as e:
         print(f"加载文件 {json_file_path} 时出错: {e}")
         return {}
@@ -36,20 +39,18 @@ def extract_mall_pois(city_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     print(f"正在提取 {city_name} 的商场POI...")
     print(f"检索条件: big_type='购物服务' AND mid_type='商场'")
     
-    # 遍历所有hex
-    for hex_info in city_data.get('hexes', []):
-        # 遍历每个hex中的POI
-        for poi in hex_info.get('pois', []):
-            big_type = poi.get('big_type', '')
-            mid_type = poi.get('mid_type', '')
-            
-            # 严格检查是否符合条件：big_type为"购物服务"且mid_type为"商场"
-            if big_type == "购物服务" and mid_type == "商场":
-                mall_poi = poi.copy()
-                mall_poi['hex_id'] = hex_info.get('h3_index', '')
-                mall_poi['hex_center'] = hex_info.get('center', [])
-                mall_pois.append(mall_poi)
-                print(f"  找到商场: {poi.get('name', '未知商场')} (位置: {poi.get('lat', 0):.6f}, {poi.get('lng', 0):.6f})")
+    # 所有hex中的POI一次批量分类（类型规则：big_type为"购物服务"且mid_type为"商场"）
+    hexes = city_data.get('hexes', [])
+    pois = [(hex_info, poi) for hex_info in hexes for poi in hex_info.get('pois', [])]
+    is_mall = mall_classifier.classify_pois([poi for _, poi in pois])['is_mall']
+    
+    for i in np.flatnonzero(is_mall).tolist():
+        hex_info, poi = pois[i]
+        mall_poi = poi.copy()
+        mall_poi['hex_id'] = hex_info.get('h3_index', '')
+        mall_poi['hex_center'] = hex_info.get('center', [])
+        mall_pois.append(mall_poi)
+        print(f"  找到商场: {poi.get('name', '未知商场')} (位置: {poi.get('lat', 0):.6f}, {poi.get('lng', 0):.6f})")
     
     print(f"在 {city_name} 中找到 {len(mall_pois)} 个符合条件的商场POI")
     return mall_pois
@@ -210,6 +211,16 @@ def process_mall_areas(json_dir: str = "json", output_dir: str = "mall_areas"):
                 print(f"无法加载 {city_name} 的数据")
                 continue
             
+            # POI保存在列式存储中时，只读取商场POI（导入时已分类的存储直接按分类列过滤）
+            store_path = poi_store.resolve_store_path(city_data, json_filepath)
+            if (store_path and poi_store.is_available() and os.path.exists(store_path)
+                    and poi_store.has_columns(store_path, ['is_mall'])):
+                mall_filters = [('is_mall', '==', True)]
+            else:
+                mall_filters = [('big_type', '==', mall_classifier.MALL_BIG_TYPE),
+                                ('mid_type', '==', mall_classifier.MALL_MID_TYPE)]
+            poi_store.attach_pois(city_data, json_filepath, filters=mall_filters)
+            
             # 提取商场POI
             mall_pois = extract_mall_pois(city_data)
             
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+商场POI分类器
+所有判断"是否为商场"的模块共用这里的两条规则：
+    1. 类型规则（is_mall）：big_type为"购物服务"且mid_type为"商场"，用于mart_mesh和mall_area_extractor
+    2. 关键词规则（is_mall_keyword）：名称或大类中包含商场关键词，用于mart/mesh_accurater
+关键词预先编译为一个正则表达式，按列批量分类。POI导入时（poi_hex.py）每条POI只分类一次，
+结果作为POI存储中的列保存，每个hex的商场数量写入网格数据（mall_count / mall_keyword_count），
+下游模块直接读取，不再重复分类。
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Set
+
+MALL_BIG_TYPE = "购物服务"
+MALL_MID_TYPE = "商场"
+MALL_TYPE_PAIR = f"{MALL_BIG_TYPE}|{MALL_MID_TYPE}"
+
+MALL_KEYWORDS = ['商场', '购物', '商城', '百货', '超市', '大型超市', '商业综合体',
+                 '购物中心', '商业中心', 'mall', 'shopping']
+# 长关键词在前，忽略大小写（与逐个关键词判断 keyword in text.lower() 等价）
+KEYWORD_PATTERN = re.compile('|'.join(re.escape(k) for k in sorted(MALL_KEYWORDS, key=len, reverse=True)),
+                             re.IGNORECASE)
+
+# POI存储中的分类列，以及网格数据中每个hex对应的计数字段
+FLAG_COLUMNS = ['is_mall', 'is_mall_keyword']
+COUNT_FIELDS = {'is_mall': 'mall_count', 'is_mall_keyword': 'mall_keyword_count'}
+
+# 规则名 -> 分类列
+RULES = {'type': 'is_mall', 'keyword': 'is_mall_keyword'}
+
+
+def match_keywords(values) -> np.ndarray:
+    """values中每个值是否包含商场关键词（相同的值只匹配一次，空值为False）"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    matched = np.array([bool(KEYWORD_PATTERN.search(str(value))) for value in uniques] + [False], dtype=bool)
+    return matched[codes]
+
+
+def is_mall_type(big_types, mid_types) -> np.ndarray:
+    """是否满足类型规则（big_type为购物服务且mid_type为商场）"""
+    big = pd.Series(big_types, dtype=object)
+    mid = pd.Series(mid_types, dtype=object)
+    return ((big == MALL_BIG_TYPE) & (mid == MALL_MID_TYPE)).to_numpy(dtype=bool)
+
+
+def classify(names, big_types, mid_types) -> Dict[str, np.ndarray]:
+    """批量分类一组POI，返回 {分类列: 布尔数组}"""
+    return {
+        'is_mall': is_mall_type(big_types, mid_types),
+        'is_mall_keyword': match_keywords(names) | match_keywords(big_types)
+    }
+
+
+def classify_pois(pois: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """批量分类POI字典列表（内嵌在网格JSON中的POI）"""
+    return classify([poi.get('name', '') for poi in pois],
+                    [poi.get('big_type', '') for poi in pois],
+                    [poi.get('mid_type', '') for poi in pois])
+
+
+def has_hex_counts(city_data: Dict[str, Any]) -> bool:
+    """网格数据中是否已有导入时写入的每个hex的商场数量"""
+    hexes = city_data.get('hexes', [])
+    return bool(hexes) and all(field in hexes[0] for field in COUNT_FIELDS.values())
+
+
+def mall_hex_mask(city_data: Dict[str, Any], rule: str = 'type') -> np.ndarray:
+    """每个hex是否包含商场（与city_data['hexes']按行对齐的布尔数组）
+
+    网格数据中有每个hex的商场数量时直接读取，否则对hex中的POI批量分类
+    """
+    column = RULES[rule]
+    hexes = city_data.get('hexes', [])
+    if has_hex_counts(city_data):
+        return np.array([hex_info.get(COUNT_FIELDS[column], 0) > 0 for hex_info in hexes], dtype=bool)
+
+    pois = [poi for hex_info in hexes for poi in hex_info.get('pois', [])]
+    hex_of_poi = np.repeat(np.arange(len(hexes)), [len(hex_info.get('pois', [])) for hex_info in hexes])
+    flags = classify_pois(pois)[column]
+    mask = np.zeros(len(hexes), dtype=bool)
+    mask[hex_of_poi[flags]] = True
+
+    if rule == 'keyword':
+        # 兼容只有聚合信息的网格：大类分布中出现关键词也视为包含商场
+        for i, hex_info in enumerate(hexes):
+            types = list(hex_info.get('poi_type_distribution', {}))
+            if not mask[i] and types:
+                mask[i] = bool(match_keywords(types).any())
+    return mask
+
+
+def mall_hex_ids(city_data: Dict[str, Any], rule: str = 'type') -> Set[str]:
+    """包含商场的hex的网格ID"""
+    mask = mall_hex_mask(city_data, rule)
+    hexes = city_data.get('hexes', [])
+    return {hexes[i].get('h3_index', '') for i in np.flatnonzero(mask).tolist()}
@@ -10,82 +10,29 @@ import json
 import folium
 import os
 import h3
-import time
 from folium import plugins
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-
-def setup_chrome_driver():
-    """设置Chrome浏览器驱动用于生成PNG截图"""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # 无头模式
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1200")  # 增加高度
-    chrome_options.add_argument("--start-maximized")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-plugins")
-    chrome_options.add_argument("--disable-images")  # 禁用图片加载以加快速度
-    
-    try:
-        driver = webdriver.Chrome(options=chrome_options)
-        # 设置更大的窗口尺寸
-        driver.set_window_size(1920, 1200)
-        return driver
-    except Exception as e:
-        print(f"Chrome驱动设置失败: {e}")
-        print("请确保安装了Chrome浏览器和ChromeDriver")
-        return None
+
+import browser_pool
+import compact_layer
+import geojson_layer
+import png_renderer
+from geojson_layer import DEFAULT_RENDER_MODE
+from png_renderer import DEFAULT_PNG_MODE
 
 
-def html_to_png(html_file_path: str, png_file_path: str) -> bool:
-    """将HTML地图转换为PNG图片"""
+def html_to_png(html_file_path: str, png_file_path: str, pool=None) -> bool:
+    """将HTML地图转换为PNG图片（等待地图中注入的渲染完成标记）
+
+    提供浏览器池时截图提交到池中并行完成（返回True表示已提交），否则临时启动一个浏览器
+    """
+    if not browser_pool.is_available():
+        print("Selenium不可用，请安装selenium和Chrome浏览器")
+        return False
     try:
-        driver = setup_chrome_driver()
-        if not driver:
-            return False
-        
         print(f"正在转换 {os.path.basename(html_file_path)} 为PNG...")
-        
-        # 打开HTML文件
-        file_url = f"file:///{html_file_path.replace(os.sep, '/')}"
-        driver.get(file_url)
-        
-        # 增加等待时间以确保地图和所有元素加载完成
-        time.sleep(5)
-        
-        # 获取页面内容的实际大小并调整窗口
-        try:
-            width = driver.execute_script("return document.body.scrollWidth")
-            height = driver.execute_script("return document.body.scrollHeight")
-            
-            # 确保尺寸合理，防止过大或过小
-            width = max(width, 1024)
-            height = max(height, 768)
-            width = min(width, 4096)  # 限制最大尺寸以避免驱动程序错误
-            height = min(height, 4096)
-
-            driver.set_window_size(width, height)
-            time.sleep(2)  # 等待调整大小后页面重新渲染
-        except Exception as e:
-            print(f"调整窗口大小失败: {e}, 将使用默认大小截图")
-
-        # 截图保存
-        os.makedirs(os.path.dirname(png_file_path), exist_ok=True)
-        driver.save_screenshot(png_file_path)
-        
-        driver.quit()
-        print(f"PNG图片已保存到: {png_file_path}")
-        return True
-        
+        return browser_pool.screenshot(html_file_path, png_file_path, pool)
     except Exception as e:
         print(f"转换PNG失败: {e}")
-        if 'driver' in locals():
-            try:
-                driver.quit()
-            except:
-                pass
         return False
 
 
@@ -100,8 +47,117 @@ def create_city_directories(base_dir: str, city_name: str) -> tuple:
     return html_city_dir, png_city_dir
 
 
-def visualize_mart_hex_analysis(json_path, base_output_dir="."):
-    """根据商场hex分析结果创建可视化地图，保存HTML和PNG格式"""
+def add_analysis_layers(m, mart_hex_analysis, compact=False):
+    """商场hex、邻居hex和中心点各作为一个GeoJson图层加入地图，颜色和标记大小由hex类型决定
+
+    compact为True时改为紧凑图层（只嵌入网格ID和数值，hex边界和中心点由浏览器计算）
+    """
+    kinds = {
+        'mart': {'kind': '商场Hex', 'color': '#FF4444', 'border': '#DD0000', 'radius': 10},
+        'neighbor_mall': {'kind': '邻居商场Hex', 'color': '#FF8800', 'border': '#FF8800', 'radius': 6},
+        'neighbor': {'kind': '邻居Hex', 'color': '#228B22', 'border': '#228B22', 'radius': 4},
+    }
+
+    # 同一hex可能是多个商场hex的邻居，每个图层中只绘制一次
+    mart_hexes = {}
+    neighbor_hexes = {}
+    for analysis in mart_hex_analysis:
+        details = analysis['mart_hex_details']
+        mart_hexes.setdefault(analysis['mart_hex'], ('mart', details))
+        for neighbor_detail in analysis['neighbor_hex_details']:
+            kind = 'neighbor_mall' if neighbor_detail.get('has_mall', False) else 'neighbor'
+            neighbor_hexes.setdefault(neighbor_detail['h3_index'], (kind, neighbor_detail))
+
+    def properties(kind, details):
+        center = details['center']
+        return {'kind': kinds[kind]['kind'], 'style': kind, 'poi_count': details['poi_count'],
+                'center': f"{center[0]:.6f}, {center[1]:.6f}"}
+
+    fields = [('kind', '类型'), ('h3_index', 'Hex ID'), ('poi_count', 'POI数量'), ('center', '中心坐标')]
+    tooltip = [('kind', '类型'), ('poi_count', 'POI数量')]
+
+    for name, hexes, weight, fill_opacity in [('商场Hex', mart_hexes, 2, 0.3), ('邻居Hex', neighbor_hexes, 1, 0.2)]:
+        if compact:
+            compact_layer.add_compact_layer(
+                m, list(hexes), [kinds[kind]['color'] for kind, _ in hexes.values()],
+                style={'weight': weight, 'fillOpacity': fill_opacity}, name=name,
+                columns=[('类型', [kinds[kind]['kind'] for kind, _ in hexes.values()]),
+                         ('POI数量', [details['poi_count'] for _, details in hexes.values()])]
+            )
+            continue
+        geojson_layer.add_geojson_layer(
+            m,
+            geojson_layer.hex_features(list(hexes), [properties(kind, details) for kind, details in hexes.values()]),
+            style=lambda props, weight=weight, fill_opacity=fill_opacity: {
+                'color': kinds[props['style']]['color'], 'fillColor': kinds[props['style']]['color'],
+                'weight': weight, 'fillOpacity': fill_opacity},
+            name=name, tooltip=tooltip, popup=fields
+        )
+
+    # 中心点标记：邻居在下，商场hex在上
+    centers = list(neighbor_hexes.items()) + list(mart_hexes.items())
+    if compact:
+        compact_layer.add_compact_layer(
+            m, [h3_index for h3_index, _ in centers], [kinds[kind]['color'] for _, (kind, _) in centers],
+            style={'fillOpacity': 0.7}, name='中心点', marker=True,
+            edge_colors=[kinds[kind]['border'] for _, (kind, _) in centers],
+            radius=[kinds[kind]['radius'] for _, (kind, _) in centers],
+            columns=[('类型', [kinds[kind]['kind'] for _, (kind, _) in centers]),
+                     ('POI数量', [details['poi_count'] for _, (_, details) in centers])]
+        )
+        return
+    geojson_layer.add_geojson_layer(
+        m,
+        geojson_layer.point_features([details['center'] for _, (_, details) in centers],
+                                     [{'h3_index': h3_index, **properties(kind, details)}
+                                      for h3_index, (kind, details) in centers]),
+        style=lambda props: {'color': kinds[props['style']]['border'], 'fillColor': kinds[props['style']]['color'],
+                             'radius': kinds[props['style']]['radius'],
+                             'fillOpacity': 0.8 if props['style'] == 'mart' else 0.6},
+        name='中心点', tooltip=tooltip, popup=fields,
+        marker=folium.CircleMarker(fill=True)
+    )
+
+
+def save_analysis_png(mart_hex_analysis, city_name, png_file, basemap_dir=None):
+    """不经过浏览器直接绘制商场hex分析PNG（颜色与HTML地图相同）"""
+    mart_hexes = {}
+    neighbor_hexes = {}
+    for analysis in mart_hex_analysis:
+        mart_hexes.setdefault(analysis['mart_hex'], analysis['mart_hex_details'])
+        for neighbor_detail in analysis['neighbor_hex_details']:
+            neighbor_hexes.setdefault(neighbor_detail['h3_index'], neighbor_detail)
+
+    raster = png_renderer.RasterMap([f"{city_name} - 商场Hex分析", f"商场Hex数量: {len(mart_hexes)}"],
+                                    legend_lines=['红色 = 商场Hex', '橙色 = 邻居商场Hex', '绿色 = 普通邻居Hex'],
+                                    dark=False)
+    neighbor_colors = ['#FF8800' if detail.get('has_mall', False) else '#228B22' for detail in neighbor_hexes.values()]
+    raster.add_hexes(png_renderer.cell_polygons(list(neighbor_hexes)), neighbor_colors,
+                     linewidth=1, alpha=0.2, zorder=1)
+    raster.add_hexes(png_renderer.cell_polygons(list(mart_hexes)), '#FF4444', linewidth=2, alpha=0.3, zorder=2)
+
+    # 中心点标记：邻居在下，商场hex在上
+    neighbors = list(neighbor_hexes.values())
+    raster.add_points([d['center'][0] for d in neighbors], [d['center'][1] for d in neighbors],
+                      [6 if d.get('has_mall', False) else 4 for d in neighbors], neighbor_colors,
+                      edgecolors=neighbor_colors, alpha=0.6, zorder=3)
+    marts = list(mart_hexes.values())
+    raster.add_points([d['center'][0] for d in marts], [d['center'][1] for d in marts], 10, '#FF4444',
+                      edgecolors='#DD0000', alpha=0.8, zorder=4)
+    return raster.save(png_file, basemap_dir)
+
+
+def visualize_mart_hex_analysis(json_path, base_output_dir=".", render_mode=DEFAULT_RENDER_MODE,
+                                png_mode=DEFAULT_PNG_MODE, basemap_dir=None, pool=None):
+    """根据商场hex分析结果创建可视化地图，保存HTML和PNG格式
+
+    render_mode为geojson时商场hex、邻居hex和中心点各为一个GeoJson图层，为polygons时每个hex一个folium.Polygon和CircleMarker，
+    为compact时hex图层只嵌入网格ID和数值，边界由浏览器计算；
+    png_mode为raster时由分析结果直接绘制PNG（可用basemap_dir指定本地XYZ瓦片底图），为browser时截取HTML地图，
+    提供pool时截图由浏览器池并行完成
+    """
+    geojson_layer.check_render_mode(render_mode)
+    png_renderer.check_png_mode(png_mode)
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
@@ -160,106 +216,111 @@ def visualize_mart_hex_analysis(json_path, base_output_dir="."):
     total_neighbor_hexes = 0
     
     # 为每个商场hex及其邻居添加标记
-    for analysis in mart_hex_analysis:
-        mart_hex_id = analysis['mart_hex']
-        mart_details = analysis['mart_hex_details']
-        neighbor_details = analysis['neighbor_hex_details']
-        
-        total_mart_hexes += 1
-        total_neighbor_hexes += len(neighbor_details)
+    if render_mode in ('geojson', 'compact'):
+        add_analysis_layers(m, mart_hex_analysis, compact=render_mode == 'compact')
+        total_mart_hexes = len(mart_hex_analysis)
+        total_neighbor_hexes = sum(len(analysis['neighbor_hex_details']) for analysis in mart_hex_analysis)
+    else:
+        for analysis in mart_hex_analysis:
+            mart_hex_id = analysis['mart_hex']
+            mart_details = analysis['mart_hex_details']
+            neighbor_details = analysis['neighbor_hex_details']
         
-        # 添加商场hex（红色，大圆点）
-        mart_center = mart_details['center']
-        mart_poi_count = mart_details['poi_count']
-        
-        # 获取hex边界用于多边形显示
-        try:
-            hex_boundary = h3.h3_to_geo_boundary(mart_hex_id)
-            hex_coords = [[lat, lng] for lat, lng in hex_boundary]
-            
-            # 添加商场hex多边形
-            folium.Polygon(
-                locations=hex_coords,
-                color='#FF4444',
-                weight=2,
-                fill=True,
-                fill_color='#FF4444',
-                fill_opacity=0.3,
-                popup=folium.Popup(f"""
-                    <div style="width: 250px">
-                        <h4>🏬 商场Hex</h4>
-                        <p><b>Hex ID:</b> {mart_hex_id}</p>
-                        <p><b>POI数量:</b> {mart_poi_count}</p>
-                        <p><b>中心坐标:</b> {mart_center[0]:.6f}, {mart_center[1]:.6f}</p>
-                        <p><b>类型:</b> 商场聚集区</p>
-                    </div>
-                """, max_width=300),
-                tooltip=f"商场Hex: {mart_poi_count} POIs"
-            ).add_to(m)
-            
-        except:
-            pass
+            total_mart_hexes += 1
+            total_neighbor_hexes += len(neighbor_details)
         
-        # 商场hex中心点标记
-        folium.CircleMarker(
-            location=mart_center,
-            radius=10,
-            color='#DD0000',
-            fill=True,
-            fill_color='#FF4444',
-            fill_opacity=0.8,
-            popup=f"商场Hex: {mart_poi_count} POIs",
-            tooltip=f"🏬 商场Hex ({mart_poi_count} POIs)"
-        ).add_to(m)
+            # 添加商场hex（红色，大圆点）
+            mart_center = mart_details['center']
+            mart_poi_count = mart_details['poi_count']
         
-        # 添加邻居hex（绿色，小圆点）
-        for neighbor_detail in neighbor_details:
-            neighbor_hex_id = neighbor_detail['h3_index']
-            neighbor_center = neighbor_detail['center']
-            neighbor_poi_count = neighbor_detail['poi_count']
-            has_mall = neighbor_detail.get('has_mall', False)
-            
-            # 获取邻居hex边界
+            # 获取hex边界用于多边形显示
             try:
-                neighbor_boundary = h3.h3_to_geo_boundary(neighbor_hex_id)
-                neighbor_coords = [[lat, lng] for lat, lng in neighbor_boundary]
-                
-                # 邻居hex多边形（如果也是商场hex则用橙色，否则用绿色）
-                neighbor_color = '#FF8800' if has_mall else '#228B22'
+                hex_boundary = h3.cell_to_boundary(mart_hex_id)
+                hex_coords = [[lat, lng] for lat, lng in hex_boundary]
+            
+                # 添加商场hex多边形
                 folium.Polygon(
-                    locations=neighbor_coords,
-                    color=neighbor_color,
-                    weight=1,
+                    locations=hex_coords,
+                    color='#FF4444',
+                    weight=2,
                     fill=True,
-                    fill_color=neighbor_color,
-                    fill_opacity=0.2,
+                    fill_color='#FF4444',
+                    fill_opacity=0.3,
                     popup=folium.Popup(f"""
                         <div style="width: 250px">
-                            <h4>{'🏬 邻居商场Hex' if has_mall else '🏘️ 邻居Hex'}</h4>
-                            <p><b>Hex ID:</b> {neighbor_hex_id}</p>
-                            <p><b>POI数量:</b> {neighbor_poi_count}</p>
-                            <p><b>中心坐标:</b> {neighbor_center[0]:.6f}, {neighbor_center[1]:.6f}</p>
-                            <p><b>类型:</b> {'也含商场' if has_mall else '普通邻居'}</p>
+                            <h4>🏬 商场Hex</h4>
+                            <p><b>Hex ID:</b> {mart_hex_id}</p>
+                            <p><b>POI数量:</b> {mart_poi_count}</p>
+                            <p><b>中心坐标:</b> {mart_center[0]:.6f}, {mart_center[1]:.6f}</p>
+                            <p><b>类型:</b> 商场聚集区</p>
                         </div>
                     """, max_width=300),
-                    tooltip=f"邻居Hex: {neighbor_poi_count} POIs"
+                    tooltip=f"商场Hex: {mart_poi_count} POIs"
                 ).add_to(m)
-                
+            
             except:
                 pass
-            
-            # 邻居hex中心点标记
-            marker_color = '#FF8800' if has_mall else '#228B22'
+        
+            # 商场hex中心点标记
             folium.CircleMarker(
-                location=neighbor_center,
-                radius=6 if has_mall else 4,
-                color=marker_color,
+                location=mart_center,
+                radius=10,
+                color='#DD0000',
                 fill=True,
-                fill_color=marker_color,
-                fill_opacity=0.6,
-                popup=f"邻居Hex: {neighbor_poi_count} POIs",
-                tooltip=f"{'🏬' if has_mall else '🏘️'} 邻居 ({neighbor_poi_count} POIs)"
+                fill_color='#FF4444',
+                fill_opacity=0.8,
+                popup=f"商场Hex: {mart_poi_count} POIs",
+                tooltip=f"🏬 商场Hex ({mart_poi_count} POIs)"
             ).add_to(m)
+        
+            # 添加邻居hex（绿色，小圆点）
+            for neighbor_detail in neighbor_details:
+                neighbor_hex_id = neighbor_detail['h3_index']
+                neighbor_center = neighbor_detail['center']
+                neighbor_poi_count = neighbor_detail['poi_count']
+                has_mall = neighbor_detail.get('has_mall', False)
+            
+                # 获取邻居hex边界
+                try:
+                    neighbor_boundary = h3.cell_to_boundary(neighbor_hex_id)
+                    neighbor_coords = [[lat, lng] for lat, lng in neighbor_boundary]
+                
+                    # 邻居hex多边形（如果也是商场hex则用橙色，否则用绿色）
+                    neighbor_color = '#FF8800' if has_mall else '#228B22'
+                    folium.Polygon(
+                        locations=neighbor_coords,
+                        color=neighbor_color,
+                        weight=1,
+                        fill=True,
+                        fill_color=neighbor_color,
+                        fill_opacity=0.2,
+                        popup=folium.Popup(f"""
+                            <div style="width: 250px">
+                                <h4>{'🏬 邻居商场Hex' if has_mall else '🏘️ 邻居Hex'}</h4>
+                                <p><b>Hex ID:</b> {neighbor_hex_id}</p>
+                                <p><b>POI数量:</b> {neighbor_poi_count}</p>
+                                <p><b>中心坐标:</b> {neighbor_center[0]:.6f}, {neighbor_center[1]:.6f}</p>
+                                <p><b>类型:</b> {'也含商场' if has_mall else '普通邻居'}</p>
+                            </div>
+                        """, max_width=300),
+                        tooltip=f"邻居Hex: {neighbor_poi_count} POIs"
+                    ).add_to(m)
+                
+                except:
+                    pass
+            
+                # 邻居hex中心点标记
+                marker_color = '#FF8800' if has_mall else '#228B22'
+                folium.CircleMarker(
+                    location=neighbor_center,
+                    radius=6 if has_mall else 4,
+                    color=marker_color,
+                    fill=True,
+                    fill_color=marker_color,
+                    fill_opacity=0.6,
+                    popup=f"邻居Hex: {neighbor_poi_count} POIs",
+                    tooltip=f"{'🏬' if has_mall else '🏘️'} 邻居 ({neighbor_poi_count} POIs)"
+                ).add_to(m)
 
     # 自动调整地图边界以包含所有点
     bounds = [[min(c[0] for c in all_centers), min(c[1] for c in all_centers)],
@@ -297,12 +358,16 @@ def visualize_mart_hex_analysis(json_path, base_output_dir="."):
 
     # 保存地图到城市专用目录
     html_file = os.path.join(html_city_dir, f"{city_name}_mart_hex_analysis_map.html")
+    browser_pool.add_render_signal(m)
     m.save(html_file)
     print(f"✅ HTML地图已保存到: {html_file}")
     
     # 生成PNG图片
     png_file = os.path.join(png_city_dir, f"{city_name}_mart_hex_analysis_map.png")
-    png_success = html_to_png(html_file, png_file)
+    if png_mode == 'raster':
+        png_success = save_analysis_png(mart_hex_analysis, city_name, png_file, basemap_dir)
+    else:
+        png_success = html_to_png(html_file, png_file, pool)
     
     print(f"📊 统计: {total_mart_hexes}个商场Hex, {total_neighbor_hexes}个邻居Hex")
     
@@ -9,60 +9,71 @@
 import json
 import os
 import h3
-from typing import Dict, List, Any, Set
+from typing import Dict, List, Any, Set, Optional, Tuple
 from collections import defaultdict
+import numpy as np
 import pandas as pd
 
+import poi_store
+import category_matrix
+import grid_geometry
+from category_matrix import CategoryMatrix
+from hex_index import HexIndex
+import hex_adjacency
+from hex_adjacency import HexAdjacency
+
 
 def load_city_json(json_file_path: str) -> Dict[str, Any]:
     """加载单个城市的JSON文件"""
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        return grid_geometry.load_grid(json_file_path)
     except Exception as e:
         print(f"加载文件 {json_file_path} 时出错: {e}")
         return {}
 
 
-def find_mart_hexes(city_data: Dict[str, Any]) -> Set[str]:
+def find_mart_hexes(city_data: Dict[str, Any], matrix: Optional[CategoryMatrix] = None,
+                    index: Optional[HexIndex] = None) -> Set[str]:
     """找到包含商场POI的hex"""
-    mart_hexes = set()
-    
-    for hex_info in city_data.get('hexes', []):
-        h3_index = hex_info.get('h3_index', '')
-        
-        # 检查是否包含商场POI
-        has_mall = False
-        for poi in hex_info.get('pois', []):
-            big_type = poi.get('big_type', '')
-            mid_type = poi.get('mid_type', '')
-            
-            if big_type == "购物服务" and mid_type == "商场":
-                has_mall = True
-                break
-        
-        if has_mall:
-            mart_hexes.add(h3_index)
-    
-    return mart_hexes
+    if index is None:
+        index = HexIndex(city_data, matrix)
+    return index.mart_hexes()
 
 
-def get_hex_neighbors(h3_index: str) -> List[str]:
-    """获取hex的6个相邻hex"""
+def get_hex_neighbors(h3_index: str, max_k: int = 1) -> List[str]:
+    """获取hex的max_k圈内的相邻hex（max_k为1时为6个相邻hex）"""
     try:
         # 兼容h3 4.x，使用grid_disk
-        neighbors = set(h3.grid_disk(h3_index, 1))
-        neighbors.discard(h3_index)  # 移除自身，只保留6个相邻hex
+        neighbors = set(h3.grid_disk(h3_index, max_k))
+        neighbors.discard(h3_index)  # 移除自身，只保留相邻hex
         return list(neighbors)
     except Exception as e:
         print(f"获取hex {h3_index} 的邻居时出错: {e}")
         return []
 
 
-def analyze_poi_distribution(city_data: Dict[str, Any], hex_indices: List[str]) -> Dict[str, Any]:
+def analyze_poi_distribution(city_data: Dict[str, Any], hex_indices: List[str],
+                             matrix: Optional[CategoryMatrix] = None,
+                             index: Optional[HexIndex] = None) -> Dict[str, Any]:
     """分析指定hex列表中的POI分布"""
-    hex_index_set = set(hex_indices)
+    if matrix is not None:
+        # 直接对类别矩阵的对应行求和
+        rows = matrix.rows_for(hex_indices)
+        category_counts = matrix.aggregate(rows)
+        hex_poi_counts = {h3.int_to_str(cell): int(count) for cell, count in
+                          zip(matrix.cells[rows].tolist(), matrix.poi_counts[rows].tolist())}
+        return {
+            'total_pois': int(matrix.poi_counts[rows].sum()),
+            'big_type_count': category_counts['big_type'],
+            'mid_type_count': category_counts['mid_type'],
+            'poi_type_pairs': category_counts['type_pair'],
+            'hex_poi_counts': hex_poi_counts,
+            'analyzed_hex_count': len(rows)
+        }
+    
+    if index is None:
+        index = HexIndex(city_data, matrix)
+    
     poi_stats = {
         'total_pois': 0,
         'big_type_count': defaultdict(int),
@@ -71,25 +82,24 @@ def analyze_poi_distribution(city_data: Dict[str, Any], hex_indices: List[str])
         'hex_poi_counts': defaultdict(int)
     }
     
-    for hex_info in city_data.get('hexes', []):
-        h3_index = hex_info.get('h3_index', '')
+    # 只访问指定的hex（通过索引定位），按网格顺序统计
+    for row in index.rows_for(hex_indices):
+        h3_index = index.ids[row]
+        pois = index.hexes[row].get('pois', [])
+        hex_poi_count = int(index.poi_count[row])
+        poi_stats['hex_poi_counts'][h3_index] = hex_poi_count
+        poi_stats['total_pois'] += hex_poi_count
         
-        if h3_index in hex_index_set:
-            pois = hex_info.get('pois', [])
-            hex_poi_count = len(pois)
-            poi_stats['hex_poi_counts'][h3_index] = hex_poi_count
-            poi_stats['total_pois'] += hex_poi_count
+        for poi in pois:
+            big_type = poi.get('big_type', '')
+            mid_type = poi.get('mid_type', '')
             
-            for poi in pois:
-                big_type = poi.get('big_type', '')
-                mid_type = poi.get('mid_type', '')
-                
-                if big_type:
-                    poi_stats['big_type_count'][big_type] += 1
-                if mid_type:
-                    poi_stats['mid_type_count'][mid_type] += 1
-                if big_type and mid_type:
-                    poi_stats['poi_type_pairs'][f"{big_type}|{mid_type}"] += 1
+            if big_type:
+                poi_stats['big_type_count'][big_type] += 1
+            if mid_type:
+                poi_stats['mid_type_count'][mid_type] += 1
+            if big_type and mid_type:
+                poi_stats['poi_type_pairs'][f"{big_type}|{mid_type}"] += 1
     
     # 转换defaultdict为普通dict以便JSON序列化
     return {
@@ -102,45 +112,64 @@ def analyze_poi_distribution(city_data: Dict[str, Any], hex_indices: List[str])
     }
 
 
-def get_hex_details(city_data: Dict[str, Any], h3_index: str) -> Dict[str, Any]:
+def compute_ring_distributions(matrix: CategoryMatrix, max_k: int = 1) -> Dict[str, Tuple]:
+    """用稀疏矩阵乘法一次算出所有hex自身、max_k圈内邻居以及两者合计的类别统计
+
+    返回 {统计范围: (hex选择矩阵, 类别计数矩阵, POI数量向量)}
+    """
+    adjacency = HexAdjacency(matrix.cells, max_k)
+    disk = adjacency.disk(max_k)
+    selections = {
+        'self': adjacency.disk(0),
+        'neighbors': (disk - adjacency.disk(0)).tocsr(),
+        'total': disk
+    }
+    return {
+        scope: (selection, (selection @ matrix.matrix).tocsr(), selection @ matrix.poi_counts)
+        for scope, selection in selections.items()
+    }
+
+
+def ring_poi_distribution(matrix: CategoryMatrix, ring_distributions: Dict[str, Tuple],
+                          scope: str, row: int) -> Dict[str, Any]:
+    """从compute_ring_distributions的结果中取出某个hex在指定统计范围内的POI分布"""
+    selection, category_sums, poi_sums = ring_distributions[scope]
+    hex_rows = np.sort(selection.indices[selection.indptr[row]:selection.indptr[row + 1]])
+    category_counts = matrix.block_counts(category_sums[row].toarray().ravel())
+    return {
+        'total_pois': int(poi_sums[row]),
+        'big_type_count': category_counts['big_type'],
+        'mid_type_count': category_counts['mid_type'],
+        'poi_type_pairs': category_counts['type_pair'],
+        'hex_poi_counts': {h3.int_to_str(cell): int(count) for cell, count in
+                           zip(matrix.cells[hex_rows].tolist(), matrix.poi_counts[hex_rows].tolist())},
+        'analyzed_hex_count': len(hex_rows)
+    }
+
+
+def get_hex_details(city_data: Dict[str, Any], h3_index: str,
+                    matrix: Optional[CategoryMatrix] = None,
+                    index: Optional[HexIndex] = None) -> Dict[str, Any]:
     """获取单个hex的详细信息"""
-    for hex_info in city_data.get('hexes', []):
-        if hex_info.get('h3_index') == h3_index:
-            return {
-                'h3_index': h3_index,
-                'center': hex_info.get('center', []),
-                'poi_count': len(hex_info.get('pois', [])),
-                'has_mall': any(
-                    poi.get('big_type') == "购物服务" and poi.get('mid_type') == "商场"
-                    for poi in hex_info.get('pois', [])
-                )
-            }
-    
-    # 如果在数据中找不到该hex，返回基本信息
-    try:
-        center_coords = h3.h3_to_geo(h3_index)
-        return {
-            'h3_index': h3_index,
-            'center': [center_coords[0], center_coords[1]],  # [lat, lng]
-            'poi_count': 0,
-            'has_mall': False
-        }
-    except:
-        return {
-            'h3_index': h3_index,
-            'center': [0, 0],
-            'poi_count': 0,
-            'has_mall': False
-        }
+    if index is None:
+        index = HexIndex(city_data, matrix)
+    return index.details(h3_index)
 
 
-def analyze_mart_hexes(city_data: Dict[str, Any]) -> Dict[str, Any]:
-    """分析商场hex及其邻居hex的POI分布"""
+def analyze_mart_hexes(city_data: Dict[str, Any], matrix: Optional[CategoryMatrix] = None,
+                       max_k: int = 1) -> Dict[str, Any]:
+    """分析商场hex及其max_k圈内邻居hex的POI分布
+
+    提供类别矩阵时，所有商场hex的邻域统计由一次稀疏矩阵乘法得到，否则逐个商场hex统计
+    """
     city_name = city_data.get('city_name', '未知城市')
     print(f"正在分析城市: {city_name}")
     
+    # 对城市网格建立一次索引，之后所有hex统计都是索引查找
+    index = HexIndex(city_data, matrix)
+    
     # 找到所有包含商场的hex
-    mart_hexes = find_mart_hexes(city_data)
+    mart_hexes = find_mart_hexes(city_data, matrix, index)
     print(f"找到 {len(mart_hexes)} 个包含商场的hex")
     
     if not mart_hexes:
@@ -151,28 +180,38 @@ def analyze_mart_hexes(city_data: Dict[str, Any]) -> Dict[str, Any]:
             'mart_hex_analysis': []
         }
     
+    ring_distributions = None
+    if matrix is not None and hex_adjacency.is_available():
+        ring_distributions = compute_ring_distributions(matrix, max_k)
+    
     mart_hex_analysis = []
     
     for i, mart_hex in enumerate(mart_hexes, 1):
         print(f"处理商场hex {i}/{len(mart_hexes)}: {mart_hex}")
         
-        # 获取相邻的6个hex
-        neighbor_hexes = get_hex_neighbors(mart_hex)
+        # 获取max_k圈内的相邻hex
+        neighbor_hexes = get_hex_neighbors(mart_hex, max_k)
         print(f"  找到 {len(neighbor_hexes)} 个相邻hex")
-        
-        # 分析商场hex自身的POI分布
-        mart_hex_analysis_result = analyze_poi_distribution(city_data, [mart_hex])
-        
-        # 分析相邻hex的POI分布
-        neighbor_analysis = analyze_poi_distribution(city_data, neighbor_hexes)
-        
-        # 分析所有7个hex（商场hex + 6个相邻hex）的总体分布
         all_hexes = [mart_hex] + neighbor_hexes
-        total_analysis = analyze_poi_distribution(city_data, all_hexes)
+        
+        if ring_distributions is not None:
+            row = int(matrix.rows_for([mart_hex])[0])
+            mart_hex_analysis_result = ring_poi_distribution(matrix, ring_distributions, 'self', row)
+            neighbor_analysis = ring_poi_distribution(matrix, ring_distributions, 'neighbors', row)
+            total_analysis = ring_poi_distribution(matrix, ring_distributions, 'total', row)
+        else:
+            # 分析商场hex自身的POI分布
+            mart_hex_analysis_result = analyze_poi_distribution(city_data, [mart_hex], matrix, index)
+            
+            # 分析相邻hex的POI分布
+            neighbor_analysis = analyze_poi_distribution(city_data, neighbor_hexes, matrix, index)
+            
+            # 分析商场hex及相邻hex的总体分布
+            total_analysis = analyze_poi_distribution(city_data, all_hexes, matrix, index)
         
         # 获取hex详细信息
-        mart_hex_details = get_hex_details(city_data, mart_hex)
-        neighbor_hex_details = [get_hex_details(city_data, h) for h in neighbor_hexes]
+        mart_hex_details = get_hex_details(city_data, mart_hex, matrix, index)
+        neighbor_hex_details = [get_hex_details(city_data, h, matrix, index) for h in neighbor_hexes]
         
         mart_analysis = {
             'mart_hex': mart_hex,
@@ -193,15 +232,17 @@ def analyze_mart_hexes(city_data: Dict[str, Any]) -> Dict[str, Any]:
         'mart_hex_analysis': mart_hex_analysis,
         'summary': {
             'total_mart_hexes': len(mart_hexes),
-            'total_analyzed_areas': len(mart_hexes) * 7,  # 每个商场hex分析7个hex（自身+6个邻居）
+            'max_k': max_k,
+            # 每个商场hex分析 3k(k+1)+1 个hex（k为1时为自身+6个邻居）
+            'total_analyzed_areas': len(mart_hexes) * (3 * max_k * (max_k + 1) + 1),
         }
     }
     
     return result
 
 
-def process_cities(json_dir: str, output_dir: str):
-    """处理所有城市的商场hex分析"""
+def process_cities(json_dir: str, output_dir: str, max_k: int = 1):
+    """处理所有城市的商场hex分析，max_k为统计邻居hex的圈数"""
     if not os.path.exists(json_dir):
         print(f"JSON目录不存在: {json_dir}")
         return
@@ -229,8 +270,13 @@ def process_cities(json_dir: str, output_dir: str):
                 print(f"无法加载 {city_name} 的数据")
                 continue
             
+            # 有类别矩阵时直接使用矩阵，否则从POI存储中只读取分析需要的类别列
+            matrix = category_matrix.load_for_grid(city_data, json_filepath)
+            if matrix is None:
+                poi_store.attach_pois(city_data, json_filepath, columns=['big_type', 'mid_type'])
+            
             # 分析商场hex
-            analysis_result = analyze_mart_hexes(city_data)
+            analysis_result = analyze_mart_hexes(city_data, matrix, max_k)
             
             # 保存分析结果
             with open(city_output_file, 'w', encoding='utf-8') as f:
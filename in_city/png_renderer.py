@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PNG栅格渲染
+不经过浏览器，直接由网格数据把hex多边形批量绘制为PNG（matplotlib PolyCollection，每个图层一次绘制），
+可选叠加本地缓存的XYZ瓦片底图（{basemap_dir}/{z}/{x}/{y}.png）。坐标使用Web墨卡托投影，与在线地图一致。
+不需要Chrome和网络，单个城市的密度图和商场hex图都在一秒内完成。
+"""
+
+import os
+import math
+import warnings
+import h3
+import numpy as np
+from typing import Dict, List, Any, Optional, Sequence, Union
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib import font_manager
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# PNG生成方式：raster为本模块直接绘制，browser为用浏览器截取HTML地图
+PNG_MODES = ('raster', 'browser')
+DEFAULT_PNG_MODE = 'raster'
+
+# 输出尺寸与浏览器截图一致（1920x1080）
+IMAGE_WIDTH = 1920
+IMAGE_HEIGHT = 1080
+DPI = 100
+
+EARTH_RADIUS = 6378137.0
+WORLD_WIDTH = 2 * math.pi * EARTH_RADIUS
+TILE_SIZE = 256
+MAX_TILE_ZOOM = 18
+
+# 按顺序查找可显示中文的字体
+CJK_FONTS = ['Microsoft YaHei', 'SimHei', 'Noto Sans CJK SC', 'Source Han Sans SC',
+             'WenQuanYi Zen Hei', 'PingFang SC', 'Heiti SC']
+
+_cjk_font = None
+
+
+def check_png_mode(png_mode: str) -> str:
+    """检查PNG生成方式是否受支持"""
+    if png_mode not in PNG_MODES:
+        raise ValueError(f"不支持的PNG生成方式: {png_mode}，可选: {', '.join(PNG_MODES)}")
+    return png_mode
+
+
+def cjk_font() -> Optional[str]:
+    """系统中可显示中文的字体名，没有时返回None"""
+    global _cjk_font
+    if _cjk_font is None:
+        installed = {font.name for font in font_manager.fontManager.ttflist}
+        _cjk_font = next((name for name in CJK_FONTS if name in installed), '')
+        if not _cjk_font:
+            print(f"警告: 没有找到可显示中文的字体（{', '.join(CJK_FONTS)}），PNG中的中文标题和图例将显示为方框")
+    return _cjk_font or None
+
+
+def to_mercator(lng, lat):
+    """经纬度（WGS-84）批量转换为Web墨卡托坐标（米）"""
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = np.radians(lng) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def _rings_to_mercator(rings: List[List[Sequence[float]]]) -> List[np.ndarray]:
+    """一组[lng, lat]边界环一次性转换为墨卡托坐标，返回每个环的(n, 2)数组"""
+    if not rings:
+        return []
+    sizes = [len(ring) for ring in rings]
+    coords = np.array([point for ring in rings for point in ring], dtype=np.float64).reshape(-1, 2)
+    x, y = to_mercator(coords[:, 0], coords[:, 1])
+    return np.split(np.column_stack([x, y]), np.cumsum(sizes)[:-1])
+
+
+def hex_polygons(hexes: List[Dict[str, Any]]) -> List[np.ndarray]:
+    """网格数据中hex的墨卡托多边形（使用boundary，没有时由h3_index计算）"""
+    rings = [hex_info.get('boundary') or [(lng, lat) for lat, lng in h3.cell_to_boundary(hex_info['h3_index'])]
+             for hex_info in hexes]
+    return _rings_to_mercator(rings)
+
+
+def cell_polygons(h3_indices: List[str]) -> List[np.ndarray]:
+    """网格ID对应的墨卡托多边形"""
+    return _rings_to_mercator([[(lng, lat) for lat, lng in h3.cell_to_boundary(h)] for h in h3_indices])
+
+
+def _tile_range(x_min: float, x_max: float, y_min: float, y_max: float, zoom: int):
+    """墨卡托范围在zoom级别下覆盖的瓦片行列范围"""
+    tile_span = WORLD_WIDTH / (2 ** zoom)
+    half = WORLD_WIDTH / 2
+    last = 2 ** zoom - 1
+    tx0 = min(max(int((x_min + half) // tile_span), 0), last)
+    tx1 = min(max(int((x_max + half) // tile_span), 0), last)
+    ty0 = min(max(int((half - y_max) // tile_span), 0), last)
+    ty1 = min(max(int((half - y_min) // tile_span), 0), last)
+    return tx0, tx1, ty0, ty1, tile_span, half
+
+
+class RasterMap:
+    """一张PNG地图：若干hex图层和点图层，保存时按全部要素的范围取景"""
+
+    def __init__(self, title_lines: Optional[List[str]] = None, legend_lines: Optional[List[str]] = None,
+                 dark: bool = True):
+        self.title_lines = title_lines or []
+        self.legend_lines = legend_lines or []
+        self.dark = dark
+        self.figure = Figure(figsize=(IMAGE_WIDTH / DPI, IMAGE_HEIGHT / DPI), dpi=DPI,
+                             facecolor='#000000' if dark else '#ffffff')
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_axes([0, 0, 1, 1])
+        self.ax.set_axis_off()
+        self.ax.set_facecolor(self.figure.get_facecolor())
+        self._bounds = []
+
+    def add_hexes(self, polygons: List[np.ndarray], facecolors: Union[str, Sequence[str]],
+                  edgecolors: Union[str, Sequence[str], None] = None, linewidth: float = 0.5,
+                  alpha: float = 0.7, zorder: int = 2) -> None:
+        """一个hex图层，所有多边形作为一个PolyCollection绘制"""
+        if not polygons:
+            return
+        collection = PolyCollection(polygons, facecolors=facecolors,
+                                    edgecolors=facecolors if edgecolors is None else edgecolors,
+                                    linewidths=linewidth, alpha=alpha, zorder=zorder)
+        self.ax.add_collection(collection)
+        points = np.concatenate(polygons)
+        self._bounds.append((points[:, 0].min(), points[:, 0].max(), points[:, 1].min(), points[:, 1].max()))
+
+    def add_points(self, lats: Sequence[float], lngs: Sequence[float], sizes: Union[float, Sequence[float]],
+                   facecolors: Union[str, Sequence[str]], edgecolors: Union[str, Sequence[str]] = 'white',
+                   linewidth: float = 1.0, alpha: float = 1.0, zorder: int = 3) -> None:
+        """一个点图层（圆点标记，sizes为像素半径）"""
+        if len(lats) == 0:
+            return
+        x, y = to_mercator(lngs, lats)
+        sizes = np.square(np.asarray(sizes, dtype=np.float64) * 72 / DPI)
+        self.ax.scatter(x, y, s=sizes, c=facecolors, edgecolors=edgecolors, linewidths=linewidth,
+                        alpha=alpha, zorder=zorder)
+        self._bounds.append((x.min(), x.max(), y.min(), y.max()))
+
+    def _fit_view(self, padding: float = 0.05):
+        """按全部要素的范围取景，并扩展到与图片相同的宽高比"""
+        bounds = np.array(self._bounds)
+        x_min, x_max = bounds[:, 0].min(), bounds[:, 1].max()
+        y_min, y_max = bounds[:, 2].min(), bounds[:, 3].max()
+        width = max(x_max - x_min, 1.0) * (1 + 2 * padding)
+        height = max(y_max - y_min, 1.0) * (1 + 2 * padding)
+        aspect = IMAGE_WIDTH / IMAGE_HEIGHT
+        if width / height < aspect:
+            width = height * aspect
+        else:
+            height = width / aspect
+        cx, cy = (x_min + x_max) / 2, (y_min + y_max) / 2
+        extent = (cx - width / 2, cx + width / 2, cy - height / 2, cy + height / 2)
+        self.ax.set_xlim(extent[0], extent[1])
+        self.ax.set_ylim(extent[2], extent[3])
+        return extent
+
+    def _draw_basemap(self, basemap_dir: str, extent) -> bool:
+        """拼接本地XYZ瓦片作为底图；所需级别没有瓦片时依次使用更低的级别"""
+        if Image is None:
+            print("PIL不可用，跳过底图")
+            return False
+        x_min, x_max, y_min, y_max = extent
+        zoom = int(math.log2(IMAGE_WIDTH * WORLD_WIDTH / ((x_max - x_min) * TILE_SIZE)))
+        zoom = min(max(zoom, 0), MAX_TILE_ZOOM)
+        while zoom > 0 and not os.path.isdir(os.path.join(basemap_dir, str(zoom))):
+            zoom -= 1
+
+        tx0, tx1, ty0, ty1, tile_span, half = _tile_range(x_min, x_max, y_min, y_max, zoom)
+        canvas = Image.new('RGB', ((tx1 - tx0 + 1) * TILE_SIZE, (ty1 - ty0 + 1) * TILE_SIZE),
+                           (0, 0, 0) if self.dark else (255, 255, 255))
+        found = 0
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                tile_path = os.path.join(basemap_dir, str(zoom), str(tx), f"{ty}.png")
+                if os.path.exists(tile_path):
+                    with Image.open(tile_path) as tile:
+                        canvas.paste(tile.convert('RGB').resize((TILE_SIZE, TILE_SIZE)),
+                                     ((tx - tx0) * TILE_SIZE, (ty - ty0) * TILE_SIZE))
+                    found += 1
+        if not found:
+            print(f"底图目录 {basemap_dir} 中没有覆盖该范围的瓦片，跳过底图")
+            return False
+
+        self.ax.imshow(np.asarray(canvas), zorder=0, interpolation='bilinear',
+                       extent=(tx0 * tile_span - half, (tx1 + 1) * tile_span - half,
+                               half - (ty1 + 1) * tile_span, half - ty0 * tile_span))
+        return True
+
+    def _draw_text(self):
+        """标题（上方居中）和图例（右上角）"""
+        color = 'white' if self.dark else 'black'
+        font = {'family': cjk_font()} if cjk_font() else {}
+        for i, line in enumerate(self.title_lines):
+            self.figure.text(0.5, 0.97 - i * 0.035, line, ha='center', va='top', color=color,
+                             fontsize=18 if i == 0 else 12, fontweight='bold' if i == 0 else 'normal', **font)
+        if self.legend_lines:
+            self.figure.text(0.99, 0.98, '\n'.join(['图例'] + self.legend_lines), ha='right', va='top',
+                             color='white', fontsize=11, linespacing=1.5, multialignment='left',
+                             bbox={'facecolor': 'black', 'alpha': 0.7, 'boxstyle': 'round'}, **font)
+
+    def save(self, png_path: str, basemap_dir: Optional[str] = None) -> bool:
+        """绘制底图和文字并保存PNG，没有任何要素时返回False"""
+        if not self._bounds:
+            print(f"没有可绘制的要素，跳过 {png_path}")
+            return False
+        extent = self._fit_view()
+        if basemap_dir and os.path.isdir(basemap_dir):
+            self._draw_basemap(basemap_dir, extent)
+            self.ax.set_xlim(extent[0], extent[1])
+            self.ax.set_ylim(extent[2], extent[3])
+        self._draw_text()
+
+        os.makedirs(os.path.dirname(os.path.abspath(png_path)), exist_ok=True)
+        with warnings.catch_warnings():
+            if cjk_font() is None:
+                # 没有中文字体时cjk_font()已提示过一次，不再逐字重复缺字警告
+                warnings.filterwarnings('ignore', message=r'Glyph \d+ .*missing from', category=UserWarning)
+            self.figure.savefig(png_path, dpi=DPI, facecolor=self.figure.get_facecolor())
+        print(f"PNG图片已保存到: {png_path}")
+        return True
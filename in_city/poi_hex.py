@@ -2,17 +2,53 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
+import numpy as np
 import h3
-import json
+from h3.api import basic_int as h3_int
 import os
-from typing import Dict, List, Any, Tuple
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Tuple, Iterator, Optional
 from collections import defaultdict
 
+import csv_converter
+import poi_store
+import category_matrix
+import city_summary
+import coord_transform
+import grid_geometry
+import grid_manifest
+import mall_classifier
+
+
+# POI字典字段 -> CSV列名
+POI_FIELDS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('province', 'pname'),
+    ('city', 'cityname'),
+    ('district', 'adname'),
+    ('big_type', 'bigType'),
+    ('mid_type', 'midType'),
+    ('small_type', 'smallType'),
+]
+
+# 分配时同时计算的H3分辨率（最细分辨率由坐标计算，其余由cell_to_parent得到）
+POI_RESOLUTIONS = (7, 8, 9, 10)
+
+# POI坐标的数据来源（决定转换到WGS-84前的坐标系，见coord_transform.SOURCE_COORD_SYSTEMS）
+POI_SOURCE = 'amap'
+
+# 估算CSV行数时使用的平均每行字节数
+AVG_CSV_ROW_BYTES = 160
+
 
 def load_city_csv(csv_file_path: str) -> pd.DataFrame:
     """加载城市POI的CSV文件"""
     try:
-        df = pd.read_csv(csv_file_path)
+        df = pd.concat(csv_converter.iter_poi_csv_chunks(csv_file_path), ignore_index=True)
         print(f"加载CSV文件成功，共有 {len(df)} 条POI记录")
         return df
     except Exception as e:
@@ -20,11 +56,15 @@ def load_city_csv(csv_file_path: str) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+def save_city_h3_json(json_file_path: str, data: Dict[str, Any]) -> None:
+    """保存城市H3网格的JSON文件（只保存网格ID和hex属性，先写临时文件再替换，见grid_geometry）"""
+    grid_geometry.save_grid(json_file_path, data)
+
+
 def load_city_h3_json(json_file_path: str) -> Dict[str, Any]:
     """加载城市H3网格的JSON文件"""
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = grid_geometry.load_grid(json_file_path)
         print(f"加载JSON文件成功，共有 {data.get('total_hexes', 0)} 个H3网格")
         return data
     except Exception as e:
@@ -44,50 +84,145 @@ def parse_location(location_str: str) -> Tuple[float, float]:
         return None, None
 
 
-def assign_pois_to_hexes(df: pd.DataFrame, h3_data: Dict[str, Any]) -> Dict[str, List[Dict]]:
+def split_location_column(locations: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """一次性将location列（"lng,lat"）拆分为float64的纬度、经度数组，无法解析的记为NaN"""
+    parts = locations.astype(str).str.strip().str.strip('"').str.split(',', n=1, expand=True)
+    if parts.shape[1] < 2:
+        nan = np.full(len(locations), np.nan)
+        return nan, nan.copy()
+
+    lng = pd.to_numeric(parts[0].str.strip(), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    lat = pd.to_numeric(parts[1].str.strip(), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return lat, lng
+
+
+def latlng_to_cells(lat: np.ndarray, lng: np.ndarray, resolution: int = 7) -> np.ndarray:
+    """批量计算经纬度对应的H3网格ID（uint64），无效坐标对应0"""
+    cells = np.zeros(len(lat), dtype=np.uint64)
+    valid = np.isfinite(lat) & np.isfinite(lng) & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+    valid_idx = np.flatnonzero(valid)
+
+    cells[valid_idx] = np.fromiter(
+        (h3_int.latlng_to_cell(a, b, resolution)
+         for a, b in zip(lat[valid_idx].tolist(), lng[valid_idx].tolist())),
+        dtype=np.uint64,
+        count=len(valid_idx)
+    )
+    return cells
+
+
+def derive_parent_cells(cells: np.ndarray, resolution: int) -> np.ndarray:
+    """由细分辨率网格ID批量得到指定分辨率的父网格ID（0保持为0），每个唯一网格只计算一次"""
+    unique_cells, inverse = np.unique(cells, return_inverse=True)
+    parents = np.fromiter(
+        (h3_int.cell_to_parent(cell, resolution) if cell else 0 for cell in unique_cells.tolist()),
+        dtype=np.uint64,
+        count=len(unique_cells)
+    )
+    return parents[inverse.reshape(-1)]
+
+
+class HexAssignment:
+    """POI到H3网格的列式分配结果
+
+    cells为排序后的唯一网格ID，order为按网格排序后的POI行号，
+    第i个网格的POI行号为 order[starts[i]:starts[i] + counts[i]]；
+    cells_by_res保存每条POI在各分辨率下的网格ID
+    """
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, cells_by_res: Dict[int, np.ndarray], resolution: int = 7):
+        self.lat = lat
+        self.lng = lng
+        self.resolution = resolution
+        self.cells_by_res = cells_by_res
+        self.poi_cells = poi_cells = cells_by_res[resolution]
+
+        assigned = np.flatnonzero(poi_cells != 0)
+        self.order = assigned[np.argsort(poi_cells[assigned], kind='stable')]
+        self.cells, self.starts, self.counts = np.unique(
+            poi_cells[self.order], return_index=True, return_counts=True
+        )
+        self.successful = len(self.order)
+        self.failed = len(poi_cells) - self.successful
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def hex_ids(self) -> List[str]:
+        """返回所有网格ID（字符串形式）"""
+        return [h3.int_to_str(cell) for cell in self.cells.tolist()]
+
+    def rows(self, h3_id: str) -> np.ndarray:
+        """返回指定网格中POI的行号切片"""
+        cell = np.uint64(h3.str_to_int(h3_id))
+        pos = np.searchsorted(self.cells, cell)
+        if pos >= len(self.cells) or self.cells[pos] != cell:
+            return self.order[:0]
+        return self.order[self.starts[pos]:self.starts[pos] + self.counts[pos]]
+
+    def items(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """依次返回 (网格ID, POI行号切片)"""
+        for h3_id, start, count in zip(self.hex_ids(), self.starts.tolist(), self.counts.tolist()):
+            yield h3_id, self.order[start:start + count]
+
+
+def compute_hex_assignment(df: pd.DataFrame, resolution: int = 7,
+                           resolutions: Tuple[int, ...] = POI_RESOLUTIONS,
+                           source: str = POI_SOURCE) -> HexAssignment:
+    """列式计算POI在各分辨率下所属的H3网格，并按resolution分辨率的网格分组POI行号
+
+    POI坐标先按数据来源source转换为WGS-84（与城市边界和H3网格一致），返回结果中的lat/lng为转换后的坐标。
+    坐标只在最细的分辨率上计算一次，较粗的分辨率由cell_to_parent得到，
+    保证各分辨率之间严格的父子关系（H3子网格并不完全落在父网格内，
+    因此边界附近少量POI的粗分辨率网格与直接按坐标计算的结果不同）
+    """
+    lat, lng = split_location_column(df['location'])
+    lng, lat = coord_transform.to_wgs84(lng, lat, source)
+
+    all_resolutions = sorted(set(resolutions) | {resolution})
+    finest = all_resolutions[-1]
+    cells_by_res = {finest: latlng_to_cells(lat, lng, finest)}
+    for res in all_resolutions[:-1]:
+        cells_by_res[res] = derive_parent_cells(cells_by_res[finest], res)
+
+    return HexAssignment(lat, lng, cells_by_res, resolution)
+
+
+def hex_assignment_to_poi_map(df: pd.DataFrame, assignment: HexAssignment) -> Dict[str, List[Dict]]:
+    """将列式分配结果转换为 {网格ID: [POI字典]} 的形式，兼容原有下游模块"""
+    columns = {field: df[column].tolist() for field, column in POI_FIELDS}
+    lat = assignment.lat.tolist()
+    lng = assignment.lng.tolist()
+
+    hex_poi_map = {}
+    for h3_id, rows in assignment.items():
+        hex_poi_map[h3_id] = [
+            {
+                'id': columns['id'][i],
+                'name': columns['name'][i],
+                'lat': lat[i],
+                'lng': lng[i],
+                'province': columns['province'][i],
+                'city': columns['city'][i],
+                'district': columns['district'][i],
+                'big_type': columns['big_type'][i],
+                'mid_type': columns['mid_type'][i],
+                'small_type': columns['small_type'][i]
+            }
+            for i in rows.tolist()
+        ]
+    return hex_poi_map
+
+
+def assign_pois_to_hexes(df: pd.DataFrame, h3_data: Dict[str, Any],
+                         source: str = POI_SOURCE) -> Dict[str, List[Dict]]:
     """将POI分配到H3网格中"""
-    hex_poi_map = defaultdict(list)
-    successful_assignments = 0
-    failed_assignments = 0
-    
     print("开始将POI分配到H3网格...")
-    
-    for idx, row in df.iterrows():
-        if idx % 10000 == 0:
-            print(f"已处理 {idx} / {len(df)} 条POI记录")
-        
-        # 解析位置
-        lat, lng = parse_location(row['location'])
-        if lat is None or lng is None:
-            failed_assignments += 1
-            continue
-        
-        # 获取该位置对应的H3网格ID
-        try:
-            h3_id = h3.latlng_to_cell(lat, lng, 7)  # 使用分辨率7
-            
-            # 创建POI信息
-            poi_info = {
-                'id': row['id'],
-                'name': row['name'],
-                'lat': lat,
-                'lng': lng,
-                'province': row['pname'],
-                'city': row['cityname'],
-                'district': row['adname'],
-                'big_type': row['bigType'],
-                'mid_type': row['midType'],
-                'small_type': row['smallType']
-            }
-            
-            hex_poi_map[h3_id].append(poi_info)
-            successful_assignments += 1
-            
-        except Exception as e:
-            failed_assignments += 1
-            continue
-    
-    print(f"POI分配完成！成功: {successful_assignments}, 失败: {failed_assignments}")
+
+    assignment = compute_hex_assignment(df, resolution=7, resolutions=(7,), source=source)  # 使用分辨率7
+    hex_poi_map = hex_assignment_to_poi_map(df, assignment)
+
+    print(f"POI分配完成！成功: {assignment.successful}, 失败: {assignment.failed}")
     return hex_poi_map
 
 
@@ -111,9 +246,7 @@ def update_h3_with_pois(h3_data: Dict[str, Any], hex_poi_map: Dict[str, List[Dic
             max_poi_density = poi_count
             highest_density_hex = {
                 'h3_index': h3_id,
-                'poi_count': poi_count,
-                'center': hex_info['center'],
-                'boundary': hex_info['boundary']
+                'poi_count': poi_count
             }
         
         # 统计POI类型分布
@@ -144,8 +277,405 @@ def update_h3_with_pois(h3_data: Dict[str, Any], hex_poi_map: Dict[str, List[Dic
     return updated_data
 
 
-def process_city_pois(city_name: str):
-    """处理单个城市的POI数据"""
+class HexAggregates:
+    """分块累加城市网格内每个hex的POI数量、大类分布、商场数量以及hex × 类别计数矩阵"""
+
+    def __init__(self, grid_ids: List[str]):
+        self.cells = np.unique(np.array([h3.str_to_int(h) for h in grid_ids], dtype=np.uint64))
+        self.counts = np.zeros(len(self.cells), dtype=np.int64)
+        self.type_counts = defaultdict(lambda: defaultdict(int))
+        self.mall_counts = {column: np.zeros(len(self.cells), dtype=np.int64)
+                            for column in mall_classifier.FLAG_COLUMNS}
+        self.successful = 0
+        self.failed = 0
+        self.category_builder = None
+        if category_matrix.is_available():
+            self.category_builder = category_matrix.CategoryMatrixBuilder(self.cells)
+
+    @classmethod
+    def from_grid(cls, h3_data: Dict[str, Any],
+                  matrix: Optional['category_matrix.CategoryMatrix'] = None) -> 'HexAggregates':
+        """由已包含POI聚合信息的网格数据（以及已有的类别矩阵）恢复聚合状态（用于增量更新）"""
+        hexes = h3_data.get('hexes', [])
+        aggregates = cls([hex_info['h3_index'] for hex_info in hexes])
+        for hex_info in hexes:
+            pos = np.searchsorted(aggregates.cells, np.uint64(h3.str_to_int(hex_info['h3_index'])))
+            aggregates.counts[pos] = hex_info.get('poi_count', 0)
+            for big_type, count in hex_info.get('poi_type_distribution', {}).items():
+                aggregates.type_counts[pos][big_type] = count
+            for column, field in mall_classifier.COUNT_FIELDS.items():
+                aggregates.mall_counts[column][pos] = hex_info.get(field, 0)
+        if matrix is not None and aggregates.category_builder is not None:
+            aggregates.category_builder = category_matrix.CategoryMatrixBuilder.from_matrix(matrix)
+        return aggregates
+
+    def _accumulate(self, cells: np.ndarray, big_types: np.ndarray, mid_types: np.ndarray,
+                    small_types: np.ndarray, mall_flags: Dict[str, np.ndarray], sign: int) -> None:
+        positions = np.searchsorted(self.cells, cells)
+        self.counts += sign * np.bincount(positions, minlength=len(self.cells))
+        for column, flags in mall_flags.items():
+            self.mall_counts[column] += sign * np.bincount(positions[flags], minlength=len(self.cells))
+
+        grouped = pd.DataFrame({'pos': positions, 'big_type': big_types}).groupby(['pos', 'big_type']).size()
+        for (pos, big_type), count in grouped.items():
+            self.type_counts[pos][big_type] += sign * int(count)
+
+        if self.category_builder is not None:
+            self.category_builder.add(cells, big_types, mid_types, small_types, sign)
+
+    def add(self, chunk: pd.DataFrame, assignment: HexAssignment) -> np.ndarray:
+        """累加一块POI的分配结果，返回落在城市网格内的POI行号（按网格排序）"""
+        self.successful += assignment.successful
+        self.failed += assignment.failed
+
+        rows = assignment.order[np.isin(assignment.poi_cells[assignment.order], self.cells)]
+        self._accumulate(
+            assignment.poi_cells[rows],
+            chunk['bigType'].to_numpy()[rows],
+            chunk['midType'].to_numpy()[rows],
+            chunk['smallType'].to_numpy()[rows],
+            {column: chunk[column].to_numpy(dtype=bool)[rows] for column in mall_classifier.FLAG_COLUMNS},
+            1
+        )
+        return rows
+
+    def remove(self, cells: np.ndarray, big_types: np.ndarray, mid_types: np.ndarray,
+               small_types: np.ndarray, mall_flags: Dict[str, np.ndarray]) -> None:
+        """从聚合结果中减去一批POI（cells为其res7网格ID，mall_flags为其商场分类结果）"""
+        self._accumulate(cells, big_types, mid_types, small_types, mall_flags, -1)
+
+    def offsets(self) -> np.ndarray:
+        """每个hex的POI在存储中的起始行（存储按网格ID排序）"""
+        return np.cumsum(self.counts) - self.counts
+
+
+def classify_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """对一块POI做商场分类，分类结果作为新列加入chunk（每条POI只在导入时分类一次）"""
+    for column, flags in mall_classifier.classify(chunk['name'], chunk['bigType'], chunk['midType']).items():
+        chunk[column] = flags
+    return chunk
+
+
+def compute_row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """计算每行POI原始内容（CSV中所有保留列）的64位哈希，用于增量更新时比对"""
+    columns = [col for col in csv_converter.REQUIRED_COLUMNS if col in chunk.columns]
+    return pd.util.hash_pandas_object(chunk[columns].astype('string'), index=False).to_numpy(dtype=np.uint64)
+
+
+def next_poi_version(h3_data: Dict[str, Any], mode: str, stats: Dict[str, int]) -> Dict[str, Any]:
+    """生成写入网格数据的POI版本信息"""
+    previous = h3_data.get('poi_version', {}).get('version', 0)
+    return {
+        'version': previous + 1,
+        'mode': mode,
+        'updated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        **stats
+    }
+
+
+def build_chunk_table(chunk: pd.DataFrame, assignment: HexAssignment, rows: np.ndarray,
+                      row_hashes: np.ndarray) -> 'poi_store.pa.Table':
+    """由一块POI中选定的行构建写入存储的Arrow表"""
+    pois = pd.DataFrame({field: chunk[column].to_numpy()[rows] for field, column in POI_FIELDS})
+    pois['lat'] = assignment.lat[rows]
+    pois['lng'] = assignment.lng[rows]
+    pois['row_hash'] = row_hashes[rows]
+    for column in mall_classifier.FLAG_COLUMNS:
+        pois[column] = chunk[column].to_numpy(dtype=bool)[rows]
+    cell_columns = {res: res_cells[rows] for res, res_cells in assignment.cells_by_res.items()}
+    return poi_store.build_poi_table(pois, cell_columns)
+
+
+def outside_rows(assignment: HexAssignment, rows: np.ndarray, row_hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """一块POI中不在城市网格内的行的 (内容哈希, 坐标是否有效)，rows为网格内的行号"""
+    outside = np.ones(len(row_hashes), dtype=bool)
+    outside[rows] = False
+    return row_hashes[outside], assignment.poi_cells[outside] != 0
+
+
+def concat_or_empty(arrays: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+
+def occurrence_ranks(row_hashes: np.ndarray, seen: Dict[int, int]) -> np.ndarray:
+    """每行是其内容哈希的第几次出现（从0开始）；seen为此前各哈希已出现的次数，原地更新
+
+    内容完全相同的POI行哈希相同，增量更新按 (哈希, 第几次出现) 比对，使重复行的数量变化也能被识别
+    """
+    hashes = pd.Series(row_hashes)
+    ranks = hashes.groupby(hashes, sort=False).cumcount().to_numpy(dtype=np.int64, copy=True)
+    unique, counts = np.unique(row_hashes, return_counts=True)
+    previous = np.fromiter((seen.get(h, 0) for h in unique.tolist()), dtype=np.int64, count=len(unique))
+    ranks += previous[np.searchsorted(unique, row_hashes)]
+    seen.update(zip(unique.tolist(), (previous + counts).tolist()))
+    return ranks
+
+
+def lookup_counts(unique: np.ndarray, counts: np.ndarray, row_hashes: np.ndarray) -> np.ndarray:
+    """row_hashes中每个哈希在 (unique, counts) 中的出现次数，不存在的为0"""
+    if len(unique) == 0:
+        return np.zeros(len(row_hashes), dtype=np.int64)
+    pos = np.searchsorted(unique, row_hashes).clip(0, len(unique) - 1)
+    return np.where(unique[pos] == row_hashes, counts[pos], 0)
+
+
+def estimate_spill_buckets(csv_file_path: str, chunksize: int) -> int:
+    """根据CSV文件大小估算写入存储时的分桶数，使每个桶大约为一块的大小"""
+    estimated_rows = os.path.getsize(csv_file_path) // AVG_CSV_ROW_BYTES
+    return max(1, int(np.ceil(estimated_rows / chunksize)))
+
+
+def apply_hex_aggregates(h3_data: Dict[str, Any], aggregates: HexAggregates, store_info: Dict[str, Any],
+                         version_info: Dict[str, Any], matrix_path: str) -> Dict[str, Any]:
+    """用聚合结果更新H3网格数据，每个hex只保留聚合信息，POI本身由store_info指向的存储提供
+
+    scipy可用时同时把hex × 类别计数矩阵保存到matrix_path
+    """
+    print("更新H3网格数据...")
+
+    matrix_info = None
+    if aggregates.category_builder is not None:
+        matrix = aggregates.category_builder.build()
+        matrix.save(matrix_path)
+        matrix_info = {
+            'path': os.path.basename(matrix_path),
+            'format': 'npz',
+            'shape': list(matrix.matrix.shape),
+            'blocks': {block: len(matrix.vocab[block]) for block in category_matrix.BLOCKS}
+        }
+        print(f"类别矩阵已保存到: {matrix_path}")
+
+    position = {h3.int_to_str(cell): i for i, cell in enumerate(aggregates.cells.tolist())}
+    counts = aggregates.counts.tolist()
+    offsets = aggregates.offsets().tolist()
+    mall_counts = {field: aggregates.mall_counts[column].tolist()
+                   for column, field in mall_classifier.COUNT_FIELDS.items()}
+
+    updated_hexes = []
+    max_poi_density = 0
+    highest_density_hex = None
+
+    for hex_info in h3_data.get('hexes', []):
+        h3_id = hex_info['h3_index']
+        pos = position[h3_id]
+        poi_count = counts[pos]
+
+        # 更新最高密度信息
+        if poi_count > max_poi_density:
+            max_poi_density = poi_count
+            highest_density_hex = {
+                'h3_index': h3_id,
+                'poi_count': poi_count
+            }
+
+        updated_hex_info = hex_info.copy()
+        updated_hex_info.pop('pois', None)
+        updated_hex_info.update({
+            'poi_count': poi_count,
+            'poi_offset': offsets[pos],
+            'poi_type_distribution': {t: n for t, n in aggregates.type_counts.get(pos, {}).items() if n > 0},
+            **{field: values[pos] for field, values in mall_counts.items()}
+        })
+
+        updated_hexes.append(updated_hex_info)
+
+    # 更新整体数据
+    updated_data = h3_data.copy()
+    updated_data['hexes'] = updated_hexes
+    updated_data['total_poi_count'] = aggregates.successful
+    updated_data['highest_density_hex'] = highest_density_hex
+    updated_data['max_poi_density'] = max_poi_density
+    updated_data['poi_store'] = store_info
+    updated_data['poi_version'] = version_info
+    if matrix_info:
+        updated_data['category_matrix'] = matrix_info
+
+    print(f"更新完成！总POI数量: {updated_data['total_poi_count']}")
+    if highest_density_hex:
+        print(f"最高密度网格: {highest_density_hex['h3_index']} (POI数量: {max_poi_density})")
+
+    return updated_data
+
+
+def ingest_city_pois(csv_file_path: str, h3_data: Dict[str, Any], store_path: str, matrix_path: str,
+                     chunksize: int = csv_converter.CHUNK_SIZE,
+                     resolutions: Tuple[int, ...] = POI_RESOLUTIONS,
+                     source: str = POI_SOURCE) -> Dict[str, Any]:
+    """分块读取城市POI CSV：每块直接完成网格分配、聚合并写入列式存储，峰值内存由块大小决定"""
+    grid_ids = [hex_info['h3_index'] for hex_info in h3_data.get('hexes', [])]
+    aggregates = HexAggregates(grid_ids)
+    writer = poi_store.PoiStoreWriter(store_path, aggregates.cells, list(resolutions),
+                                      buckets=estimate_spill_buckets(csv_file_path, chunksize))
+
+    outside_hashes = []
+    outside_assigned = []
+    row_checksum = 0
+
+    print("开始将POI分配到H3网格...")
+    try:
+        for chunk in csv_converter.iter_poi_csv_chunks(csv_file_path, chunksize=chunksize):
+            classify_chunk(chunk)
+            assignment = compute_hex_assignment(chunk, resolution=7, resolutions=resolutions, source=source)
+            rows = aggregates.add(chunk, assignment)
+            row_hashes = compute_row_hashes(chunk)
+            writer.add(build_chunk_table(chunk, assignment, rows, row_hashes))
+            row_checksum = poi_store.hash_checksum(row_hashes[rows], row_checksum)
+            hashes, assigned = outside_rows(assignment, rows, row_hashes)
+            outside_hashes.append(hashes)
+            outside_assigned.append(assigned)
+            print(f"已处理 {aggregates.successful + aggregates.failed} 条POI记录")
+        row_count = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    outside_hashes = concat_or_empty(outside_hashes, np.uint64)
+    outside_count = poi_store.write_outside(poi_store.get_outside_path(store_path), outside_hashes,
+                                            concat_or_empty(outside_assigned, bool))
+
+    print(f"POI分配完成！成功: {aggregates.successful}, 失败: {aggregates.failed}")
+    print(f"POI列式存储已保存到: {store_path}")
+
+    store_info = poi_store.store_pointer(store_path, row_count, sorted(resolutions), source, outside_count,
+                                         row_checksum, poi_store.hash_checksum(outside_hashes))
+    version_info = next_poi_version(h3_data, 'full', {'inserted': row_count, 'deleted': 0, 'updated': 0, 'moved': 0})
+    return apply_hex_aggregates(h3_data, aggregates, store_info, version_info, matrix_path)
+
+
+def apply_poi_delta(csv_file_path: str, h3_data: Dict[str, Any], store_path: str, matrix_path: str,
+                    chunksize: int = csv_converter.CHUNK_SIZE, source: str = POI_SOURCE) -> Dict[str, Any]:
+    """按POI内容哈希将新的CSV与上次导入的POI比对，只把新增、删除和变化的POI应用到网格聚合信息上
+
+    内容未变的POI（包括上次已判定不在网格内的POI）不再解析坐标、分类和计算网格；
+    比对按 (哈希, 第几次出现) 进行，重复行的数量变化也会计入新增或删除。
+    内容变化的POI按"删除旧记录+新增新记录"处理，其中id相同的记为更新，更新后所在res7网格变化的记为移动。
+    只有解析和聚合是增量的：有变化时仍要读取并重写整个存储文件（保持按网格排序），没有变化时不重写。
+    存储与网格中poi_store指针记录的行数或校验和不一致时（上次更新后网格没有保存成功），改为全量导入
+    """
+    resolutions = tuple(h3_data['poi_store'].get('resolutions', POI_RESOLUTIONS))
+
+    # 上次导入的POI（只读取比对和聚合需要的列）
+    old = poi_store.read_pois(store_path, columns=['id', 'row_hash', 'big_type', 'mid_type', 'small_type']
+                              + mall_classifier.FLAG_COLUMNS)
+    old_hashes = old['row_hash'].to_numpy(dtype=np.uint64)
+    old_cells = old[poi_store.SORT_KEY].to_numpy(dtype=np.uint64)
+    old_types = [old[column].to_numpy(dtype=object) for column in ('big_type', 'mid_type', 'small_type')]
+    old_flags = {column: old[column].to_numpy(dtype=bool) for column in mall_classifier.FLAG_COLUMNS}
+    outside_path = poi_store.get_outside_path(store_path)
+    old_outside_hashes, old_outside_assigned = poi_store.read_outside(outside_path)
+
+    mismatch = poi_store.store_mismatch(h3_data['poi_store'], old_hashes, old_outside_hashes)
+    if mismatch:
+        # 网格中的聚合信息不对应当前的存储，无法在其上增量更新
+        print(f"{mismatch}，改为全量导入")
+        return ingest_city_pois(csv_file_path, h3_data, store_path, matrix_path, chunksize=chunksize,
+                                resolutions=resolutions, source=source)
+
+    # 上次导入的所有行（网格内 + 网格外）中每个哈希的出现次数，以及该内容的坐标是否有效
+    previous_hashes = np.concatenate([old_hashes, old_outside_hashes])
+    previous_unique, first_rows, previous_counts = np.unique(previous_hashes, return_index=True, return_counts=True)
+    previous_assigned = np.concatenate([np.ones(len(old_hashes), dtype=bool), old_outside_assigned])[first_rows]
+
+    matrix = None
+    if os.path.exists(matrix_path) and category_matrix.is_available():
+        matrix = category_matrix.CategoryMatrix.load(matrix_path)
+    aggregates = HexAggregates.from_grid(h3_data, matrix)
+    if matrix is None and aggregates.category_builder is not None:
+        # 还没有类别矩阵时由上次导入的POI生成
+        aggregates.category_builder.add(old_cells, *old_types)
+
+    writer = poi_store.PoiStoreWriter(store_path, aggregates.cells, list(resolutions),
+                                      buckets=estimate_spill_buckets(csv_file_path, chunksize))
+    seen = {}
+    inserted_ids = []
+    inserted_cells = []
+    outside_hashes = []
+    outside_assigned = []
+    inserted_checksum = 0
+    unchanged = 0
+
+    print("开始比对POI数据...")
+    try:
+        for chunk in csv_converter.iter_poi_csv_chunks(csv_file_path, chunksize=chunksize):
+            row_hashes = compute_row_hashes(chunk)
+            ranks = occurrence_ranks(row_hashes, seen)
+            changed = ranks >= lookup_counts(previous_unique, previous_counts, row_hashes)
+
+            # 未变化的POI沿用上次的结果（坐标有效的计为成功）
+            assigned = previous_assigned[np.searchsorted(previous_unique, row_hashes[~changed])]
+            aggregates.successful += int(assigned.sum())
+            aggregates.failed += int(len(assigned) - assigned.sum())
+            unchanged += len(assigned)
+            if not changed.any():
+                continue
+
+            changed_chunk = classify_chunk(chunk[changed].reset_index(drop=True))
+            changed_hashes = row_hashes[changed]
+            assignment = compute_hex_assignment(changed_chunk, resolution=7, resolutions=resolutions,
+                                                source=source)
+            rows = aggregates.add(changed_chunk, assignment)
+            writer.add(build_chunk_table(changed_chunk, assignment, rows, changed_hashes))
+            inserted_checksum = poi_store.hash_checksum(changed_hashes[rows], inserted_checksum)
+            inserted_ids.append(changed_chunk['id'].astype('string').to_numpy()[rows])
+            inserted_cells.append(assignment.poi_cells[rows])
+            hashes, assigned = outside_rows(assignment, rows, changed_hashes)
+            outside_hashes.append(hashes)
+            outside_assigned.append(assigned)
+
+        # 旧POI中超出新数据出现次数的部分即为删除的POI
+        new_unique = np.fromiter(seen.keys(), dtype=np.uint64, count=len(seen))
+        new_counts = np.fromiter(seen.values(), dtype=np.int64, count=len(seen))
+        order = np.argsort(new_unique)
+        new_unique, new_counts = new_unique[order], new_counts[order]
+        deleted = occurrence_ranks(old_hashes, {}) >= lookup_counts(new_unique, new_counts, old_hashes)
+        aggregates.remove(old_cells[deleted], *[types[deleted] for types in old_types],
+                          {column: flags[deleted] for column, flags in old_flags.items()})
+        kept_outside = (occurrence_ranks(old_outside_hashes, {})
+                        < lookup_counts(new_unique, new_counts, old_outside_hashes))
+
+        if writer.row_count == 0 and not deleted.any():
+            # 网格内的POI没有变化，存储保持不变
+            writer.abort()
+            row_count = len(old_hashes)
+        else:
+            # 其余旧POI原样写回存储（与read_pois的行顺序相同）
+            offset = 0
+            for table in poi_store.iter_store_tables(store_path):
+                writer.add(table.filter(~deleted[offset:offset + table.num_rows]))
+                offset += table.num_rows
+            row_count = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    outside_hashes = np.concatenate([old_outside_hashes[kept_outside], concat_or_empty(outside_hashes, np.uint64)])
+    outside_count = poi_store.write_outside(
+        outside_path, outside_hashes,
+        np.concatenate([old_outside_assigned[kept_outside], concat_or_empty(outside_assigned, bool)])
+    )
+
+    # 统计新增/删除/更新/移动的数量
+    inserted_ids = concat_or_empty(inserted_ids, object)
+    inserted_cells = concat_or_empty(inserted_cells, np.uint64)
+    deleted_cell_of_id = dict(zip(old['id'].to_numpy()[deleted].tolist(), old_cells[deleted].tolist()))
+    updated = [i for i, poi_id in enumerate(inserted_ids.tolist()) if poi_id in deleted_cell_of_id]
+    moved = sum(1 for i in updated if deleted_cell_of_id[inserted_ids[i]] != int(inserted_cells[i]))
+    stats = {
+        'inserted': len(inserted_ids) - len(updated),
+        'deleted': int(deleted.sum()) - len(updated),
+        'updated': len(updated),
+        'moved': moved
+    }
+    print(f"POI比对完成！未变化: {unchanged}, 新增: {stats['inserted']}, 删除: {stats['deleted']}, "
+          f"更新: {stats['updated']} (其中移动: {stats['moved']})")
+
+    store_info = poi_store.store_pointer(store_path, row_count, sorted(resolutions), source, outside_count,
+                                         poi_store.hash_checksum(old_hashes[~deleted], inserted_checksum),
+                                         poi_store.hash_checksum(outside_hashes))
+    version_info = next_poi_version(h3_data, 'delta', stats)
+    return apply_hex_aggregates(h3_data, aggregates, store_info, version_info, matrix_path)
+
+
+def process_city_pois(city_name: str, delta: bool = False, source: str = POI_SOURCE):
+    """处理单个城市的POI数据，delta为True时对已包含POI信息的网格做增量更新，source为POI坐标的数据来源"""
     print(f"\n开始处理城市: {city_name}")
     
     # 获取脚本所在目录
@@ -165,11 +695,6 @@ def process_city_pois(city_name: str):
         return False
     
     # 加载数据
-    df = load_city_csv(csv_file)
-    if df.empty:
-        print(f"CSV文件为空或加载失败")
-        return False
-    
     h3_data = load_city_h3_json(json_file)
     if not h3_data:
         print(f"JSON文件为空或加载失败")
@@ -177,28 +702,92 @@ def process_city_pois(city_name: str):
     
     # 检查JSON文件是否已经包含POI信息
     if any('poi_count' in hex_info for hex_info in h3_data.get('hexes', [])):
-        print(f"城市 {city_name} 的H3网格已包含POI信息，跳过处理")
-        return True
-    
-    # 分配POI到网格
-    hex_poi_map = assign_pois_to_hexes(df, h3_data)
-    
-    # 更新H3数据
-    updated_data = update_h3_with_pois(h3_data, hex_poi_map)
+        if not delta:
+            print(f"城市 {city_name} 的H3网格已包含POI信息，跳过处理")
+            if not os.path.exists(city_summary.get_summary_path(json_file)):
+                city_summary.write_summary(json_file, h3_data)
+            return True
+        
+        store_path = poi_store.resolve_store_path(h3_data, json_file)
+        if (store_path is None or not poi_store.is_available() or not os.path.exists(store_path)
+                or not poi_store.has_columns(store_path, ['row_hash'] + mall_classifier.FLAG_COLUMNS)):
+            print(f"城市 {city_name} 的POI存储不支持增量更新，请删除网格中的POI信息后重新处理")
+            return False
+        
+        # 未变化的POI沿用存储中的网格，坐标转换方式必须与上次导入一致
+        store_info = h3_data['poi_store']
+        if (store_info.get('coord_system') != 'wgs84'
+                or store_info.get('source_coord_system') != coord_transform.SOURCE_COORD_SYSTEMS.get(source)):
+            print(f"城市 {city_name} 的POI存储坐标系与本次数据来源 {source} 不一致，请删除网格中的POI信息后重新处理")
+            return False
+        
+        try:
+            updated_data = apply_poi_delta(csv_file, h3_data, store_path,
+                                           category_matrix.get_matrix_path(json_file), source=source)
+        except Exception as e:
+            print(f"增量更新POI时出错: {e}")
+            return False
+    elif poi_store.is_available():
+        # 分块分配POI到网格，POI写入列式存储，网格JSON只保留聚合信息
+        try:
+            updated_data = ingest_city_pois(csv_file, h3_data, poi_store.get_store_path(json_file),
+                                            category_matrix.get_matrix_path(json_file), source=source)
+        except Exception as e:
+            print(f"分配POI时出错: {e}")
+            return False
+    else:
+        # 没有pyarrow时仍将POI内嵌在网格JSON中
+        print("pyarrow不可用，POI将内嵌保存在网格JSON中")
+        df = load_city_csv(csv_file)
+        if df.empty:
+            print(f"CSV文件为空或加载失败")
+            return False
+        hex_poi_map = assign_pois_to_hexes(df, h3_data, source)
+        updated_data = update_h3_with_pois(h3_data, hex_poi_map)
     
     # 保存更新后的数据
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(updated_data, f, ensure_ascii=False, indent=2)
+        save_city_h3_json(json_file, updated_data)
         print(f"更新后的数据已保存到: {json_file}")
+        # 汇总地图使用的摘要文件
+        city_summary.write_summary(json_file, updated_data)
         return True
     except Exception as e:
         print(f"保存文件时出错: {e}")
         return False
 
 
-def process_all_cities():
-    """处理所有城市的POI数据"""
+def process_city_timed(city_name: str, delta: bool = False, source: str = POI_SOURCE) -> Dict[str, Any]:
+    """处理单个城市并记录耗时，任何异常都只记为该城市失败"""
+    start = time.perf_counter()
+    try:
+        success = bool(process_city_pois(city_name, delta=delta, source=source))
+        error = None
+    except Exception:
+        success = False
+        error = traceback.format_exc(limit=3)
+    return {
+        'city_name': city_name,
+        'success': success,
+        'seconds': time.perf_counter() - start,
+        'error': error
+    }
+
+
+def print_city_summary(results: List[Dict[str, Any]], csv_sizes: Dict[str, int]) -> None:
+    """打印每个城市的耗时和吞吐量"""
+    print(f"\n{'城市':<10}{'状态':<6}{'耗时(s)':>10}{'CSV(MB)':>10}{'吞吐(MB/s)':>12}")
+    for result in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        size_mb = csv_sizes.get(result['city_name'], 0) / 1024 / 1024
+        throughput = size_mb / result['seconds'] if result['seconds'] > 0 else 0
+        status = '成功' if result['success'] else '失败'
+        print(f"{result['city_name']:<10}{status:<6}{result['seconds']:>10.2f}{size_mb:>10.1f}{throughput:>12.2f}")
+        if result['error']:
+            print(f"    {result['error'].strip().splitlines()[-1]}")
+
+
+def process_all_cities(delta: bool = False, workers: int = 1, source: str = POI_SOURCE):
+    """处理所有城市的POI数据，workers大于1时用进程池并行处理多个城市"""
     print("开始处理所有城市的POI数据...")
     
     # 获取脚本所在目录
@@ -209,25 +798,50 @@ def process_all_cities():
         print(f"CSV目录不存在: {csv_dir}")
         return
     
-    processed_cities = 0
-    skipped_cities = 0
-    failed_cities = 0
-    
-    # 获取所有城市CSV文件
+    # 获取所有城市CSV文件，按文件大小从大到小排序，让大城市先开始以减少尾部等待
+    csv_sizes = {}
     for filename in os.listdir(csv_dir):
         if filename.endswith('.csv'):
             city_name = filename.replace('.csv', '')
-            
-            result = process_city_pois(city_name)
-            if result:
-                processed_cities += 1
-            else:
-                failed_cities += 1
+            csv_sizes[city_name] = os.path.getsize(os.path.join(csv_dir, filename))
+    city_names = sorted(csv_sizes, key=csv_sizes.get, reverse=True)
     
+    results = []
+    if workers <= 1:
+        for city_name in city_names:
+            results.append(process_city_timed(city_name, delta, source))
+    else:
+        print(f"使用 {workers} 个进程并行处理 {len(city_names)} 个城市")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_city_timed, city_name, delta, source): city_name
+                       for city_name in city_names}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # 工作进程异常退出等情况
+                    results.append({'city_name': futures[future], 'success': False, 'seconds': 0.0, 'error': repr(e)})
+    
+    processed_cities = sum(1 for result in results if result['success'])
+    failed_cities = len(results) - processed_cities
+    
+    print_city_summary(results, csv_sizes)
     print(f"\n所有城市处理完成！")
     print(f"成功处理: {processed_cities} 个城市")
     print(f"处理失败: {failed_cities} 个城市")
 
+    # 网格文件已更新，刷新网格清单（由主进程统一写入，只重新读取变化的网格）
+    json_dir = os.path.join(script_dir, "json")
+    if os.path.isdir(json_dir):
+        grid_manifest.refresh_manifest(json_dir)
+
 
 if __name__ == "__main__":
-    process_all_cities()
+    parser = argparse.ArgumentParser(description="将城市POI分配到H3网格")
+    parser.add_argument('--delta', action='store_true', help="对已包含POI信息的网格按新的CSV做增量更新")
+    parser.add_argument('--workers', type=int, default=1, help="并行处理城市的进程数")
+    parser.add_argument('--source', default=POI_SOURCE, choices=list(coord_transform.SOURCE_COORD_SYSTEMS),
+                        help="POI坐标的数据来源，用于转换到WGS-84")
+    args = parser.parse_args()
+    
+    process_all_cities(delta=args.delta, workers=args.workers, source=args.source)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+城市POI列式存储
+每个城市的POI只写一次到 xx市_pois.parquet（按 h3_res7 排序，每个hex的POI为连续的一段行），
+xx市_h3_grid.json 中只保存每个hex的聚合信息以及指向该文件的 poi_store 指针。
+读取时可以只加载需要的列和hex。
+"""
+
+import os
+import shutil
+import tempfile
+import h3
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple
+
+import coord_transform
+import mall_classifier
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+POI_STORE_SUFFIX = '_pois.parquet'
+# 不在城市网格内（坐标无效或落在网格外）的POI只保存内容哈希，增量更新时不再重复解析
+OUTSIDE_SUFFIX = '_pois_outside.parquet'
+GRID_SUFFIX = '_h3_grid.json'
+SORT_KEY = 'h3_res7'
+
+# 存储中的字符串列（POI字典字段名），其中行政区划和类别列使用字典编码
+STRING_COLUMNS = ['id', 'name', 'province', 'city', 'district', 'big_type', 'mid_type', 'small_type']
+DICTIONARY_COLUMNS = ['province', 'city', 'district', 'big_type', 'mid_type', 'small_type']
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def is_available() -> bool:
+    """pyarrow是否可用"""
+    return pq is not None
+
+
+def get_store_path(json_file_path: str) -> str:
+    """根据网格JSON路径得到对应的POI存储路径"""
+    directory, filename = os.path.split(json_file_path)
+    city_name = filename[:-len(GRID_SUFFIX)] if filename.endswith(GRID_SUFFIX) else os.path.splitext(filename)[0]
+    return os.path.join(directory, f"{city_name}{POI_STORE_SUFFIX}")
+
+
+def get_outside_path(store_path: str) -> str:
+    """POI存储对应的网格外POI哈希文件路径"""
+    if store_path.endswith(POI_STORE_SUFFIX):
+        return store_path[:-len(POI_STORE_SUFFIX)] + OUTSIDE_SUFFIX
+    return os.path.splitext(store_path)[0] + OUTSIDE_SUFFIX
+
+
+def resolve_store_path(city_data: Dict[str, Any], json_file_path: str) -> Optional[str]:
+    """返回网格数据中poi_store指向的文件路径（相对于网格JSON所在目录），没有则返回None"""
+    store_info = city_data.get('poi_store')
+    if not store_info:
+        return None
+    return os.path.join(os.path.dirname(json_file_path), store_info['path'])
+
+
+def cell_column(resolution: int) -> str:
+    """指定分辨率的网格ID列名"""
+    return f"h3_res{resolution}"
+
+
+def poi_schema(resolutions: List[int]) -> 'pa.Schema':
+    """POI存储的表结构"""
+    fields = [(column, pa.string()) for column in STRING_COLUMNS]
+    fields += [('lat', pa.float64()), ('lng', pa.float64()), ('row_hash', pa.uint64())]
+    fields += [(column, pa.bool_()) for column in mall_classifier.FLAG_COLUMNS]
+    fields += [(cell_column(r), pa.uint64()) for r in sorted(resolutions)]
+    return pa.schema(fields)
+
+
+def build_poi_table(pois: pd.DataFrame, cell_columns: Dict[int, np.ndarray]) -> 'pa.Table':
+    """由POI字段列构建Arrow表
+
+    pois的列为POI字典字段名加 lat/lng/row_hash（原始CSV行的内容哈希）以及商场分类列，
+    cell_columns为 {分辨率: 网格ID数组}
+    """
+    arrays = []
+    for column in STRING_COLUMNS:
+        arrays.append(pa.array(pois[column].astype('string'), type=pa.string(), from_pandas=True))
+    arrays.append(pa.array(pois['lat'].to_numpy(dtype=np.float64), type=pa.float64()))
+    arrays.append(pa.array(pois['lng'].to_numpy(dtype=np.float64), type=pa.float64()))
+    arrays.append(pa.array(pois['row_hash'].to_numpy(dtype=np.uint64), type=pa.uint64()))
+    for column in mall_classifier.FLAG_COLUMNS:
+        arrays.append(pa.array(pois[column].to_numpy(dtype=bool), type=pa.bool_()))
+    for resolution in sorted(cell_columns):
+        arrays.append(pa.array(cell_columns[resolution].astype(np.uint64), type=pa.uint64()))
+    return pa.Table.from_arrays(arrays, schema=poi_schema(list(cell_columns)))
+
+
+class PoiStoreWriter:
+    """分块写入POI存储
+
+    每个块的POI先按 h3_res7 的取值范围分桶写入临时文件，关闭时逐桶排序后依次写入最终文件，
+    因此最终文件整体按 h3_res7 排序，而峰值内存只取决于块大小和单个桶的大小
+    """
+
+    def __init__(self, store_path: str, grid_cells: np.ndarray, resolutions: List[int], buckets: int = 1):
+        self.store_path = store_path
+        self.schema = poi_schema(resolutions)
+        self.row_count = 0
+
+        # 按排序后的网格ID把城市网格均分为若干桶，bounds为每个桶的起始网格ID
+        grid_cells = np.sort(np.asarray(grid_cells, dtype=np.uint64))
+        buckets = max(1, min(buckets, len(grid_cells)))
+        starts = np.linspace(0, len(grid_cells), buckets, endpoint=False).astype(np.int64)
+        self.bounds = grid_cells[starts] if len(grid_cells) else np.zeros(1, dtype=np.uint64)
+
+        self.spill_dir = tempfile.mkdtemp(prefix='poi_spill_', dir=os.path.dirname(os.path.abspath(store_path)))
+        self.spill_writers = {}
+
+    def _spill_path(self, bucket: int) -> str:
+        return os.path.join(self.spill_dir, f"bucket_{bucket:05d}.parquet")
+
+    def add(self, table: 'pa.Table') -> None:
+        """追加一块POI（所有POI都应位于城市网格内）"""
+        if table.num_rows == 0:
+            return
+
+        keys = table.column(SORT_KEY).to_numpy()
+        bucket_of_row = np.searchsorted(self.bounds, keys, side='right') - 1
+        for bucket in np.unique(bucket_of_row).tolist():
+            writer = self.spill_writers.get(bucket)
+            if writer is None:
+                writer = pq.ParquetWriter(self._spill_path(bucket), self.schema, compression='lz4')
+                self.spill_writers[bucket] = writer
+            writer.write_table(table.take(np.flatnonzero(bucket_of_row == bucket)))
+
+        self.row_count += table.num_rows
+
+    def close(self) -> int:
+        """合并所有桶生成最终文件（先写临时文件再替换），返回写入的POI数量"""
+        for writer in self.spill_writers.values():
+            writer.close()
+
+        tmp_path = self.store_path + '.tmp'
+        try:
+            with pq.ParquetWriter(tmp_path, self.schema, compression='zstd',
+                                  use_dictionary=DICTIONARY_COLUMNS, write_statistics=True) as writer:
+                for bucket in sorted(self.spill_writers):
+                    part = pq.read_table(self._spill_path(bucket))
+                    # 稳定排序，同一hex内保持POI在CSV中的原始顺序
+                    order = np.argsort(part.column(SORT_KEY).to_numpy(), kind='stable')
+                    writer.write_table(part.take(order), row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp_path, self.store_path)
+        finally:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+        return self.row_count
+
+    def abort(self) -> None:
+        """放弃写入，清理临时文件"""
+        for writer in self.spill_writers.values():
+            try:
+                writer.close()
+            except Exception:
+                pass
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def write_outside(outside_path: str, row_hashes: np.ndarray, assigned: np.ndarray) -> int:
+    """保存网格外POI的内容哈希（assigned为坐标有效、只是不在城市网格内），返回行数"""
+    table = pa.table({'row_hash': pa.array(np.asarray(row_hashes, dtype=np.uint64), type=pa.uint64()),
+                      'assigned': pa.array(np.asarray(assigned, dtype=bool), type=pa.bool_())})
+    pq.write_table(table, outside_path + '.tmp', compression='zstd')
+    os.replace(outside_path + '.tmp', outside_path)
+    return table.num_rows
+
+
+def read_outside(outside_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """读取网格外POI的 (内容哈希, 坐标是否有效)，文件不存在时（旧版本的存储）返回空数组"""
+    if not os.path.exists(outside_path):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    table = pq.read_table(outside_path)
+    return (table.column('row_hash').to_numpy().astype(np.uint64),
+            table.column('assigned').to_numpy(zero_copy_only=False).astype(bool))
+
+
+def hash_checksum(row_hashes: np.ndarray, start: int = 0) -> int:
+    """一组行内容哈希的校验和（按uint64取模求和，与行的顺序无关），start为之前各块的校验和"""
+    return (start + int(np.asarray(row_hashes, dtype=np.uint64).sum(dtype=np.uint64))) % (1 << 64)
+
+
+def store_pointer(store_path: str, row_count: int, resolutions: List[int], source: str = 'amap',
+                  outside_count: Optional[int] = None, row_checksum: Optional[int] = None,
+                  outside_checksum: Optional[int] = None) -> Dict[str, Any]:
+    """生成写入网格JSON的poi_store指针（存储中的lat/lng已转换为WGS-84，source为原始数据来源）
+
+    row_checksum、outside_checksum为存储和网格外POI文件中row_hash的校验和，增量更新前用来确认存储与网格一致
+    """
+    pointer = {
+        'path': os.path.basename(store_path),
+        'format': 'parquet',
+        'sort_key': SORT_KEY,
+        'row_count': row_count,
+        'resolutions': list(resolutions),
+        'coord_system': 'wgs84',
+        'source_coord_system': coord_transform.SOURCE_COORD_SYSTEMS.get(source, source),
+        'columns': (STRING_COLUMNS + ['lat', 'lng', 'row_hash'] + mall_classifier.FLAG_COLUMNS
+                    + [cell_column(r) for r in resolutions])
+    }
+    if row_checksum is not None:
+        pointer['row_checksum'] = format(row_checksum, '016x')
+    if outside_count is not None:
+        pointer['outside'] = {'path': os.path.basename(get_outside_path(store_path)), 'row_count': outside_count}
+        if outside_checksum is not None:
+            pointer['outside']['row_checksum'] = format(outside_checksum, '016x')
+    return pointer
+
+
+def store_mismatch(store_info: Dict[str, Any], row_hashes: np.ndarray,
+                   outside_hashes: np.ndarray) -> Optional[str]:
+    """poi_store指针记录的行数和校验和与存储文件不一致的原因，一致时返回None
+
+    存储已更新而网格JSON没有保存成功（如保存时中断）时，网格中的聚合信息仍对应上次的存储
+    """
+    if store_info.get('row_count') != len(row_hashes):
+        return f"POI存储有 {len(row_hashes)} 条POI，网格中记录为 {store_info.get('row_count')} 条"
+    if 'row_checksum' in store_info and store_info['row_checksum'] != format(hash_checksum(row_hashes), '016x'):
+        return "POI存储的内容与网格中记录的校验和不一致"
+    outside = store_info.get('outside')
+    if outside:
+        if outside.get('row_count') != len(outside_hashes):
+            return f"网格外POI文件有 {len(outside_hashes)} 行，网格中记录为 {outside.get('row_count')} 行"
+        if 'row_checksum' in outside and outside['row_checksum'] != format(hash_checksum(outside_hashes), '016x'):
+            return "网格外POI文件的内容与网格中记录的校验和不一致"
+    return None
+
+
+def has_columns(store_path: str, columns: List[str]) -> bool:
+    """存储文件是否包含指定的列（旧版本的存储可能缺少部分列）"""
+    names = set(pq.read_schema(store_path).names)
+    return all(column in names for column in columns)
+
+
+def iter_store_tables(store_path: str, batch_size: int = ROW_GROUP_SIZE):
+    """按批读取整个存储，每次返回一个Arrow表"""
+    parquet_file = pq.ParquetFile(store_path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield pa.Table.from_batches([batch])
+
+
+def read_pois(store_path: str, columns: Optional[List[str]] = None,
+              h3_ids: Optional[List[str]] = None, filters: Optional[List] = None) -> pd.DataFrame:
+    """读取POI存储，可只加载指定的列、hex，以及满足filters条件的行"""
+    conditions = list(filters or [])
+    if h3_ids is not None:
+        conditions.append((SORT_KEY, 'in', [h3.str_to_int(h) for h in h3_ids]))
+
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + [SORT_KEY]))
+
+    table = pq.read_table(store_path, columns=read_columns, filters=conditions or None)
+    return table.to_pandas()
+
+
+def count_by_cell(store_path: str, resolution: int, filters: Optional[List] = None) -> pd.Series:
+    """按指定分辨率统计每个网格的POI数量（只读取该分辨率的网格列），索引为网格ID字符串"""
+    column = cell_column(resolution)
+    table = pq.read_table(store_path, columns=[column], filters=filters)
+    cells, counts = np.unique(table.column(column).to_numpy(), return_counts=True)
+    return pd.Series(counts, index=[h3.int_to_str(c) for c in cells.tolist()], name='poi_count')
+
+
+def attach_pois(city_data: Dict[str, Any], json_file_path: str,
+                columns: Optional[List[str]] = None, filters: Optional[List] = None) -> Dict[str, Any]:
+    """从POI存储中读取POI，按原有格式写回每个hex的pois列表（兼容旧的下游代码）
+
+    网格数据中没有poi_store指针（POI直接内嵌在JSON中）时原样返回
+    """
+    store_path = resolve_store_path(city_data, json_file_path)
+    if store_path is None:
+        return city_data
+
+    if not is_available():
+        print("pyarrow不可用，无法读取POI存储")
+        return city_data
+
+    try:
+        pois = read_pois(store_path, columns=columns, filters=filters)
+    except Exception as e:
+        print(f"读取POI存储 {store_path} 时出错: {e}")
+        return city_data
+
+    internal = set(['row_hash'] + mall_classifier.FLAG_COLUMNS)
+    fields = [c for c in pois.columns if not c.startswith('h3_res') and c not in internal]
+    cells = pois[SORT_KEY].to_numpy(dtype=np.uint64)
+    records = pois[fields].astype(object).where(pois[fields].notna(), None).to_dict('records')
+
+    hex_pois = {}
+    if len(cells):
+        boundaries = np.flatnonzero(np.diff(cells)) + 1
+        starts = np.concatenate(([0], boundaries)).tolist()
+        ends = np.concatenate((boundaries, [len(cells)])).tolist()
+        for start, end in zip(starts, ends):
+            hex_pois[h3.int_to_str(int(cells[start]))] = records[start:end]
+
+    for hex_info in city_data.get('hexes', []):
+        hex_info['pois'] = hex_pois.get(hex_info.get('h3_index'), [])
+
+    return city_data
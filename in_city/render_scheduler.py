@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可视化调度
+把步骤6中每个城市的POI密度图、商场hex分析图和汇总地图作为独立的任务，由进程池并行生成HTML和PNG，
+并发数由workers限制；按输入文件大小从大到小调度，减少尾部等待。每个任务单独计时，
+任一城市出错只记为该任务失败，不影响其他城市；没有商场hex的城市不生成商场地图，记为跳过。
+png_mode为browser时工作进程只生成HTML，截图由主进程提交到共用的浏览器池。
+"""
+
+import os
+import glob
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Tuple
+
+import browser_pool
+import json_visualization
+import mart_hex_visualize
+from geojson_layer import DEFAULT_RENDER_MODE
+from png_renderer import DEFAULT_PNG_MODE
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+MART_SUFFIX = '_mart_hex_analysis.json'
+
+
+class DeferredScreenshots:
+    """工作进程中代替浏览器池：只记录需要截图的HTML，由主进程提交到浏览器池"""
+
+    def __init__(self):
+        self.pending: List[Tuple[str, str]] = []
+
+    def submit(self, html_path: str, png_path: str) -> None:
+        self.pending.append((html_path, png_path))
+
+
+def collect_tasks(json_dir: str, mart_analysis_dir: str, base_dir: str, render_mode: str = DEFAULT_RENDER_MODE,
+                  png_mode: str = DEFAULT_PNG_MODE, basemap_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """步骤6的所有可视化任务，按输入文件大小从大到小排序"""
+    html_dir = os.path.join(base_dir, 'html')
+    png_dir = os.path.join(base_dir, 'png')
+    options = {'render_mode': render_mode, 'png_mode': png_mode, 'basemap_dir': basemap_dir}
+    tasks = []
+    if os.path.isdir(json_dir):
+        for filename in os.listdir(json_dir):
+            if filename.endswith('_h3_grid.json') and not filename.startswith('all_cities'):
+                json_path = os.path.join(json_dir, filename)
+                tasks.append({'kind': 'density', 'name': f"{filename.replace('_h3_grid.json', '')} POI密度图",
+                              'path': json_path, 'size': os.path.getsize(json_path),
+                              'args': (json_path, html_dir, png_dir), 'options': options})
+        # 汇总地图只读取摘要文件，最后调度
+        tasks.append({'kind': 'overview', 'name': '所有城市汇总地图', 'path': json_dir, 'size': 0,
+                      'args': (json_dir, html_dir, png_dir), 'options': options})
+    for json_path in glob.glob(os.path.join(mart_analysis_dir, f'*{MART_SUFFIX}')):
+        tasks.append({'kind': 'mart', 'name': f"{os.path.basename(json_path).replace(MART_SUFFIX, '')} 商场Hex分析图",
+                      'path': json_path, 'size': os.path.getsize(json_path),
+                      'args': (json_path, base_dir), 'options': options})
+    return sorted(tasks, key=lambda task: task['size'], reverse=True)
+
+
+def _run(task: Dict[str, Any], pool) -> Optional[bool]:
+    """执行任务，返回地图是否已生成；没有数据可画时返回None（跳过）"""
+    options = dict(task['options'], pool=pool)
+    if task['kind'] == 'density':
+        city_data = json_visualization.load_city_json(task['args'][0])
+        if not city_data:
+            return False
+        return json_visualization.create_single_city_map(city_data, *task['args'][1:], **options)
+    if task['kind'] == 'overview':
+        return json_visualization.create_overview(*task['args'], **options)
+    html_file, _ = mart_hex_visualize.visualize_mart_hex_analysis(*task['args'], **options)
+    if html_file is None and not _has_mart_hexes(task['path']):
+        return None
+    return html_file is not None
+
+
+def _has_mart_hexes(json_path: str) -> bool:
+    """商场hex分析结果中是否有商场hex（mart_mesh对没有商场的城市保存空的mart_hex_analysis）"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return bool(json.load(f).get('mart_hex_analysis'))
+
+
+def run_task(task: Dict[str, Any], pool=None) -> Dict[str, Any]:
+    """执行一个可视化任务并计时，任何异常都只记为该任务失败；pool为None时截图留给主进程提交"""
+    screenshots = DeferredScreenshots() if pool is None else pool
+    start = time.perf_counter()
+    try:
+        outcome = _run(task, screenshots)
+        error = None
+    except Exception:
+        outcome = False
+        error = traceback.format_exc(limit=3)
+    return {
+        'name': task['name'],
+        'kind': task['kind'],
+        'success': outcome is None or bool(outcome),
+        'skipped': outcome is None,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+        'screenshots': screenshots.pending if pool is None else []
+    }
+
+
+def print_render_summary(results: List[Dict[str, Any]]) -> None:
+    """打印每张地图的耗时"""
+    print(f"\n{'地图':<24}{'状态':<6}{'耗时(s)':>10}")
+    for result in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        status = '跳过' if result['skipped'] else '成功' if result['success'] else '失败'
+        print(f"{result['name']:<24}{status:<6}{result['seconds']:>10.2f}")
+        if result['error']:
+            print(f"    {result['error'].strip().splitlines()[-1]}")
+
+
+def _screenshot(result: Dict[str, Any], pool: Optional[browser_pool.BrowserPool]) -> None:
+    """把工作进程留下的截图提交到浏览器池（没有浏览器池时逐个截图）"""
+    for html_path, png_path in result['screenshots']:
+        try:
+            browser_pool.screenshot(html_path, png_path, pool)
+        except Exception as e:
+            print(f"截取 {os.path.basename(html_path)} 失败: {e}")
+
+
+def render_all(json_dir: str, mart_analysis_dir: str, base_dir: str, workers: int = DEFAULT_WORKERS,
+               render_mode: str = DEFAULT_RENDER_MODE, png_mode: str = DEFAULT_PNG_MODE,
+               basemap_dir: Optional[str] = None,
+               pool: Optional[browser_pool.BrowserPool] = None) -> List[Dict[str, Any]]:
+    """并行生成所有城市的POI密度图、商场hex分析图和汇总地图，返回每个任务的结果
+
+    workers为同时运行的任务数，为1时在当前进程中依次执行；pool为png_mode='browser'时共用的浏览器池
+    """
+    tasks = collect_tasks(json_dir, mart_analysis_dir, base_dir, render_mode, png_mode, basemap_dir)
+    if not tasks:
+        print("没有需要生成的地图")
+        return []
+
+    results = []
+    if workers <= 1:
+        for task in tasks:
+            result = run_task(task, pool)
+            _screenshot(result, pool)
+            results.append(result)
+    else:
+        print(f"使用 {workers} 个进程并行生成 {len(tasks)} 张地图")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程异常退出等情况
+                    task = futures[future]
+                    result = {'name': task['name'], 'kind': task['kind'], 'success': False, 'skipped': False,
+                              'seconds': 0.0, 'error': repr(e), 'screenshots': []}
+                # 截图与其余地图的生成同时进行
+                _screenshot(result, pool)
+                results.append(result)
+
+    print_render_summary(results)
+    failed = [result['name'] for result in results if not result['success']]
+    skipped = sum(1 for result in results if result['skipped'])
+    print(f"\n生成地图: 成功 {len(results) - len(failed) - skipped} 张，跳过 {skipped} 张（没有数据），"
+          f"失败 {len(failed)} 张")
+    return results
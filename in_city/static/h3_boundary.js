@@ -0,0 +1,529 @@
+/*
+ * H3网格边界（浏览器端）
+ * 由H3网格ID计算hex边界，地图HTML中只需嵌入网格ID和数值两个数组，不再嵌入每个hex的边界坐标。
+ * 实现与H3 v4（C库 cellToBoundary、cellToChildren）相同的算法，只包含绘制所需的部分；
+ * 下面的二十面体各面中心、坐标轴方位角、基础网格所在面和相邻面的表与H3库中的表一致。
+ *
+ * 网格ID以两个uint32（高32位、低32位）表示，不依赖BigInt。
+ *   h3Boundary.cellToBoundary(hi, lo)        -> [[lat, lng], ...]（度）
+ *   h3Boundary.cellToLatLng(hi, lo)          -> [lat, lng]（度）
+ *   h3Boundary.cellToChildren(hi, lo, res)   -> [[hi, lo], ...]
+ *   h3Boundary.decodeCells(base64)           -> Uint32Array [hi0, lo0, hi1, lo1, ...]（小端uint64数组）
+ *   h3Boundary.decodeValues(base64, type)    -> 对应类型的TypedArray
+ */
+(function(root) {
+    'use strict';
+
+    var EPSILON = 1e-16;
+    var FLT_EPSILON = 1.1920929e-07;
+    var SQRT3_2 = 0.8660254037844386467637231707529361834714;
+    var SQRT7 = 2.6457513110645905905016157536392604257102;
+    var AP7_ROT_RADS = 0.333473172251832115336090755351601070065900389;
+    var RES0_U_GNOMONIC = 0.38196601125010500003;
+    var TWO_PI = 2 * Math.PI;
+    var RAD_TO_DEG = 180 / Math.PI;
+
+    // 相邻面的方向
+    var IJ = 1, KI = 2, JK = 3;
+    var NO_OVERAGE = 0, FACE_EDGE = 1, NEW_FACE = 2;
+
+    // 二十面体各面中心 [lat, lng]（弧度）
+    var FACE_CENTER = [
+        [0.8035826497189897, 1.248397419617396],
+        [1.3077478834556384, 2.5369450098779205],
+        [1.054751253523952, -1.3475173589003964],
+        [0.6001915955381867, -0.45060390946975565],
+        [0.4917154281987737, 0.40198820291130705],
+        [0.17274532741561863, 1.6781468852804335],
+        [0.6059293215713509, 2.9539233298124117],
+        [0.42737051832897976, -1.8888762003362853],
+        [-0.0790661185492129, -0.7334295133808678],
+        [-0.23096164445538384, 0.5064955873323491],
+        [0.0790661185492129, 2.4081631402089254],
+        [0.23096164445538392, -2.635097066257444],
+        [-0.17274532741561857, -1.4634457683093596],
+        [-0.6059293215713506, -0.18766932377738144],
+        [-0.42737051832897976, 1.2527164532535078],
+        [-0.6001915955381869, 2.690988744120037],
+        [-0.49171542819877384, -2.7396044506784865],
+        [-0.80358264971899, -1.8931952339723968],
+        [-1.3077478834556375, -0.6046476437118706],
+        [-1.0547512535239518, 1.794075294689396]
+    ];
+
+    // 各面i轴的方位角（弧度）
+    var FACE_AXIS = [
+        5.6199582685239395, 5.760339081714186, 0.7802136543934302, 0.43046936398000046,
+        6.130269123335111, 2.6928777065306426, 2.982963003477244, 3.532912002790141,
+        3.4943050042595676, 3.0032141694995382, 5.930472956509812, 0.13837848409025488,
+        0.4487149470591501, 0.1586296501125491, 5.891865957979238, 2.7111232896097945,
+        3.2945088374342677, 3.804819692245438, 3.66443887905519, 2.3613789991963645
+    ];
+
+    // 基础网格所在的面及其在该面上的ijk坐标 [face, i, j, k]
+    var HOME = [
+        [1, 1, 0, 0], [2, 1, 1, 0], [1, 0, 0, 0], [2, 1, 0, 0], [0, 2, 0, 0], [1, 1, 1, 0],
+        [1, 0, 0, 1], [2, 0, 0, 0], [0, 1, 0, 0], [2, 0, 1, 0], [1, 0, 1, 0], [1, 0, 1, 1],
+        [3, 1, 0, 0], [3, 1, 1, 0], [11, 2, 0, 0], [4, 1, 0, 0], [0, 0, 0, 0], [6, 0, 1, 0],
+        [0, 0, 0, 1], [2, 0, 1, 1], [7, 0, 0, 1], [2, 0, 0, 1], [0, 1, 1, 0], [6, 0, 0, 1],
+        [10, 2, 0, 0], [6, 0, 0, 0], [3, 0, 0, 0], [11, 1, 0, 0], [4, 1, 1, 0], [3, 0, 1, 0],
+        [0, 0, 1, 1], [4, 0, 0, 0], [5, 0, 1, 0], [0, 0, 1, 0], [7, 0, 1, 0], [11, 1, 1, 0],
+        [7, 0, 0, 0], [10, 1, 0, 0], [12, 2, 0, 0], [6, 1, 0, 1], [7, 1, 0, 1], [4, 0, 0, 1],
+        [3, 0, 0, 1], [3, 0, 1, 1], [4, 0, 1, 0], [6, 1, 0, 0], [11, 0, 0, 0], [8, 0, 0, 1],
+        [5, 0, 0, 1], [14, 2, 0, 0], [5, 0, 0, 0], [12, 1, 0, 0], [10, 1, 1, 0], [4, 0, 1, 1],
+        [12, 1, 1, 0], [7, 1, 0, 0], [11, 0, 1, 0], [10, 0, 0, 0], [13, 2, 0, 0], [10, 0, 0, 1],
+        [11, 0, 0, 1], [9, 0, 1, 0], [8, 0, 1, 0], [6, 2, 0, 0], [8, 0, 0, 0], [9, 0, 0, 1],
+        [14, 1, 0, 0], [5, 1, 0, 1], [16, 0, 1, 1], [8, 1, 0, 1], [5, 1, 0, 0], [12, 0, 0, 0],
+        [7, 2, 0, 0], [12, 0, 1, 0], [10, 0, 1, 0], [9, 0, 0, 0], [13, 1, 0, 0], [16, 0, 0, 1],
+        [15, 0, 1, 1], [15, 0, 1, 0], [16, 0, 1, 0], [14, 1, 1, 0], [13, 1, 1, 0], [5, 2, 0, 0],
+        [8, 1, 0, 0], [14, 0, 0, 0], [9, 1, 0, 1], [14, 0, 0, 1], [17, 0, 0, 1], [12, 0, 0, 1],
+        [16, 0, 0, 0], [17, 0, 1, 1], [15, 0, 0, 1], [16, 1, 0, 1], [9, 1, 0, 0], [15, 0, 0, 0],
+        [13, 0, 0, 0], [8, 2, 0, 0], [13, 0, 1, 0], [17, 1, 0, 1], [19, 0, 1, 0], [14, 0, 1, 0],
+        [19, 0, 1, 1], [17, 0, 1, 0], [13, 0, 0, 1], [17, 0, 0, 0], [16, 1, 0, 0], [9, 2, 0, 0],
+        [15, 1, 0, 1], [15, 1, 0, 0], [18, 0, 1, 1], [18, 0, 0, 1], [19, 0, 0, 1], [17, 1, 0, 0],
+        [19, 0, 0, 0], [18, 0, 1, 0], [18, 1, 0, 1], [19, 2, 0, 0], [19, 1, 0, 0], [18, 0, 0, 0],
+        [19, 1, 0, 1], [18, 1, 0, 0]
+    ];
+
+    // 五边形基础网格
+    var PENTAGON = [4, 14, 24, 38, 49, 58, 63, 72, 83, 97, 107, 117];
+
+    // 各面的相邻面 [中心, IJ, KI, JK]，每项为 [face, 平移i, 平移j, 平移k, 逆时针旋转60度次数]
+    var FACE_NEIGHBORS = [
+        [[0, 0, 0, 0, 0], [4, 2, 0, 2, 1], [1, 2, 2, 0, 5], [5, 0, 2, 2, 3]],
+        [[1, 0, 0, 0, 0], [0, 2, 0, 2, 1], [2, 2, 2, 0, 5], [6, 0, 2, 2, 3]],
+        [[2, 0, 0, 0, 0], [1, 2, 0, 2, 1], [3, 2, 2, 0, 5], [7, 0, 2, 2, 3]],
+        [[3, 0, 0, 0, 0], [2, 2, 0, 2, 1], [4, 2, 2, 0, 5], [8, 0, 2, 2, 3]],
+        [[4, 0, 0, 0, 0], [3, 2, 0, 2, 1], [0, 2, 2, 0, 5], [9, 0, 2, 2, 3]],
+        [[5, 0, 0, 0, 0], [10, 2, 2, 0, 3], [14, 2, 0, 2, 3], [0, 0, 2, 2, 3]],
+        [[6, 0, 0, 0, 0], [11, 2, 2, 0, 3], [10, 2, 0, 2, 3], [1, 0, 2, 2, 3]],
+        [[7, 0, 0, 0, 0], [12, 2, 2, 0, 3], [11, 2, 0, 2, 3], [2, 0, 2, 2, 3]],
+        [[8, 0, 0, 0, 0], [13, 2, 2, 0, 3], [12, 2, 0, 2, 3], [3, 0, 2, 2, 3]],
+        [[9, 0, 0, 0, 0], [14, 2, 2, 0, 3], [13, 2, 0, 2, 3], [4, 0, 2, 2, 3]],
+        [[10, 0, 0, 0, 0], [5, 2, 2, 0, 3], [6, 2, 0, 2, 3], [15, 0, 2, 2, 3]],
+        [[11, 0, 0, 0, 0], [6, 2, 2, 0, 3], [7, 2, 0, 2, 3], [16, 0, 2, 2, 3]],
+        [[12, 0, 0, 0, 0], [7, 2, 2, 0, 3], [8, 2, 0, 2, 3], [17, 0, 2, 2, 3]],
+        [[13, 0, 0, 0, 0], [8, 2, 2, 0, 3], [9, 2, 0, 2, 3], [18, 0, 2, 2, 3]],
+        [[14, 0, 0, 0, 0], [9, 2, 2, 0, 3], [5, 2, 0, 2, 3], [19, 0, 2, 2, 3]],
+        [[15, 0, 0, 0, 0], [16, 2, 0, 2, 1], [19, 2, 2, 0, 5], [10, 0, 2, 2, 3]],
+        [[16, 0, 0, 0, 0], [17, 2, 0, 2, 1], [15, 2, 2, 0, 5], [11, 0, 2, 2, 3]],
+        [[17, 0, 0, 0, 0], [18, 2, 0, 2, 1], [16, 2, 2, 0, 5], [12, 0, 2, 2, 3]],
+        [[18, 0, 0, 0, 0], [19, 2, 0, 2, 1], [17, 2, 2, 0, 5], [13, 0, 2, 2, 3]],
+        [[19, 0, 0, 0, 0], [15, 2, 0, 2, 1], [18, 2, 2, 0, 5], [14, 0, 2, 2, 3]]
+    ];
+
+    // ADJACENT_FACE_DIR[a][b]：面b在面a的哪个方向，不相邻为-1
+    var ADJACENT_FACE_DIR = [];
+    (function() {
+        for (var f = 0; f < 20; f++) {
+            var row = [];
+            for (var g = 0; g < 20; g++) { row.push(f === g ? 0 : -1); }
+            for (var dir = 1; dir <= 3; dir++) { row[FACE_NEIGHBORS[f][dir][0]] = dir; }
+            ADJACENT_FACE_DIR.push(row);
+        }
+    })();
+
+    var IS_PENTAGON = {};
+    PENTAGON.forEach(function(baseCell) { IS_PENTAGON[baseCell] = true; });
+
+    var UNIT_VECS = [[0, 0, 0], [0, 0, 1], [0, 1, 0], [0, 1, 1], [1, 0, 0], [1, 0, 1], [1, 1, 0]];
+    var HEX_VERTS_CII = [[2, 1, 0], [1, 2, 0], [0, 2, 1], [0, 1, 2], [1, 0, 2], [2, 0, 1]];
+    var HEX_VERTS_CIII = [[5, 4, 0], [1, 5, 0], [0, 5, 4], [0, 1, 5], [4, 0, 5], [5, 0, 1]];
+    var ROTATE_CW = [0, 3, 6, 2, 5, 1, 4];
+
+    function isClassIII(res) { return res % 2 === 1; }
+    function maxDim(res) { return 2 * Math.pow(7, res / 2); }
+    function unitScale(res) { return Math.pow(7, res / 2); }
+
+    function posAngle(rads) {
+        var tmp = rads < 0 ? rads + TWO_PI : rads;
+        return rads >= TWO_PI ? tmp - TWO_PI : tmp;
+    }
+
+    function constrainLng(lng) {
+        while (lng > Math.PI) { lng -= TWO_PI; }
+        while (lng < -Math.PI) { lng += TWO_PI; }
+        return lng;
+    }
+
+    // ---- IJK坐标 ----
+
+    function normalize(c) {
+        var i = c[0], j = c[1], k = c[2];
+        if (i < 0) { j -= i; k -= i; i = 0; }
+        if (j < 0) { i -= j; k -= j; j = 0; }
+        if (k < 0) { i -= k; j -= k; k = 0; }
+        var min = Math.min(i, j, k);
+        return [i - min, j - min, k - min];
+    }
+
+    function transform(c, iVec, jVec, kVec) {
+        return normalize([
+            c[0] * iVec[0] + c[1] * jVec[0] + c[2] * kVec[0],
+            c[0] * iVec[1] + c[1] * jVec[1] + c[2] * kVec[1],
+            c[0] * iVec[2] + c[1] * jVec[2] + c[2] * kVec[2]
+        ]);
+    }
+
+    function downAp7(c) { return transform(c, [3, 0, 1], [1, 3, 0], [0, 1, 3]); }
+    function downAp7r(c) { return transform(c, [3, 1, 0], [0, 3, 1], [1, 0, 3]); }
+    function downAp3(c) { return transform(c, [2, 0, 1], [1, 2, 0], [0, 1, 2]); }
+    function downAp3r(c) { return transform(c, [2, 1, 0], [0, 2, 1], [1, 0, 2]); }
+    function rotate60ccw(c) { return transform(c, [1, 1, 0], [0, 1, 1], [1, 0, 1]); }
+    function rotate60cw(c) { return transform(c, [1, 0, 1], [1, 1, 0], [0, 1, 1]); }
+
+    function roundHalfAway(x) { return x < 0 ? -Math.round(-x) : Math.round(x); }
+
+    function upAp7r(c) {
+        var i = c[0] - c[2], j = c[1] - c[2];
+        return normalize([roundHalfAway((2 * i + j) / 7), roundHalfAway((3 * j - i) / 7), 0]);
+    }
+
+    function add(a, b) { return normalize([a[0] + b[0], a[1] + b[1], a[2] + b[2]]); }
+
+    function scale(c, factor) { return [c[0] * factor, c[1] * factor, c[2] * factor]; }
+
+    function neighbor(c, digit) {
+        return digit > 0 && digit < 7 ? add(c, UNIT_VECS[digit]) : c;
+    }
+
+    function toHex2d(c) {
+        var i = c[0] - c[2], j = c[1] - c[2];
+        return [i - 0.5 * j, j * SQRT3_2];
+    }
+
+    // ---- 平面坐标到经纬度 ----
+
+    function azDistance(p, az, distance) {
+        if (distance < EPSILON) { return [p[0], p[1]]; }
+        az = posAngle(az);
+        var lat, lng;
+        if (az < EPSILON || Math.abs(az - Math.PI) < EPSILON) {
+            lat = az < EPSILON ? p[0] + distance : p[0] - distance;
+            if (Math.abs(lat - Math.PI / 2) < EPSILON) { return [Math.PI / 2, 0]; }
+            if (Math.abs(lat + Math.PI / 2) < EPSILON) { return [-Math.PI / 2, 0]; }
+            return [lat, constrainLng(p[1])];
+        }
+        var sinLat = Math.sin(p[0]) * Math.cos(distance) + Math.cos(p[0]) * Math.sin(distance) * Math.cos(az);
+        lat = Math.asin(Math.max(-1, Math.min(1, sinLat)));
+        if (Math.abs(lat - Math.PI / 2) < EPSILON) { return [Math.PI / 2, 0]; }
+        if (Math.abs(lat + Math.PI / 2) < EPSILON) { return [-Math.PI / 2, 0]; }
+        var cosLat = Math.cos(lat);
+        var sinLng = Math.sin(az) * Math.sin(distance) / cosLat;
+        var cosLng = (Math.cos(distance) - Math.sin(p[0]) * Math.sin(lat)) / Math.cos(p[0]) / cosLat;
+        sinLng = Math.max(-1, Math.min(1, sinLng));
+        cosLng = Math.max(-1, Math.min(1, cosLng));
+        lng = constrainLng(p[1] + Math.atan2(sinLng, cosLng));
+        return [lat, lng];
+    }
+
+    function hex2dToGeo(v, face, res, substrate) {
+        var r = Math.sqrt(v[0] * v[0] + v[1] * v[1]);
+        if (r < EPSILON) { return [FACE_CENTER[face][0], FACE_CENTER[face][1]]; }
+        var theta = Math.atan2(v[1], v[0]);
+        for (var i = 0; i < res; i++) { r /= SQRT7; }
+        if (substrate) {
+            r /= 3;
+            if (isClassIII(res)) { r /= SQRT7; }
+        }
+        r = Math.atan(r * RES0_U_GNOMONIC);
+        if (!substrate && isClassIII(res)) { theta = posAngle(theta + AP7_ROT_RADS); }
+        theta = posAngle(FACE_AXIS[face] - theta);
+        return azDistance(FACE_CENTER[face], theta, r);
+    }
+
+    function toDegrees(g) { return [g[0] * RAD_TO_DEG, g[1] * RAD_TO_DEG]; }
+
+    // ---- 网格ID ----
+
+    function getResolution(hi) { return (hi >>> 20) & 15; }
+    function getBaseCell(hi) { return (hi >>> 13) & 127; }
+
+    function getDigit(hi, lo, r) {
+        var offset = (15 - r) * 3;
+        if (offset >= 32) { return (hi >>> (offset - 32)) & 7; }
+        if (offset <= 29) { return (lo >>> offset) & 7; }
+        return ((lo >>> offset) | (hi << (32 - offset))) & 7;
+    }
+
+    function setDigit(cell, r, digit) {
+        var offset = (15 - r) * 3;
+        if (offset >= 32) {
+            cell[0] = ((cell[0] & ~(7 << (offset - 32))) | (digit << (offset - 32))) >>> 0;
+        } else if (offset <= 29) {
+            cell[1] = ((cell[1] & ~(7 << offset)) | (digit << offset)) >>> 0;
+        } else {
+            cell[1] = ((cell[1] & ~(7 << offset)) | (digit << offset)) >>> 0;
+            cell[0] = ((cell[0] & ~(7 >>> (32 - offset))) | (digit >>> (32 - offset))) >>> 0;
+        }
+    }
+
+    function leadingNonZeroDigit(digits) {
+        for (var r = 0; r < digits.length; r++) {
+            if (digits[r] !== 0) { return digits[r]; }
+        }
+        return 0;
+    }
+
+    // ---- 网格ID到二十面体面坐标 ----
+
+    function adjustOverageClassII(fijk, res, pentLeading4, substrate) {
+        var overage = NO_OVERAGE;
+        var dim = maxDim(res);
+        if (substrate) { dim *= 3; }
+        var c = fijk.coord;
+        var sum = c[0] + c[1] + c[2];
+        if (substrate && sum === dim) {
+            overage = FACE_EDGE;
+        } else if (sum > dim) {
+            overage = NEW_FACE;
+            var orient;
+            if (c[2] > 0) {
+                if (c[1] > 0) {
+                    orient = FACE_NEIGHBORS[fijk.face][JK];
+                } else {
+                    orient = FACE_NEIGHBORS[fijk.face][KI];
+                    if (pentLeading4) {
+                        // 五边形缺失的子序列，绕原点顶点顺时针旋转
+                        var origin = [dim, 0, 0];
+                        var tmp = rotate60cw([c[0] - origin[0], c[1] - origin[1], c[2] - origin[2]]);
+                        c = add(tmp, origin);
+                    }
+                }
+            } else {
+                orient = FACE_NEIGHBORS[fijk.face][IJ];
+            }
+            fijk.face = orient[0];
+            for (var i = 0; i < orient[4]; i++) { c = rotate60ccw(c); }
+            var factor = unitScale(res) * (substrate ? 3 : 1);
+            c = add(c, scale([orient[1], orient[2], orient[3]], factor));
+            if (substrate && c[0] + c[1] + c[2] === dim) { overage = FACE_EDGE; }
+        }
+        fijk.coord = c;
+        return overage;
+    }
+
+    function cellToFaceIjk(hi, lo) {
+        var res = getResolution(hi);
+        var baseCell = getBaseCell(hi);
+        var digits = [];
+        for (var r = 1; r <= res; r++) { digits.push(getDigit(hi, lo, r)); }
+        var pentagon = IS_PENTAGON[baseCell] === true;
+        if (pentagon && leadingNonZeroDigit(digits) === 5) {
+            digits = digits.map(function(digit) { return ROTATE_CW[digit]; });
+        }
+
+        var home = HOME[baseCell];
+        var fijk = {face: home[0], coord: [home[1], home[2], home[3]]};
+        var possibleOverage = pentagon || !(res === 0 || (home[1] === 0 && home[2] === 0 && home[3] === 0));
+        for (r = 1; r <= res; r++) {
+            fijk.coord = isClassIII(r) ? downAp7(fijk.coord) : downAp7r(fijk.coord);
+            fijk.coord = neighbor(fijk.coord, digits[r - 1]);
+        }
+        if (!possibleOverage) { return fijk; }
+
+        // 可能位于相邻的面上，在Class II网格中调整
+        var origCoord = fijk.coord;
+        var adjRes = res;
+        if (isClassIII(res)) {
+            fijk.coord = downAp7r(fijk.coord);
+            adjRes += 1;
+        }
+        var pentLeading4 = pentagon && leadingNonZeroDigit(digits) === 4;
+        if (adjustOverageClassII(fijk, adjRes, pentLeading4, false) !== NO_OVERAGE) {
+            if (pentagon) {
+                while (adjustOverageClassII(fijk, adjRes, false, false) !== NO_OVERAGE) { continue; }
+            }
+            if (adjRes !== res) { fijk.coord = upAp7r(fijk.coord); }
+        } else if (adjRes !== res) {
+            fijk.coord = origCoord;
+        }
+        return fijk;
+    }
+
+    // ---- 边界 ----
+
+    function cellVerts(fijk, res, count) {
+        var coord = downAp3r(downAp3(fijk.coord));
+        var adjRes = res;
+        if (isClassIII(res)) {
+            coord = downAp7r(coord);
+            adjRes += 1;
+        }
+        var offsets = isClassIII(res) ? HEX_VERTS_CIII : HEX_VERTS_CII;
+        var verts = [];
+        for (var v = 0; v < count; v++) {
+            verts.push({face: fijk.face, coord: add(coord, offsets[v])});
+        }
+        return {adjRes: adjRes, verts: verts};
+    }
+
+    function faceEdge(dir, adjRes) {
+        var dim = maxDim(adjRes);
+        var v0 = [3 * dim, 0], v1 = [-1.5 * dim, 3 * SQRT3_2 * dim], v2 = [-1.5 * dim, -3 * SQRT3_2 * dim];
+        if (dir === IJ) { return [v0, v1]; }
+        if (dir === JK) { return [v1, v2]; }
+        return [v2, v0];
+    }
+
+    function intersect(p0, p1, p2, p3) {
+        var s1 = [p1[0] - p0[0], p1[1] - p0[1]];
+        var s2 = [p3[0] - p2[0], p3[1] - p2[1]];
+        var t = (s2[0] * (p0[1] - p2[1]) - s2[1] * (p0[0] - p2[0])) / (-s2[0] * s1[1] + s1[0] * s2[1]);
+        return [p0[0] + t * s1[0], p0[1] + t * s1[1]];
+    }
+
+    function almostEquals(a, b) {
+        return Math.abs(a[0] - b[0]) < FLT_EPSILON && Math.abs(a[1] - b[1]) < FLT_EPSILON;
+    }
+
+    function hexBoundary(fijk, res) {
+        var cv = cellVerts(fijk, res, 6);
+        var adjRes = cv.adjRes;
+        var boundary = [];
+        var lastFace = -1, lastOverage = NO_OVERAGE;
+        // 多循环一次，检查最后一条边是否跨越二十面体的边
+        for (var vert = 0; vert < 7; vert++) {
+            var v = vert % 6;
+            var vertFijk = {face: cv.verts[v].face, coord: cv.verts[v].coord};
+            var overage = adjustOverageClassII(vertFijk, adjRes, false, true);
+
+            // Class III的边可能跨越二十面体的边，此时在交点处加一个顶点
+            if (isClassIII(res) && vert > 0 && vertFijk.face !== lastFace && lastOverage !== FACE_EDGE) {
+                var orig0 = toHex2d(cv.verts[(v + 5) % 6].coord);
+                var orig1 = toHex2d(cv.verts[v].coord);
+                var face2 = lastFace === fijk.face ? vertFijk.face : lastFace;
+                var edge = faceEdge(ADJACENT_FACE_DIR[fijk.face][face2], adjRes);
+                var inter = intersect(orig0, orig1, edge[0], edge[1]);
+                if (!almostEquals(orig0, inter) && !almostEquals(orig1, inter)) {
+                    boundary.push(toDegrees(hex2dToGeo(inter, fijk.face, adjRes, true)));
+                }
+            }
+            if (vert < 6) {
+                boundary.push(toDegrees(hex2dToGeo(toHex2d(vertFijk.coord), vertFijk.face, adjRes, true)));
+            }
+            lastFace = vertFijk.face;
+            lastOverage = overage;
+        }
+        return boundary;
+    }
+
+    function pentagonBoundary(fijk, res) {
+        var cv = cellVerts(fijk, res, 5);
+        var adjRes = cv.adjRes;
+        var boundary = [];
+        var last = null;
+        for (var vert = 0; vert < 6; vert++) {
+            var v = vert % 5;
+            var vertFijk = {face: cv.verts[v].face, coord: cv.verts[v].coord};
+            while (adjustOverageClassII(vertFijk, adjRes, false, true) === NEW_FACE) { continue; }
+
+            // Class III五边形的每条边都跨越二十面体的边
+            if (isClassIII(res) && vert > 0) {
+                var orig0 = toHex2d(last.coord);
+                var orient = FACE_NEIGHBORS[vertFijk.face][ADJACENT_FACE_DIR[vertFijk.face][last.face]];
+                var c = vertFijk.coord;
+                for (var i = 0; i < orient[4]; i++) { c = rotate60ccw(c); }
+                c = add(c, scale([orient[1], orient[2], orient[3]], unitScale(adjRes) * 3));
+                var orig1 = toHex2d(c);
+                var edge = faceEdge(ADJACENT_FACE_DIR[orient[0]][vertFijk.face], adjRes);
+                boundary.push(toDegrees(hex2dToGeo(intersect(orig0, orig1, edge[0], edge[1]), orient[0], adjRes, true)));
+            }
+            if (vert < 5) {
+                boundary.push(toDegrees(hex2dToGeo(toHex2d(vertFijk.coord), vertFijk.face, adjRes, true)));
+            }
+            last = vertFijk;
+        }
+        return boundary;
+    }
+
+    function isPentagon(hi, lo) {
+        if (!IS_PENTAGON[getBaseCell(hi)]) { return false; }
+        var res = getResolution(hi);
+        for (var r = 1; r <= res; r++) {
+            if (getDigit(hi, lo, r) !== 0) { return false; }
+        }
+        return true;
+    }
+
+    function cellToBoundary(hi, lo) {
+        var res = getResolution(hi);
+        var fijk = cellToFaceIjk(hi, lo);
+        return isPentagon(hi, lo) ? pentagonBoundary(fijk, res) : hexBoundary(fijk, res);
+    }
+
+    function cellToLatLng(hi, lo) {
+        var res = getResolution(hi);
+        var fijk = cellToFaceIjk(hi, lo);
+        return toDegrees(hex2dToGeo(toHex2d(fijk.coord), fijk.face, res, false));
+    }
+
+    // ---- 子网格 ----
+
+    function cellToChildren(hi, lo, childRes) {
+        var res = getResolution(hi);
+        var children = [];
+        if (childRes < res) { return children; }
+        var pentagon = isPentagon(hi, lo);
+        var count = Math.pow(7, childRes - res);
+        for (var n = 0; n < count; n++) {
+            var cell = [((hi & ~(15 << 20)) | (childRes << 20)) >>> 0, lo];
+            var rest = n, leading = 0;
+            for (var r = childRes; r > res; r--) {
+                var digit = rest % 7;
+                rest = (rest - digit) / 7;
+                setDigit(cell, r, digit);
+            }
+            // 五边形没有首个非零位为K(1)的子网格
+            if (pentagon) {
+                for (r = res + 1; r <= childRes && leading === 0; r++) { leading = getDigit(cell[0], cell[1], r); }
+                if (leading === 1) { continue; }
+            }
+            children.push(cell);
+        }
+        return children;
+    }
+
+    // ---- 数组解码 ----
+
+    function decodeBase64(text) {
+        var binary = atob(text);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) { bytes[i] = binary.charCodeAt(i); }
+        return bytes.buffer;
+    }
+
+    function decodeCells(text) {
+        var view = new DataView(decodeBase64(text));
+        var cells = new Uint32Array(view.byteLength / 4);
+        for (var i = 0; i < cells.length; i += 2) {
+            cells[i] = view.getUint32(i * 4 + 4, true);
+            cells[i + 1] = view.getUint32(i * 4, true);
+        }
+        return cells;
+    }
+
+    var VALUE_TYPES = {
+        uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array,
+        int32: Int32Array, float32: Float32Array, float64: Float64Array
+    };
+
+    function decodeValues(text, type) {
+        return new VALUE_TYPES[type](decodeBase64(text));
+    }
+
+    var api = {
+        cellToBoundary: cellToBoundary,
+        cellToLatLng: cellToLatLng,
+        cellToChildren: cellToChildren,
+        isPentagon: isPentagon,
+        getResolution: getResolution,
+        decodeCells: decodeCells,
+        decodeValues: decodeValues
+    };
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = api;
+    } else {
+        root.h3Boundary = api;
+    }
+})(this);
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+
+from shapely.geometry import MultiPolygon, box, mapping
+
+import boundary_provider
+from conftest import CENTER
+
+HEFEI = box(116.8, 31.5, 117.7, 32.2)
+WUHU = MultiPolygon([box(118.0, 31.0, 118.5, 31.5), box(118.6, 31.0, 118.8, 31.2)])
+
+
+class FakeNetwork:
+    source = 'nominatim'
+
+    def __init__(self, geometries):
+        self.geometries = geometries
+        self.queries = []
+
+    def get(self, city_name):
+        self.queries.append(city_name)
+        return self.geometries.get(city_name)
+
+
+def write_geojson(path, features):
+    collection = {'type': 'FeatureCollection',
+                  'features': [{'type': 'Feature', 'properties': props, 'geometry': mapping(geometry)}
+                               for props, geometry in features]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(collection, f, ensure_ascii=False)
+
+
+def make_provider(tmp_path, network=None):
+    write_geojson(str(tmp_path / '行政区划.geojson'),
+                  [({'name': '合肥市', 'name_zh': 'Hefei'}, HEFEI), ({'name': '芜湖市'}, WUHU)])
+    local = boundary_provider.LocalBoundaryProvider.from_dir(str(tmp_path))
+    cache = boundary_provider.CacheBoundaryProvider(str(tmp_path / 'cache'))
+    return boundary_provider.BoundaryProvider(local, cache, network)
+
+
+def test_local_file_lookup_by_any_name_and_point(tmp_path):
+    provider = make_provider(tmp_path)
+    assert provider.get('合肥市').equals(HEFEI)
+    assert provider.get('合肥').equals(HEFEI)
+    assert provider.get('hefei').equals(HEFEI)
+    assert provider.get('芜湖市').equals(WUHU)
+    assert provider.locate(*CENTER) == '合肥市'
+    assert provider.locate(39.9, 116.4) is None
+
+
+def test_network_result_is_cached_and_reused_offline(tmp_path):
+    nanjing = box(118.4, 31.2, 119.2, 32.6)
+    network = FakeNetwork({'南京市': nanjing})
+    provider = make_provider(tmp_path, network)
+
+    assert provider.get('南京市').equals(nanjing)
+    assert provider.get('南京市').equals(nanjing)
+    assert network.queries == ['南京市']
+
+    offline = make_provider(tmp_path)
+    assert offline.get('南京', offline=True).equals(nanjing)
+    assert offline.get('上海市', offline=True) is None
+
+
+def test_offline_mode_never_queries_network(tmp_path):
+    network = FakeNetwork({'上海市': box(121, 31, 122, 32)})
+    provider = make_provider(tmp_path, network)
+    assert provider.get('上海市', offline=True) is None
+    assert network.queries == []
+
+
+def test_normalize_name():
+    assert boundary_provider.normalize_name(' 合肥市 ') == '合肥'
+    assert boundary_provider.normalize_name('ＨＥＦＥＩ') == 'hefei'
+    assert boundary_provider.normalize_name('市') == '市'
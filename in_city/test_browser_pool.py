@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+
+import browser_pool
+
+pytestmark = pytest.mark.skipif(not browser_pool.is_available(), reason="需要selenium")
+
+
+class FakeChrome:
+    """启动较慢的假浏览器，记录启动次数"""
+
+    started = 0
+    lock = threading.Lock()
+    fail = False
+
+    def __init__(self, options=None):
+        time.sleep(0.05)
+        if FakeChrome.fail:
+            raise RuntimeError('chrome启动失败')
+        with FakeChrome.lock:
+            FakeChrome.started += 1
+
+    def set_window_size(self, width, height):
+        pass
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fake_chrome(monkeypatch):
+    FakeChrome.started = 0
+    FakeChrome.fail = False
+    monkeypatch.setattr(browser_pool.webdriver, 'Chrome', FakeChrome)
+    return FakeChrome
+
+
+def acquire_concurrently(pool, count):
+    drivers, errors = [], []
+
+    def acquire():
+        try:
+            driver = pool._acquire()
+        except Exception as e:
+            errors.append(e)
+            return
+        drivers.append(driver)
+        time.sleep(0.05)
+        pool._drivers.put(driver)
+
+    threads = [threading.Thread(target=acquire) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return drivers, errors
+
+
+def test_concurrent_acquire_starts_at_most_size_browsers(fake_chrome):
+    pool = browser_pool.BrowserPool(size=2)
+    drivers, errors = acquire_concurrently(pool, 8)
+
+    assert not errors and len(drivers) == 8
+    assert fake_chrome.started == 2
+    assert len(pool._started) == 2
+    pool.close()
+
+
+def test_failed_start_releases_its_slot(fake_chrome):
+    pool = browser_pool.BrowserPool(size=1)
+    fake_chrome.fail = True
+    with pytest.raises(RuntimeError):
+        pool._acquire()
+    assert pool._slots == 0
+
+    fake_chrome.fail = False
+    drivers, errors = acquire_concurrently(pool, 3)
+    assert not errors and fake_chrome.started == 1
+    pool.close()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+
+import h3
+import numpy as np
+import pytest
+
+import category_matrix
+import poi_hex
+
+pytestmark = pytest.mark.skipif(not category_matrix.is_available(), reason="需要scipy")
+
+
+def legacy_counts(pois):
+    """由内嵌的POI字典列表统计各分块的类别数量"""
+    return {
+        'big_type': dict(Counter(poi['big_type'] for poi in pois)),
+        'mid_type': dict(Counter(poi['mid_type'] for poi in pois)),
+        'small_type': dict(Counter(poi['small_type'] for poi in pois)),
+        'type_pair': dict(Counter(f"{poi['big_type']}|{poi['mid_type']}" for poi in pois)),
+    }
+
+
+@pytest.fixture
+def ingested(tmp_path, city_grid, pois, write_csv):
+    matrix_path = str(tmp_path / '合肥市_poi_category_matrix.npz')
+    data = poi_hex.ingest_city_pois(write_csv(pois), city_grid, str(tmp_path / '合肥市_pois.parquet'), matrix_path,
+                                    chunksize=7)
+    legacy = poi_hex.update_h3_with_pois(city_grid, poi_hex.assign_pois_to_hexes(pois, city_grid))
+    return data, category_matrix.CategoryMatrix.load(matrix_path), {h['h3_index']: h['pois'] for h in legacy['hexes']}
+
+
+def test_matrix_counts_match_legacy_poi_lists(ingested):
+    data, matrix, legacy_pois = ingested
+
+    assert data['category_matrix']['shape'] == list(matrix.matrix.shape)
+    for hex_info in data['hexes']:
+        rows = matrix.rows_for([hex_info['h3_index']])
+        assert matrix.aggregate(rows) == legacy_counts(legacy_pois[hex_info['h3_index']])
+        assert matrix.poi_counts[rows[0]] == hex_info['poi_count']
+
+
+def test_aggregate_over_hexes_and_unknown_hex(ingested):
+    data, matrix, legacy_pois = ingested
+    h3_ids = [h['h3_index'] for h in data['hexes'][:3]]
+    outside = h3.latlng_to_cell(31.2304, 121.4737, 7)
+
+    rows = matrix.rows_for(h3_ids + [outside])
+    assert len(rows) == 3
+    assert matrix.aggregate(rows) == legacy_counts([poi for h3_id in h3_ids for poi in legacy_pois[h3_id]])
+
+    column = matrix.column('big_type', '餐饮服务')
+    counts = matrix.column_counts('big_type', '餐饮服务')
+    assert counts.sum() == np.asarray(matrix.matrix[:, column].sum())
+    assert matrix.column('big_type', '不存在的类别') is None
+
+
+def test_builder_removal_drops_empty_columns(ingested, tmp_path):
+    _, matrix, _ = ingested
+    builder = category_matrix.CategoryMatrixBuilder.from_matrix(matrix)
+    cell = matrix.cells[:1]
+    builder.add(cell, np.array(['新类别']), np.array(['新中类']), np.array(['新小类']))
+    builder.add(cell, np.array(['新类别']), np.array(['新中类']), np.array(['新小类']), sign=-1)
+    rebuilt = builder.build()
+
+    assert rebuilt.vocab == matrix.vocab
+    assert (rebuilt.matrix != matrix.matrix).nnz == 0
+
+    path = str(tmp_path / 'roundtrip.npz')
+    rebuilt.save(path)
+    loaded = category_matrix.CategoryMatrix.load(path)
+    assert loaded.vocab == rebuilt.vocab and (loaded.matrix != rebuilt.matrix).nnz == 0
+    np.testing.assert_array_equal(loaded.cells, rebuilt.cells)
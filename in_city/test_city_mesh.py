@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+from shapely.geometry import GeometryCollection, LineString, MultiPolygon, Point, box
+
+import city_mesh
+from hex_coverage import CompactCoverage
+
+MAINLAND = box(117.0, 31.6, 117.4, 31.9)
+ISLAND = box(117.6, 31.6, 117.7, 31.7)
+
+
+def test_every_part_of_a_multipolygon_is_gridded():
+    hexes = city_mesh.generate_h3_grid(MultiPolygon([MAINLAND, ISLAND]), 7)
+    cells = {hex_info['h3_index'] for hex_info in hexes}
+
+    mainland = set(h3.polygon_to_cells(h3.geo_to_h3shape(MAINLAND.__geo_interface__), 7))
+    island = set(h3.polygon_to_cells(h3.geo_to_h3shape(ISLAND.__geo_interface__), 7))
+    assert island and cells == mainland | island
+    coverage = CompactCoverage.from_cells(sorted(cells), 7)
+    assert coverage.contains_point(31.65, 117.65) and not coverage.contains_point(31.65, 117.5)
+
+
+def test_geometry_collection_keeps_polygonal_parts(monkeypatch):
+    collection = GeometryCollection([MAINLAND, ISLAND, LineString([(117, 31), (118, 32)]), Point(117, 31)])
+    monkeypatch.setattr(city_mesh.boundary_provider, 'get_boundary', lambda name, offline=False: collection)
+    boundary = city_mesh.get_city_boundary('合肥市')
+    assert boundary.geom_type == 'MultiPolygon' and boundary.equals(MultiPolygon([MAINLAND, ISLAND]))
+
+    monkeypatch.setattr(city_mesh.boundary_provider, 'get_boundary',
+                        lambda name, offline=False: LineString([(117, 31), (118, 32)]))
+    assert city_mesh.get_city_boundary('合肥市') is None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import h3
+
+import city_summary
+import grid_geometry
+from conftest import grid_cells, make_city_grid
+
+
+def counted_grid(k=2):
+    city_grid = make_city_grid(grid_cells(k))
+    for i, hex_info in enumerate(city_grid['hexes']):
+        hex_info['poi_count'] = i % 5
+    return city_grid
+
+
+def test_summary_columns_match_grid():
+    city_grid = counted_grid()
+    summary = city_summary.build_summary(city_grid)
+
+    hexes = city_grid['hexes']
+    assert summary['h3_index'] == [h['h3_index'] for h in hexes]
+    assert summary['poi_count'] == [h['poi_count'] for h in hexes]
+    assert summary['total_pois'] == sum(h['poi_count'] for h in hexes)
+    assert summary['max_poi_count'] == 4
+    for h3_index, lat, lng in zip(summary['h3_index'], summary['lat'], summary['lng']):
+        expected = h3.cell_to_latlng(h3_index)
+        assert abs(lat - expected[0]) < 1e-6 and abs(lng - expected[1]) < 1e-6
+
+
+def test_parent_aggregation_keeps_total():
+    summary = city_summary.build_summary(counted_grid())
+    for resolution in city_summary.LOD_MIN_ZOOM:
+        aggregated = city_summary.aggregate_to_parent(summary, resolution)
+        assert sum(aggregated['poi_count']) == summary['total_pois']
+        assert all(h3.get_resolution(h) == resolution for h in aggregated['h3_index'])
+        assert len(city_summary.summary_records(aggregated)) == len(aggregated['h3_index'])
+
+
+def test_stale_or_missing_summary_is_regenerated(tmp_path):
+    grid_path = str(tmp_path / '合肥市_h3_grid.json')
+    city_grid = counted_grid()
+    grid_geometry.save_grid(grid_path, city_grid)
+
+    summary = next(city_summary.iter_summaries(str(tmp_path)))
+    summary_path = city_summary.get_summary_path(grid_path)
+    assert os.path.exists(summary_path)
+    assert summary['city_name'] == '合肥市' and summary['total_hexes'] == len(city_grid['hexes'])
+
+    # 网格更新后摘要比网格旧，再次读取时重新生成
+    city_grid['hexes'][0]['poi_count'] = 100
+    grid_geometry.save_grid(grid_path, city_grid)
+    os.utime(summary_path, (0, 0))
+    assert city_summary.ensure_summary(grid_path)['poi_count'][0] == 100
+    assert os.path.getmtime(summary_path) >= os.path.getmtime(grid_path)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import colormap
+
+
+def legacy_color(poi_count, max_poi_count):
+    """原json_visualization.get_color_from_density的逐个计算"""
+    ratio = np.sqrt(poi_count / max_poi_count) if poi_count else 0
+    if ratio < 0.5:
+        t = ratio * 2
+        return int(0x44 + (0xff - 0x44) * t), int(0x44 + (0xff - 0x44) * t), int(0x44 + (0x00 - 0x44) * t)
+    t = (ratio - 0.5) * 2
+    return 0xff, 0xff, int(0x00 + (0xff - 0x00) * t)
+
+
+def rgb(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def test_default_scale_matches_legacy_colors():
+    counts = np.arange(0, 501)
+    colors = colormap.ColorScale(counts).colors(counts)
+    for count, color in zip(counts.tolist(), colors.tolist()):
+        # 颜色表有256级，与逐个计算最多差几个色阶
+        assert np.abs(np.subtract(rgb(color), legacy_color(count, 500))).max() <= 3
+
+
+@pytest.mark.parametrize('scale', colormap.SCALES)
+def test_colors_are_monotonic_and_legend_descends(scale):
+    counts = np.random.default_rng(0).integers(0, 300, 1000)
+    color_scale = colormap.ColorScale(counts, scale)
+    order = np.argsort(counts, kind='stable')
+    ratios = color_scale.normalize(counts[order])
+    assert np.all(np.diff(ratios) >= 0)
+    assert ratios[0] == 0 and ratios[-1] == 1
+
+    values = [float(label.lstrip('≥ ')) for _, label in color_scale.legend_entries()]
+    assert values == sorted(values, reverse=True)
+
+
+@pytest.mark.parametrize('scale', ['linear', 'sqrt', 'log'])
+def test_values_at_inverts_normalize(scale):
+    color_scale = colormap.ColorScale([0, 10, 250], scale)
+    positions = np.linspace(0, 1, 11)
+    np.testing.assert_allclose(color_scale.normalize(color_scale.values_at(positions)), positions, atol=1e-12)
+
+
+def test_empty_city_and_unknown_scale():
+    assert colormap.ColorScale([0, 0]).colors([0, 0]).tolist() == [colormap.EMPTY_COLOR] * 2
+    with pytest.raises(ValueError):
+        colormap.ColorScale([1, 2], 'cubic')
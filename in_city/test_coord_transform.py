@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import coord_transform
+
+# (WGS-84 lat, WGS-84 lng, GCJ-02 lat, GCJ-02 lng)：上海、深圳、北京的公开参考点
+REFERENCE_POINTS = np.array([
+    (31.1774276, 121.5272106, 31.17530398364597, 121.531541859215),
+    (22.543847, 113.912316, 22.540796131694766, 113.9171764808363),
+    (39.911954, 116.377817, 39.91334545536069, 116.38404722455657),
+])
+
+
+def test_wgs84_to_gcj02_matches_reference_points():
+    wgs_lat, wgs_lng, gcj_lat, gcj_lng = REFERENCE_POINTS.T
+    lng, lat = coord_transform.wgs84_to_gcj02(wgs_lng, wgs_lat)
+    np.testing.assert_allclose(lng, gcj_lng, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(lat, gcj_lat, rtol=0, atol=1e-9)
+
+
+def test_to_wgs84_inverts_reference_points_within_centimetres():
+    wgs_lat, wgs_lng, gcj_lat, gcj_lng = REFERENCE_POINTS.T
+    lng, lat = coord_transform.to_wgs84(gcj_lng, gcj_lat, 'amap')
+    # 1e-6度约0.1米
+    np.testing.assert_allclose(lng, wgs_lng, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(lat, wgs_lat, rtol=0, atol=1e-6)
+
+
+def test_points_outside_china_and_nan_are_unchanged():
+    lng, lat = coord_transform.to_wgs84(np.array([2.3522, np.nan]), np.array([48.8566, 31.8]), 'gcj02')
+    assert lng[0] == 2.3522 and lat[0] == 48.8566
+    assert np.isnan(lng[1]) and np.isnan(lat[1])
+
+
+def test_wgs84_sources_pass_through_and_unknown_source_raises():
+    lng, lat = coord_transform.to_wgs84([117.2272], [31.8206], 'osm')
+    assert lng.tolist() == [117.2272] and lat.tolist() == [31.8206]
+    with pytest.raises(ValueError):
+        coord_transform.to_wgs84([117.2272], [31.8206], 'baidu')
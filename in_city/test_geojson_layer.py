@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import folium
+import h3
+import pytest
+
+import geojson_layer
+from conftest import CENTER, grid_cells
+
+
+def test_hex_features_are_closed_rings_matching_h3():
+    cells = grid_cells()
+    features = geojson_layer.hex_features(cells, [{'poi_count': i} for i in range(len(cells))])
+
+    assert [f['properties'] for f in features] == [{'h3_index': h, 'poi_count': i} for i, h in enumerate(cells)]
+    for feature, h in zip(features, cells):
+        ring = feature['geometry']['coordinates'][0]
+        assert ring[0] == ring[-1]
+        expected = [[round(lng, 6), round(lat, 6)] for lat, lng in h3.cell_to_boundary(h)]
+        assert ring[:-1] == expected
+
+
+def test_grid_boundary_is_used_when_given():
+    boundary = [[117.0, 31.0], [117.1, 31.0], [117.1, 31.1]]
+    ring = geojson_layer.hex_ring('ignored', boundary)
+    assert ring == boundary + [boundary[0]]
+
+
+def test_each_layer_is_a_single_geojson_element():
+    cells = grid_cells()
+    m = folium.Map(location=CENTER, zoom_start=11)
+    layer = geojson_layer.add_geojson_layer(m, geojson_layer.hex_features(cells),
+                                            lambda props: {'fillColor': '#ff0000'}, name='城市hex',
+                                            tooltip=[('h3_index', 'H3 ID')])
+    group = geojson_layer.hex_group_feature(cells, {'name': '细分网格'})
+    geojson_layer.add_geojson_layer(m, [group], {'color': '#ffffff'})
+
+    assert geojson_layer.add_geojson_layer(m, [], {}) is None
+    assert len(group['geometry']['coordinates']) == len(cells)
+    html = m.get_root().render()
+    assert html.count('L.geoJson(') == 2
+    assert layer.get_name() in html
+
+
+def test_unknown_render_mode_raises():
+    assert geojson_layer.check_render_mode('compact') == 'compact'
+    with pytest.raises(ValueError):
+        geojson_layer.check_render_mode('svg')
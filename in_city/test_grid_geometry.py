@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+
+import h3
+import numpy as np
+import pytest
+
+import grid_geometry
+from conftest import grid_cells, make_city_grid
+
+
+def legacy_grid(cells):
+    """旧格式：每个hex带有boundary、center、lat、lng"""
+    hexes = []
+    for i, h in enumerate(cells):
+        lat, lng = h3.cell_to_latlng(h)
+        hexes.append({'h3_index': h, 'boundary': [[lng, lat] for lat, lng in h3.cell_to_boundary(h)],
+                      'center': [lat, lng], 'lat': lat, 'lng': lng, 'poi_count': i})
+    return {'city_name': '合肥市', 'resolution': 7, 'hexes': hexes}
+
+
+def test_lazy_geometry_matches_h3(monkeypatch):
+    monkeypatch.setattr(grid_geometry, 'BATCH_SIZE', 4)
+    cells = grid_cells(2)
+    hexes = make_city_grid(cells)['hexes']
+    assert 'boundary' not in dict(hexes[0])
+
+    for hex_info, h in zip(hexes, cells):
+        lat, lng = h3.cell_to_latlng(h)
+        assert hex_info['center'] == (lat, lng)
+        assert hex_info['lat'] == lat and hex_info.get('lng') == lng
+        assert hex_info['boundary'] == [(lng, lat) for lat, lng in h3.cell_to_boundary(h)]
+    assert hexes[0].get('poi_count', 0) == 0
+    with pytest.raises(KeyError):
+        hexes[0]['poi_count']
+
+
+def test_round_trip_keeps_attributes_and_drops_geometry(tmp_path):
+    cells = grid_cells(2)
+    city_grid = make_city_grid(cells)
+    for i, hex_info in enumerate(city_grid['hexes']):
+        hex_info['poi_count'] = i
+        if i % 3 == 0:
+            hex_info['mall'] = True
+    path = str(tmp_path / '合肥市_h3_grid.json')
+    grid_geometry.save_grid(path, city_grid)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    assert saved['format'] == grid_geometry.GRID_FORMAT
+    assert not set(saved['columns']) & set(grid_geometry.GEOMETRY_KEYS)
+
+    loaded = grid_geometry.load_grid(path)
+    assert loaded['city_name'] == '合肥市' and loaded['resolution'] == 7
+    assert [dict(h) for h in loaded['hexes']] == [dict(h) for h in city_grid['hexes']]
+    assert [h['h3_index'] for h in loaded['hexes']] == cells
+
+
+def test_legacy_grid_is_read_and_upgraded(tmp_path):
+    cells = grid_cells()
+    legacy = legacy_grid(cells)
+    path = str(tmp_path / '合肥市_h3_grid.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    loaded = grid_geometry.load_grid(path)
+    assert loaded == legacy
+    lat, lng = grid_geometry.grid_geometry(loaded).centers()
+    np.testing.assert_allclose(lat, [h['lat'] for h in legacy['hexes']])
+
+    grid_geometry.save_grid(path, loaded)
+    upgraded = grid_geometry.load_grid(path)
+    assert [h['poi_count'] for h in upgraded['hexes']] == list(range(len(cells)))
+    np.testing.assert_allclose(upgraded['hexes'][0]['boundary'], legacy['hexes'][0]['boundary'])
+
+
+def test_lazy_hex_copy_and_pickle_keep_geometry():
+    hex_info = make_city_grid(grid_cells())['hexes'][2]
+    for clone in (hex_info.copy(), pickle.loads(pickle.dumps(hex_info))):
+        assert dict(clone) == dict(hex_info)
+        assert clone['center'] == hex_info['center']
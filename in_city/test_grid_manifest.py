@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import h3
+
+import grid_geometry
+import grid_manifest
+from conftest import grid_cells, make_city_grid
+
+
+def save(json_dir, city_name, k):
+    path = os.path.join(json_dir, f"{city_name}{grid_manifest.GRID_SUFFIX}")
+    city_grid = make_city_grid(grid_cells(k))
+    city_grid['city_name'] = city_name
+    grid_geometry.save_grid(path, city_grid)
+    return path, city_grid
+
+
+def test_update_city_records_grid(tmp_path):
+    json_dir = str(tmp_path)
+    path, city_grid = save(json_dir, '合肥市', 2)
+    entry = grid_manifest.update_city(json_dir, path, city_grid)
+
+    assert entry['total_hexes'] == len(city_grid['hexes']) and entry['resolution'] == 7
+    assert entry['content_hash'] == grid_manifest.file_hash(path)
+    lats, lngs = zip(*(point for h in grid_cells(2) for point in h3.cell_to_boundary(h)))
+    assert entry['bbox'] == [round(v, 6) for v in (min(lngs), min(lats), max(lngs), max(lats))]
+    assert grid_manifest.load_manifest(json_dir)['cities']['合肥市'] == entry
+
+
+def test_refresh_is_incremental(tmp_path, monkeypatch):
+    json_dir = str(tmp_path)
+    save(json_dir, '合肥市', 1)
+    wuhu_path, _ = save(json_dir, '芜湖市', 2)
+    manifest = grid_manifest.refresh_manifest(json_dir)
+    assert set(manifest['cities']) == {'合肥市', '芜湖市'}
+    assert [entry['city_name'] for entry in grid_manifest.list_cities(json_dir)] == ['芜湖市', '合肥市']
+
+    rebuilt = []
+    original = grid_manifest.build_entry
+
+    def build_entry(path, *args, **kwargs):
+        rebuilt.append(os.path.basename(path))
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(grid_manifest, 'build_entry', build_entry)
+    manifest_path = grid_manifest.get_manifest_path(json_dir)
+    mtime = os.path.getmtime(manifest_path)
+    grid_manifest.refresh_manifest(json_dir)
+    assert rebuilt == [] and os.path.getmtime(manifest_path) == mtime
+
+    # 修改芜湖市、删除合肥市、新增南京市
+    save(json_dir, '芜湖市', 3)
+    os.remove(os.path.join(json_dir, f"合肥市{grid_manifest.GRID_SUFFIX}"))
+    save(json_dir, '南京市', 1)
+    manifest = grid_manifest.refresh_manifest(json_dir)
+    assert sorted(rebuilt) == sorted([f"芜湖市{grid_manifest.GRID_SUFFIX}", f"南京市{grid_manifest.GRID_SUFFIX}"])
+    assert set(manifest['cities']) == {'芜湖市', '南京市'}
+    assert manifest['cities']['芜湖市']['total_hexes'] == len(grid_cells(3))
+    assert manifest['cities']['芜湖市']['content_hash'] == grid_manifest.file_hash(wuhu_path)
+
+
+def test_unreadable_grid_is_skipped(tmp_path):
+    json_dir = str(tmp_path)
+    save(json_dir, '合肥市', 1)
+    with open(os.path.join(json_dir, f"损坏市{grid_manifest.GRID_SUFFIX}"), 'w', encoding='utf-8') as f:
+        f.write('{')
+    assert set(grid_manifest.refresh_manifest(json_dir)['cities']) == {'合肥市'}
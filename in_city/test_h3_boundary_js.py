@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""static/h3_boundary.js与h3库的一致性（需要node）"""
+
+import json
+import random
+import shutil
+import subprocess
+
+import h3
+import numpy as np
+import pytest
+
+from compact_layer import H3_SCRIPT_PATH
+
+NODE = shutil.which('node') or shutil.which('nodejs')
+pytestmark = pytest.mark.skipif(NODE is None, reason="需要node")
+
+# 在node中对每个网格调用h3_boundary.js，输出JSON
+NODE_SCRIPT = """
+const h3b = require(process.argv[1]);
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const split = h => [parseInt(h.slice(0, -8) || '0', 16), parseInt(h.slice(-8), 16)];
+const join = c => ((BigInt(c[0]) << 32n) | BigInt(c[1])).toString(16);
+const result = {};
+for (const h of input.cells) {
+    const [hi, lo] = split(h);
+    result[h] = {
+        boundary: h3b.cellToBoundary(hi, lo),
+        center: h3b.cellToLatLng(hi, lo),
+        pentagon: h3b.isPentagon(hi, lo),
+    };
+}
+for (const [h, res] of input.children) {
+    const [hi, lo] = split(h);
+    result[h + '/' + res] = h3b.cellToChildren(hi, lo, res).map(join);
+}
+process.stdout.write(JSON.stringify(result));
+"""
+
+
+def sample_cells():
+    """各分辨率的随机网格（覆盖多个二十面体面和面边界）以及所有五边形"""
+    rng = random.Random(7)
+    cells = set(h3.get_res0_cells())
+    for res in range(0, 16):
+        cells.update(h3.get_pentagons(res))
+        for _ in range(40):
+            cells.add(h3.latlng_to_cell(rng.uniform(-89.9, 89.9), rng.uniform(-180, 180), res))
+    # 中国范围内常用的分辨率
+    for res in (5, 6, 7, 8, 9, 10):
+        for _ in range(40):
+            cells.add(h3.latlng_to_cell(rng.uniform(18, 53), rng.uniform(73, 135), res))
+    return sorted(cells)
+
+
+def children_cases():
+    hexagon = h3.latlng_to_cell(31.8206, 117.2272, 7)
+    return [(hexagon, 8), (hexagon, 10), (h3.get_pentagons(3)[0], 5), (h3.get_res0_cells()[0], 2)]
+
+
+@pytest.fixture(scope='module')
+def js_results():
+    payload = json.dumps({'cells': sample_cells(), 'children': children_cases()})
+    output = subprocess.run([NODE, '-e', NODE_SCRIPT, H3_SCRIPT_PATH], input=payload, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output)
+
+
+def test_boundary_and_center_match_h3(js_results):
+    for h in sample_cells():
+        js = js_results[h]
+        expected = np.array(h3.cell_to_boundary(h))
+        boundary = np.array(js['boundary'])
+        assert boundary.shape == expected.shape, h
+        # 经度在±180附近时比较差值
+        diff = boundary - expected
+        diff[:, 1] = (diff[:, 1] + 180) % 360 - 180
+        np.testing.assert_allclose(diff, 0, atol=1e-9, err_msg=h)
+        assert js['pentagon'] == h3.is_pentagon(h)
+
+        center = np.array(js['center']) - np.array(h3.cell_to_latlng(h))
+        center[1] = (center[1] + 180) % 360 - 180
+        np.testing.assert_allclose(center, 0, atol=1e-9, err_msg=h)
+
+
+def test_children_match_h3(js_results):
+    for h, res in children_cases():
+        assert sorted(js_results[f"{h}/{res}"]) == sorted(h3.cell_to_children(h, res))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+import numpy as np
+import pytest
+
+import hex_adjacency
+from conftest import CENTER
+
+pytestmark = pytest.mark.skipif(not hex_adjacency.is_available(), reason="需要scipy")
+
+
+@pytest.fixture
+def grid():
+    """带有凹陷的网格：res7的3盘去掉一个1圈hex及其在2圈上的相邻hex"""
+    center = h3.latlng_to_cell(*CENTER, 7)
+    notch = h3.grid_ring(center, 1)[0]
+    removed = {notch} | {n for n in h3.grid_ring(center, 2) if h3.grid_distance(n, notch) == 1}
+    return sorted(set(h3.grid_disk(center, 3)) - removed)
+
+
+def test_rings_match_h3_grid_distance(grid):
+    adjacency = hex_adjacency.HexAdjacency(np.array([h3.str_to_int(h) for h in grid], dtype=np.uint64), max_k=3)
+    grid_set = set(grid)
+
+    for row, cell in enumerate(h3.int_to_str(c) for c in adjacency.cells.tolist()):
+        for k in range(4):
+            expected = sorted(h3.str_to_int(n) for n in h3.grid_ring(cell, k) if n in grid_set)
+            assert adjacency.ring_cells(row, k).tolist() == expected
+    assert (adjacency.matrix != adjacency.ring(1)).nnz == 0
+
+
+def test_disk_sums_with_and_without_weights(grid):
+    cells = np.array([h3.str_to_int(h) for h in grid], dtype=np.uint64)
+    adjacency = hex_adjacency.HexAdjacency(cells, max_k=2)
+    values = np.arange(len(cells), dtype=np.float64)
+
+    rings = adjacency.ring_sums(values)
+    np.testing.assert_allclose(adjacency.disk_sum(values), sum(rings))
+    weights = hex_adjacency.decay_weights(2, 0.5)
+    np.testing.assert_allclose(adjacency.disk_sum(values, weights=weights),
+                               rings[0] + 0.5 * rings[1] + 0.25 * rings[2])
+
+    with pytest.raises(ValueError):
+        adjacency.disk(3)
+    with pytest.raises(ValueError):
+        adjacency.disk_sum(values, weights=[1.0])
+
+
+def test_rows_for_ignores_unknown_hexes(grid):
+    adjacency = hex_adjacency.HexAdjacency(np.array([h3.str_to_int(h) for h in grid], dtype=np.uint64))
+    outside = h3.latlng_to_cell(31.2304, 121.4737, 7)
+    assert adjacency.rows_for([grid[3], outside, grid[0]]).tolist() == [3, 0]
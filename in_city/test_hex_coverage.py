@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+import numpy as np
+import pytest
+
+from hex_coverage import CompactCoverage, grid_coverage
+from conftest import CENTER, grid_cells, make_city_grid
+
+
+@pytest.fixture
+def parents():
+    return grid_cells(k=1)
+
+
+def test_round_trip_and_contains_every_cell(parents):
+    coverage = CompactCoverage(parents, 10)
+    restored = CompactCoverage.from_dict(coverage.to_dict())
+
+    expected = sorted({h3.str_to_int(c) for p in parents for c in h3.cell_to_children(p, 10)})
+    assert restored.to_array().tolist() == expected
+    assert len(restored) == coverage.to_dict()['count'] == len(expected) == 7 * 343
+    assert sorted(restored.iter_int()) == expected
+    assert all(cell in restored for cell in expected[::37])
+    assert restored.parent_ids() == coverage.parent_ids()
+
+
+def test_cells_outside_or_at_other_resolution_are_not_contained(parents):
+    coverage = CompactCoverage(parents, 10)
+    outside = set(h3.grid_ring(h3.latlng_to_cell(*CENTER, 7), 2))
+
+    assert not any(h3.cell_to_center_child(cell, 10) in coverage for cell in outside)
+    assert parents[0] not in coverage
+    assert 'not-a-cell' not in coverage
+
+
+def test_from_cells_compacts_to_parents():
+    parent = h3.cell_to_parent(h3.latlng_to_cell(*CENTER, 7), 6)
+    children = h3.cell_to_children(parent, 9)
+    coverage = CompactCoverage.from_cells(children, 9)
+
+    assert coverage.parent_ids() == [parent]
+    assert coverage.to_array().tolist() == sorted(h3.str_to_int(c) for c in children)
+    assert len(CompactCoverage.from_cells([], 10)) == 0
+    with pytest.raises(ValueError):
+        CompactCoverage(children, 8)
+
+
+def test_grid_coverage_point_test_and_finer_resolution(parents):
+    city_data = make_city_grid(parents)
+    coverage = grid_coverage(city_data)
+    city_data['compact_cells'] = coverage.to_dict()
+
+    assert grid_coverage(city_data).to_array().tolist() == coverage.to_array().tolist()
+    assert coverage.contains_point(*CENTER)
+    assert not coverage.contains_point(31.2304, 121.4737)
+    finer = coverage.at_resolution(9)
+    assert len(finer) == 7 * 49 and np.isin(finer.to_array(), CompactCoverage(parents, 9).to_array()).all()
+    with pytest.raises(ValueError):
+        coverage.at_resolution(6)
+
+
+def test_center_is_mean_of_cell_centers():
+    cells = grid_cells(3)
+    coverage = CompactCoverage.from_cells(cells, 7)
+    assert len(coverage.parents) < len(cells)
+    expected = np.mean([h3.cell_to_latlng(h) for h in cells], axis=0)
+    np.testing.assert_allclose(coverage.center(), expected, atol=1e-3)
+    assert CompactCoverage.from_cells([], 7).center() is None
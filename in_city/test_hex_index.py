@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+import numpy as np
+import pytest
+
+import category_matrix
+import poi_hex
+from hex_index import HexIndex
+
+
+@pytest.fixture
+def legacy_grid(city_grid, pois):
+    """POI内嵌在网格JSON中的旧格式网格"""
+    return poi_hex.update_h3_with_pois(city_grid, poi_hex.assign_pois_to_hexes(pois, city_grid))
+
+
+def test_lookups_match_hex_list(legacy_grid):
+    index = HexIndex(legacy_grid)
+
+    assert len(index) == len(legacy_grid['hexes'])
+    for row, hex_info in enumerate(legacy_grid['hexes']):
+        assert index.row(hex_info['h3_index']) == row and hex_info['h3_index'] in index
+        details = index.details(hex_info['h3_index'])
+        assert details['poi_count'] == len(hex_info['pois'])
+        assert details['has_mall'] == any(poi['mid_type'] == '商场' for poi in hex_info['pois'])
+    assert index.rows_for([legacy_grid['hexes'][2]['h3_index'], legacy_grid['hexes'][0]['h3_index'], 'x']) == [0, 2]
+
+
+def test_hex_outside_grid_gets_basic_details(legacy_grid):
+    index = HexIndex(legacy_grid)
+    outside = h3.latlng_to_cell(31.2304, 121.4737, 7)
+
+    details = index.details(outside)
+    assert index.row(outside) is None
+    assert details['poi_count'] == 0 and not details['has_mall']
+    np.testing.assert_allclose(details['center'], h3.cell_to_latlng(outside))
+
+
+@pytest.mark.skipif(not category_matrix.is_available(), reason="需要scipy")
+def test_store_backed_grid_matches_legacy_grid(tmp_path, city_grid, pois, write_csv, legacy_grid):
+    matrix_path = str(tmp_path / '合肥市_poi_category_matrix.npz')
+    data = poi_hex.ingest_city_pois(write_csv(pois), city_grid, str(tmp_path / '合肥市_pois.parquet'), matrix_path)
+    index = HexIndex(data, category_matrix.CategoryMatrix.load(matrix_path))
+    legacy = HexIndex(legacy_grid)
+
+    assert index.poi_count.tolist() == legacy.poi_count.tolist()
+    assert index.has_mall.tolist() == legacy.has_mall.tolist()
+    assert index.mart_hexes() == legacy.mart_hexes()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import grid_geometry
+import hex_coverage
+import json_visualization
+from conftest import grid_cells, make_city_grid
+
+
+def test_compact_map_does_not_compute_hex_centers(tmp_path):
+    cells = grid_cells(2)
+    city_data = make_city_grid(cells)
+    for i, hex_info in enumerate(city_data['hexes']):
+        hex_info['poi_count'] = i
+    city_data['compact_cells'] = hex_coverage.CompactCoverage.from_cells(cells, 7).to_dict()
+
+    assert json_visualization.create_single_city_map(city_data, str(tmp_path / 'html'), str(tmp_path / 'png'),
+                                                     render_mode='compact', png_mode='raster')
+    assert grid_geometry.grid_geometry(city_data)._lat is None
+    assert (tmp_path / 'html' / '合肥市' / '合肥市_h3_poi_density_map.html').exists()
+    assert (tmp_path / 'png' / '合肥市' / '合肥市_h3_poi_density_map.png').exists()
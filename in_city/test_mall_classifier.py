@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+import mall_classifier
+
+NAMES = ['万达广场购物中心', '合肥百货大楼', 'Shopping Mall', '华联超市', '肯德基', '', None, '家乐福SHOPPING']
+
+
+def test_keyword_regex_matches_per_keyword_check():
+    expected = [value is not None and any(k in str(value).lower() for k in mall_classifier.MALL_KEYWORDS)
+                for value in NAMES]
+    assert mall_classifier.match_keywords(NAMES).tolist() == expected
+
+
+def test_classify_applies_both_rules():
+    flags = mall_classifier.classify(['万达广场', '肯德基', '银泰'],
+                                     ['购物服务', '餐饮服务', '购物服务'],
+                                     ['商场', '快餐厅', '商场'])
+    assert flags['is_mall'].tolist() == [True, False, True]
+    # 大类“购物服务”中包含关键词“购物”
+    assert flags['is_mall_keyword'].tolist() == [True, False, True]
+
+
+def test_mall_hex_mask_prefers_stored_counts():
+    city_data = {'hexes': [
+        {'h3_index': 'a', 'mall_count': 1, 'mall_keyword_count': 0, 'pois': []},
+        {'h3_index': 'b', 'mall_count': 0, 'mall_keyword_count': 2,
+         'pois': [{'name': '万达', 'big_type': '购物服务', 'mid_type': '商场'}]},
+    ]}
+    assert mall_classifier.mall_hex_mask(city_data, 'type').tolist() == [True, False]
+    assert mall_classifier.mall_hex_ids(city_data, 'keyword') == {'b'}
+
+    for hex_info in city_data['hexes']:
+        del hex_info['mall_count'], hex_info['mall_keyword_count']
+    assert np.array_equal(mall_classifier.mall_hex_mask(city_data, 'type'), [False, True])
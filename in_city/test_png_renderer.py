@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import warnings
+
+import pytest
+
+import png_renderer
+from conftest import grid_cells
+
+
+@pytest.fixture
+def no_cjk_font(monkeypatch):
+    monkeypatch.setattr(png_renderer, 'CJK_FONTS', ['不存在的字体'])
+    monkeypatch.setattr(png_renderer, '_cjk_font', None)
+
+
+def test_missing_cjk_font_is_reported_once(no_cjk_font, capsys):
+    assert png_renderer.cjk_font() is None
+    assert png_renderer.cjk_font() is None
+    assert capsys.readouterr().out.count('没有找到可显示中文的字体') == 1
+
+
+def test_save_keeps_other_user_warnings(no_cjk_font, tmp_path, monkeypatch):
+    raster = png_renderer.RasterMap(title_lines=['合肥市 POI密度'], legend_lines=['高'])
+    raster.add_hexes(png_renderer.cell_polygons(grid_cells()), '#ff0000')
+
+    original_savefig = raster.figure.savefig
+
+    def savefig(*args, **kwargs):
+        warnings.warn('其他警告', UserWarning)
+        return original_savefig(*args, **kwargs)
+
+    monkeypatch.setattr(raster.figure, 'savefig', savefig)
+    png_path = tmp_path / 'map.png'
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        assert raster.save(str(png_path))
+
+    messages = [str(w.message) for w in caught]
+    assert '其他警告' in messages
+    assert not any('missing from' in message for message in messages)
+    assert png_path.stat().st_size > 0
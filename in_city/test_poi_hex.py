@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+import category_matrix
+import csv_converter
+import grid_geometry
+import poi_hex
+import poi_store
+from conftest import gcj_location, make_city_grid, make_pois, outside_pois
+
+
+AGGREGATE_FIELDS = ('poi_count', 'poi_offset', 'poi_type_distribution', 'mall_count', 'mall_keyword_count')
+
+
+def ingest(directory, csv_path, city_grid, **kwargs):
+    directory.mkdir(exist_ok=True)
+    return poi_hex.ingest_city_pois(csv_path, city_grid, str(directory / '合肥市_pois.parquet'),
+                                    str(directory / '合肥市_poi_category_matrix.npz'), **kwargs)
+
+
+def hex_aggregates(data):
+    """网格数据中每个hex的聚合字段"""
+    return {h['h3_index']: {field: h.get(field) for field in AGGREGATE_FIELDS} for h in data['hexes']}
+
+
+def sorted_store(directory):
+    """存储中的所有行（按网格和内容哈希排序，忽略同一hex内的行顺序）"""
+    stored = poi_store.read_pois(str(directory / '合肥市_pois.parquet'))
+    return stored.sort_values([poi_store.SORT_KEY, 'row_hash'], kind='stable').reset_index(drop=True)
+
+
+def test_split_location_column_marks_invalid_as_nan():
+    lat, lng = poi_hex.split_location_column(pd.Series(['117.2,31.8', '"117.3, 31.9"', 'unknown', None]))
+    np.testing.assert_allclose(lat[:2], [31.8, 31.9])
+    np.testing.assert_allclose(lng[:2], [117.2, 117.3])
+    assert np.isnan(lat[2:]).all() and np.isnan(lng[2:]).all()
+
+
+def test_assignment_matches_per_row_parsing(pois):
+    assignment = poi_hex.compute_hex_assignment(pois, resolution=7, resolutions=(7,), source='wgs84')
+
+    expected = {}
+    for i, location in enumerate(pois['location']):
+        lat, lng = poi_hex.parse_location(location)
+        expected.setdefault(h3.latlng_to_cell(lat, lng, 7), []).append(i)
+
+    assert assignment.successful == len(pois) and assignment.failed == 0
+    assert {h3_id: rows.tolist() for h3_id, rows in assignment.items()} == expected
+    for h3_id, rows in expected.items():
+        assert assignment.rows(h3_id).tolist() == rows
+
+
+def test_poi_map_keeps_legacy_fields(pois, city_grid):
+    hex_poi_map = poi_hex.assign_pois_to_hexes(pois, city_grid)
+
+    assert sum(len(items) for items in hex_poi_map.values()) == len(pois)
+    poi = next(iter(hex_poi_map.values()))[0]
+    assert set(poi) == {'id', 'name', 'lat', 'lng', 'province', 'city', 'district',
+                        'big_type', 'mid_type', 'small_type'}
+    updated = poi_hex.update_h3_with_pois(city_grid, hex_poi_map)
+    assert updated['total_poi_count'] == len(pois)
+
+
+def test_coarser_resolutions_are_parents_of_finest(pois):
+    df = pd.concat([pois, pd.DataFrame({'location': ['unknown']})], ignore_index=True)
+    assignment = poi_hex.compute_hex_assignment(df, resolution=7, resolutions=(7, 8, 9, 10))
+
+    finest = assignment.cells_by_res[10]
+    assert finest[-1] == 0
+    for res in (7, 8, 9):
+        cells = assignment.cells_by_res[res]
+        assert cells[-1] == 0
+        expected = [h3.str_to_int(h3.cell_to_parent(h3.int_to_str(c), res)) for c in finest[:-1].tolist()]
+        assert cells[:-1].tolist() == expected
+    assert assignment.poi_cells is assignment.cells_by_res[7]
+
+
+def test_csv_chunks_keep_requested_columns(pois, write_csv):
+    chunks = list(csv_converter.iter_poi_csv_chunks(write_csv(pois), chunksize=4))
+    assert [len(chunk) for chunk in chunks] == [4] * (len(pois) // 4) + ([len(pois) % 4] if len(pois) % 4 else [])
+    assert all(list(chunk.columns) == csv_converter.REQUIRED_COLUMNS for chunk in chunks)
+    assert str(chunks[0]['bigType'].dtype) == 'category'
+
+
+def test_chunked_ingest_matches_single_chunk(tmp_path, city_grid, pois, write_csv):
+    csv_path = write_csv(pd.concat([pois, outside_pois()], ignore_index=True))
+    whole = ingest(tmp_path / 'whole', csv_path, city_grid)
+    chunked = ingest(tmp_path / 'chunked', csv_path, city_grid, chunksize=3)
+
+    assert hex_aggregates(chunked) == hex_aggregates(whole)
+    assert chunked['total_poi_count'] == whole['total_poi_count'] == len(pois) + 1
+    pd.testing.assert_frame_equal(sorted_store(tmp_path / 'chunked'), sorted_store(tmp_path / 'whole'))
+
+
+def apply_delta(directory, csv_path, data):
+    return poi_hex.apply_poi_delta(csv_path, data, str(directory / '合肥市_pois.parquet'),
+                                   str(directory / '合肥市_poi_category_matrix.npz'))
+
+
+def matrix_counts(directory):
+    matrix = category_matrix.CategoryMatrix.load(str(directory / '合肥市_poi_category_matrix.npz'))
+    dense = np.asarray(matrix.matrix.todense())
+    return [matrix.block_counts(row) for row in dense], matrix.poi_counts.tolist()
+
+
+def outside_hashes(directory):
+    hashes, assigned = poi_store.read_outside(str(directory / '合肥市_pois_outside.parquet'))
+    order = np.argsort(hashes)
+    return hashes[order].tolist(), assigned[order].tolist()
+
+
+def test_delta_matches_full_ingest(tmp_path, cells, pois, write_csv):
+    # 旧数据中第10行重复3次，并有一条网格外和一条坐标无效的POI
+    old = pd.concat([pois, pois.iloc[[10, 10]], outside_pois()], ignore_index=True)
+    new = pd.concat([pois.drop(index=[0, 1]), outside_pois().iloc[:1]], ignore_index=True)
+    new.loc[new['id'] == pois.loc[5, 'id'], 'name'] = '改名后的购物中心'
+    moved_lat, moved_lng = h3.cell_to_latlng(cells[0])
+    new.loc[new['id'] == pois.loc[20, 'id'], 'location'] = gcj_location(moved_lat, moved_lng)
+    added = make_pois(cells[:2], per_cell=2, seed=1)
+    added['id'] = 'N' + added['id']
+    new = pd.concat([new, added], ignore_index=True)
+
+    delta = apply_delta(tmp_path / 'delta', write_csv(new, 'new.csv'),
+                        ingest(tmp_path / 'delta', write_csv(old, 'old.csv'), make_city_grid(cells)))
+    full = ingest(tmp_path / 'full', write_csv(new, 'new.csv'), make_city_grid(cells))
+
+    assert hex_aggregates(delta) == hex_aggregates(full)
+    assert delta['total_poi_count'] == full['total_poi_count']
+    assert delta['poi_store']['row_count'] == full['poi_store']['row_count'] == len(new) - 1
+    pd.testing.assert_frame_equal(sorted_store(tmp_path / 'delta'), sorted_store(tmp_path / 'full'))
+    assert matrix_counts(tmp_path / 'delta') == matrix_counts(tmp_path / 'full')
+    assert outside_hashes(tmp_path / 'delta') == outside_hashes(tmp_path / 'full')
+    assert {key: delta['poi_version'][key] for key in ('mode', 'inserted', 'deleted', 'updated', 'moved')} == {
+        'mode': 'delta', 'inserted': 4, 'deleted': 4, 'updated': 2, 'moved': 1}
+
+
+def test_delta_with_unchanged_csv_does_no_work(tmp_path, city_grid, pois, write_csv, monkeypatch):
+    csv_path = write_csv(pd.concat([pois, outside_pois()], ignore_index=True))
+    full = ingest(tmp_path, csv_path, city_grid)
+    store_path = tmp_path / '合肥市_pois.parquet'
+    mtime = store_path.stat().st_mtime_ns
+
+    parsed = []
+    compute = poi_hex.compute_hex_assignment
+    monkeypatch.setattr(poi_hex, 'compute_hex_assignment', lambda df, **kwargs: parsed.append(len(df))
+                        or compute(df, **kwargs))
+    delta = apply_delta(tmp_path, csv_path, full)
+
+    # 网格外和坐标无效的POI也不再重新解析，存储文件不重写
+    assert parsed == []
+    assert store_path.stat().st_mtime_ns == mtime
+    assert hex_aggregates(delta) == hex_aggregates(full)
+    assert delta['total_poi_count'] == full['total_poi_count']
+    assert delta['poi_version']['version'] == full['poi_version']['version'] + 1
+
+
+@pytest.mark.parametrize('change', ['removed', 'replaced'])
+def test_delta_after_failed_grid_save_repairs_grid(tmp_path, cells, pois, monkeypatch, change):
+    # process_city_pois按模块所在目录查找csv/classified和json
+    monkeypatch.setattr(poi_hex, '__file__', str(tmp_path / 'poi_hex.py'))
+    (tmp_path / 'csv' / 'classified').mkdir(parents=True)
+    (tmp_path / 'json').mkdir()
+    csv_path = tmp_path / 'csv' / 'classified' / '合肥市.csv'
+    grid_path = tmp_path / 'json' / '合肥市_h3_grid.json'
+    grid_geometry.save_grid(str(grid_path), make_city_grid(cells))
+
+    pois.to_csv(csv_path, index=False, encoding='utf-8')
+    assert poi_hex.process_city_pois('合肥市')
+
+    # 删除10条POI（或换成10条新的POI，行数不变），存储更新后保存网格失败
+    new = pois.iloc[10:]
+    if change == 'replaced':
+        added = make_pois(cells[:2], per_cell=5, seed=1)
+        added['id'] = 'N' + added['id']
+        new = pd.concat([new, added], ignore_index=True)
+    new.to_csv(csv_path, index=False, encoding='utf-8')
+    save = poi_hex.save_city_h3_json
+
+    def fail_save(json_file_path, data):
+        raise OSError('磁盘已满')
+
+    monkeypatch.setattr(poi_hex, 'save_city_h3_json', fail_save)
+    assert not poi_hex.process_city_pois('合肥市', delta=True)
+    monkeypatch.setattr(poi_hex, 'save_city_h3_json', save)
+
+    # 再次增量更新时发现存储与网格不一致，改为全量导入
+    assert poi_hex.process_city_pois('合肥市', delta=True)
+    repaired = poi_hex.load_city_h3_json(str(grid_path))
+    full = ingest(tmp_path / 'full', str(csv_path), make_city_grid(cells))
+    assert sum(h['poi_count'] for h in repaired['hexes']) == len(new)
+    assert repaired['poi_store']['row_count'] == len(new)
+    assert hex_aggregates(repaired) == hex_aggregates(full)
+    assert repaired['poi_version']['mode'] == 'full'
+
+
+def test_city_failure_is_recorded_not_raised(monkeypatch, capsys):
+    def fail(city_name, **kwargs):
+        raise RuntimeError(f"{city_name} 数据损坏")
+
+    monkeypatch.setattr(poi_hex, 'process_city_pois', fail)
+    result = poi_hex.process_city_timed('合肥市')
+
+    assert result['city_name'] == '合肥市' and not result['success']
+    assert 'RuntimeError: 合肥市 数据损坏' in result['error']
+    poi_hex.print_city_summary([result], {'合肥市': 2 * 1024 * 1024})
+    assert '失败' in capsys.readouterr().out
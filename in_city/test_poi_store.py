@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+import poi_hex
+import poi_store
+
+
+def ingest(tmp_path, csv_path, city_grid, **kwargs):
+    return poi_hex.ingest_city_pois(csv_path, city_grid, str(tmp_path / '合肥市_pois.parquet'),
+                                    str(tmp_path / '合肥市_poi_category_matrix.npz'), **kwargs)
+
+
+def test_store_is_sorted_and_matches_offsets(tmp_path, city_grid, pois, write_csv):
+    data = ingest(tmp_path, write_csv(pois), city_grid, chunksize=4)
+    store_path = str(tmp_path / data['poi_store']['path'])
+
+    stored = poi_store.read_pois(store_path)
+    cells = stored[poi_store.SORT_KEY].to_numpy(dtype=np.uint64)
+    assert len(stored) == data['poi_store']['row_count'] == len(pois)
+    assert (np.diff(cells.astype(np.float64)) >= 0).all()
+    for hex_info in data['hexes']:
+        rows = stored.iloc[hex_info['poi_offset']:hex_info['poi_offset'] + hex_info['poi_count']]
+        assert set(rows[poi_store.SORT_KEY].tolist()) <= {int(hex_info['h3_index'], 16)}
+
+
+def test_read_pois_by_hex_and_count_by_cell(tmp_path, city_grid, pois, write_csv):
+    data = ingest(tmp_path, write_csv(pois), city_grid)
+    store_path = str(tmp_path / data['poi_store']['path'])
+
+    counts = poi_store.count_by_cell(store_path, 7)
+    assert counts.to_dict() == {h['h3_index']: h['poi_count'] for h in data['hexes'] if h['poi_count']}
+
+    h3_id = data['hexes'][0]['h3_index']
+    subset = poi_store.read_pois(store_path, columns=['id', 'name'], h3_ids=[h3_id])
+    assert len(subset) == counts[h3_id]
+    assert list(subset.columns) == ['id', 'name', poi_store.SORT_KEY]
+
+
+def test_attach_pois_matches_embedded_pois(tmp_path, city_grid, pois, write_csv):
+    legacy = poi_hex.update_h3_with_pois(city_grid, poi_hex.assign_pois_to_hexes(pois, city_grid))
+    data = ingest(tmp_path, write_csv(pois), city_grid)
+    json_path = str(tmp_path / '合肥市_h3_grid.json')
+    poi_store.attach_pois(data, json_path)
+
+    legacy_pois = {h['h3_index']: h['pois'] for h in legacy['hexes']}
+    for hex_info in data['hexes']:
+        expected = legacy_pois[hex_info['h3_index']]
+        assert [poi['id'] for poi in hex_info['pois']] == [poi['id'] for poi in expected]
+        for poi, legacy_poi in zip(hex_info['pois'], expected):
+            assert poi['lat'] == legacy_poi['lat'] and poi['lng'] == legacy_poi['lng']
+            assert poi['small_type'] == legacy_poi['small_type']
+
+
+def test_store_pointer_paths(tmp_path):
+    json_path = str(tmp_path / '合肥市_h3_grid.json')
+    store_path = poi_store.get_store_path(json_path)
+    assert store_path.endswith('合肥市_pois.parquet')
+
+    pointer = poi_store.store_pointer(store_path, 3, [7, 8])
+    assert poi_store.resolve_store_path({'poi_store': pointer}, json_path) == store_path
+    assert pointer['coord_system'] == 'wgs84' and pointer['source_coord_system'] == 'gcj02'
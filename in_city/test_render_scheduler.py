@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import grid_geometry
+import render_scheduler
+from conftest import grid_cells, make_city_grid
+
+
+def write_grids(json_dir, mart_dir):
+    os.makedirs(json_dir)
+    os.makedirs(mart_dir)
+    small = make_city_grid(grid_cells(1))
+    large = make_city_grid(grid_cells(3))
+    for city_grid in (small, large):
+        for i, hex_info in enumerate(city_grid['hexes']):
+            hex_info['poi_count'] = i
+    grid_geometry.save_grid(os.path.join(json_dir, '合肥市_h3_grid.json'), small)
+    grid_geometry.save_grid(os.path.join(json_dir, '芜湖市_h3_grid.json'), large)
+    with open(os.path.join(json_dir, '损坏市_h3_grid.json'), 'w', encoding='utf-8') as f:
+        f.write('{"hexes": [{"h3_index": ')
+
+
+def test_tasks_are_ordered_largest_first(tmp_path):
+    json_dir, mart_dir = str(tmp_path / 'json'), str(tmp_path / 'mart')
+    write_grids(json_dir, mart_dir)
+    tasks = render_scheduler.collect_tasks(json_dir, mart_dir, str(tmp_path / 'out'))
+
+    assert [task['kind'] for task in tasks] == ['density', 'density', 'density', 'overview']
+    assert tasks[0]['name'].startswith('芜湖市')
+    assert [task['size'] for task in tasks] == sorted((task['size'] for task in tasks), reverse=True)
+
+
+def test_failed_city_does_not_stop_other_maps(tmp_path):
+    json_dir, mart_dir, base_dir = str(tmp_path / 'json'), str(tmp_path / 'mart'), str(tmp_path / 'out')
+    write_grids(json_dir, mart_dir)
+    results = render_scheduler.render_all(json_dir, mart_dir, base_dir, workers=1)
+
+    status = {result['name']: result['success'] for result in results}
+    assert status == {'芜湖市 POI密度图': True, '合肥市 POI密度图': True, '损坏市 POI密度图': False,
+                      '所有城市汇总地图': True}
+    assert all(result['seconds'] >= 0 for result in results)
+    assert os.listdir(os.path.join(base_dir, 'html'))
+
+
+def test_exception_in_task_is_recorded(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('渲染出错')
+
+    monkeypatch.setattr(render_scheduler.json_visualization, 'create_overview', fail)
+    task = {'kind': 'overview', 'name': '所有城市汇总地图', 'args': ('', '', ''), 'options': {}}
+    result = render_scheduler.run_task(task)
+    assert not result['success'] and 'RuntimeError' in result['error'] and result['screenshots'] == []
+
+
+def test_city_without_mart_hexes_is_skipped_not_failed(tmp_path, capsys):
+    mart_dir, base_dir = tmp_path / 'mart', str(tmp_path / 'out')
+    mart_dir.mkdir()
+    with open(mart_dir / f'合肥市{render_scheduler.MART_SUFFIX}', 'w', encoding='utf-8') as f:
+        json.dump({'city_name': '合肥市', 'mart_hex_count': 0, 'mart_hex_analysis': []}, f, ensure_ascii=False)
+    results = render_scheduler.render_all(str(tmp_path / 'json'), str(mart_dir), base_dir, workers=1)
+
+    assert [(r['name'], r['success'], r['skipped']) for r in results] == [('合肥市 商场Hex分析图', True, True)]
+    assert '成功 0 张，跳过 1 张（没有数据），失败 0 张' in capsys.readouterr().out
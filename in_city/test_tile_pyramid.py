@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import tile_pyramid
+from conftest import grid_cells
+
+pytestmark = pytest.mark.skipif(not tile_pyramid.is_available(), reason="需要PIL")
+
+ZOOMS = [9, 10]
+
+
+def build(output_dir, colors=None):
+    cells = grid_cells()
+    hexes = [{'h3_index': h} for h in cells]
+    return tile_pyramid.build_tile_pyramid(hexes, colors or ['#ffcc00'] * len(cells), [False] * len(cells),
+                                           str(output_dir), zooms=ZOOMS)
+
+
+def test_unchanged_rebuild_renders_nothing(tmp_path):
+    first = build(tmp_path)
+    assert first['written_tiles'] > 0
+
+    second = build(tmp_path)
+    assert second['rendered_tiles'] == 0
+
+
+def test_changed_hex_rerenders_only_its_tiles(tmp_path):
+    first = build(tmp_path)
+    colors = ['#ffcc00'] * len(grid_cells())
+    colors[0] = '#ffffff'
+    second = build(tmp_path, colors)
+    assert 0 < second['rendered_tiles'] <= first['rendered_tiles']
+
+
+def test_missing_tile_file_is_regenerated(tmp_path):
+    build(tmp_path)
+    state = tile_pyramid.load_state(str(tmp_path))
+    tiles = tile_pyramid.dirty_tiles({'zooms': [], 'hexes': {}}, state['hexes'], ZOOMS)
+    written = [tile for tile in tiles if os.path.exists(tile_pyramid.tile_path(str(tmp_path), tile))]
+    removed = written[0]
+    os.remove(tile_pyramid.tile_path(str(tmp_path), removed))
+
+    assert tile_pyramid.dirty_tiles(state, state['hexes'], ZOOMS, str(tmp_path)) == {removed}
+    result = build(tmp_path)
+    assert result['rendered_tiles'] == 1 and result['written_tiles'] == 1
+    assert os.path.exists(tile_pyramid.tile_path(str(tmp_path), removed))
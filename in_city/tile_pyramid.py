@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+XYZ瓦片金字塔
+把城市hex的POI密度颜色和商场hex（红色边框）预先渲染为PNG瓦片（{输出目录}/{z}/{x}/{y}.png，256x256，Web墨卡托），
+并生成一个加载这些瓦片的查看页面 index.html，不再需要把所有hex多边形写入一个folium HTML。
+瓦片由进程池并行渲染（PIL绘制，2倍超采样后按2x2平均缩小以抗锯齿）；
+输出目录中的 tile_state.json 记录上次渲染时每个hex的颜色和商场标记，再次生成时只重新渲染与变化的hex
+（新增、删除、颜色或商场标记改变）相交的瓦片。
+"""
+
+import os
+import json
+import math
+import time
+import h3
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Set, Tuple
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+    ImageDraw = None
+
+TILE_SIZE = 256
+SUPERSAMPLE = 2
+DEFAULT_ZOOMS = list(range(8, 15))
+STATE_FILENAME = 'tile_state.json'
+VIEWER_FILENAME = 'index.html'
+
+FILL_ALPHA = 178  # 与HTML地图的fillOpacity=0.7一致
+MALL_OUTLINE = (255, 68, 68, 255)
+# 每个渲染任务包含的瓦片数
+TILES_PER_TASK = 64
+
+Tile = Tuple[int, int, int]
+
+# 工作进程中的hex数据，由_init_worker设置
+_worker_data: Dict[str, Any] = {}
+
+
+def is_available() -> bool:
+    """PIL是否可用"""
+    return Image is not None
+
+
+def lnglat_to_pixels(lng, lat, zoom: int):
+    """经纬度批量转换为zoom级别下的全局像素坐标"""
+    scale = TILE_SIZE * (2 ** zoom)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lng, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def hex_rings(hexes: List[Dict[str, Any]]) -> List[np.ndarray]:
+    """hex的[lng, lat]边界（使用网格数据中的boundary，没有时由h3_index计算）"""
+    return [np.asarray(hex_info.get('boundary') or
+                       [(lng, lat) for lat, lng in h3.cell_to_boundary(hex_info['h3_index'])], dtype=np.float64)
+            for hex_info in hexes]
+
+
+def cell_bbox(h3_index: str) -> Tuple[float, float, float, float]:
+    """hex的经纬度范围 (lng_min, lat_min, lng_max, lat_max)"""
+    lats, lngs = zip(*h3.cell_to_boundary(h3_index))
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def tiles_for_bbox(bbox: Tuple[float, float, float, float], zoom: int) -> Iterable[Tile]:
+    """与经纬度范围相交的zoom级别瓦片"""
+    lng_min, lat_min, lng_max, lat_max = bbox
+    x, y = lnglat_to_pixels([lng_min, lng_max], [lat_max, lat_min], zoom)
+    last = 2 ** zoom - 1
+    x0, x1 = (min(max(int(v // TILE_SIZE), 0), last) for v in x)
+    y0, y1 = (min(max(int(v // TILE_SIZE), 0), last) for v in y)
+    for tx in range(x0, x1 + 1):
+        for ty in range(y0, y1 + 1):
+            yield zoom, tx, ty
+
+
+def hex_signatures(h3_indices: Sequence[str], fill_colors: Sequence[str], mall_flags: Sequence[bool]) -> Dict[str, str]:
+    """每个hex影响瓦片内容的属性（颜色和商场标记）"""
+    return {h: f"{color}|{int(bool(mall))}" for h, color, mall in zip(h3_indices, fill_colors, mall_flags)}
+
+
+def load_state(output_dir: str) -> Dict[str, Any]:
+    """上次渲染的状态，没有时返回空状态"""
+    state_path = os.path.join(output_dir, STATE_FILENAME)
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'zooms': [], 'hexes': {}}
+
+
+def save_state(output_dir: str, zooms: List[int], signatures: Dict[str, str]) -> None:
+    """保存本次渲染的状态（先写临时文件再替换）"""
+    state_path = os.path.join(output_dir, STATE_FILENAME)
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'zooms': zooms, 'hexes': signatures}, f)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def tile_path(output_dir: str, tile: Tile) -> str:
+    """瓦片PNG文件路径"""
+    zoom, tx, ty = tile
+    return os.path.join(output_dir, str(zoom), str(tx), f"{ty}.png")
+
+
+def dirty_tiles(old_state: Dict[str, Any], signatures: Dict[str, str], zooms: List[int],
+                output_dir: Optional[str] = None) -> Set[Tile]:
+    """需要重新渲染的瓦片：新增的缩放级别中所有瓦片，以及其他级别中与变化的hex相交的瓦片；
+    给出output_dir时，其他级别中与hex相交但PNG文件缺失（如被手动删除）的瓦片也重新渲染"""
+    old_signatures = old_state.get('hexes', {})
+    old_zooms = set(old_state.get('zooms', []))
+    changed = [h for h in set(signatures) | set(old_signatures) if signatures.get(h) != old_signatures.get(h)]
+
+    tiles = set()
+    new_zooms = [zoom for zoom in zooms if zoom not in old_zooms]
+    kept_zooms = [zoom for zoom in zooms if zoom in old_zooms]
+    for h in (signatures if new_zooms else []):
+        bbox = cell_bbox(h)
+        for zoom in new_zooms:
+            tiles.update(tiles_for_bbox(bbox, zoom))
+    for h in changed:
+        bbox = cell_bbox(h)
+        for zoom in kept_zooms:
+            tiles.update(tiles_for_bbox(bbox, zoom))
+    if output_dir is not None and kept_zooms:
+        covered = set()
+        for h in signatures:
+            bbox = cell_bbox(h)
+            for zoom in kept_zooms:
+                covered.update(tiles_for_bbox(bbox, zoom))
+        tiles.update(tile for tile in covered - tiles if not os.path.exists(tile_path(output_dir, tile)))
+    return tiles
+
+
+def _hex_rgba(color: str) -> Tuple[int, int, int, int]:
+    color = color.lstrip('#')
+    return int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16), FILL_ALPHA
+
+
+def _init_worker(rings: List[np.ndarray], fill_colors: List[str], mall_flags: List[bool], output_dir: str) -> None:
+    """工作进程初始化：保存hex边界和样式，各缩放级别的像素坐标按需计算"""
+    sizes = np.array([len(ring) for ring in rings], dtype=np.int64)
+    coords = np.concatenate(rings) if rings else np.zeros((0, 2))
+    _worker_data.clear()
+    _worker_data.update({
+        'lng': coords[:, 0], 'lat': coords[:, 1],
+        'offsets': np.concatenate([[0], np.cumsum(sizes)]),
+        'colors': [_hex_rgba(color) for color in fill_colors],
+        'malls': np.asarray(mall_flags, dtype=bool),
+        'output_dir': output_dir,
+        'zooms': {}
+    })
+
+
+def _zoom_pixels(zoom: int):
+    """zoom级别下所有hex顶点的全局像素坐标和每个hex的像素范围（缓存）"""
+    cache = _worker_data['zooms']
+    if zoom not in cache:
+        x, y = lnglat_to_pixels(_worker_data['lng'], _worker_data['lat'], zoom)
+        starts = _worker_data['offsets'][:-1]
+        if len(starts):
+            bounds = (np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts),
+                      np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts))
+        else:
+            bounds = tuple(np.zeros(0) for _ in range(4))
+        cache[zoom] = (x, y, bounds)
+    return cache[zoom]
+
+
+def _render_tile(tile: Tile) -> bool:
+    """渲染并写入一个瓦片；瓦片内没有hex时删除已有的瓦片文件，返回是否写入了瓦片"""
+    zoom, tx, ty = tile
+    x, y, (x_min, x_max, y_min, y_max) = _zoom_pixels(zoom)
+    left, top = tx * TILE_SIZE, ty * TILE_SIZE
+    rows = np.flatnonzero((x_max >= left) & (x_min <= left + TILE_SIZE) &
+                          (y_max >= top) & (y_min <= top + TILE_SIZE))
+
+    path = tile_path(_worker_data['output_dir'], tile)
+    if len(rows) == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+    size = TILE_SIZE * SUPERSAMPLE
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    offsets = _worker_data['offsets']
+    outline_width = max(1, min(zoom - 9, 4)) * SUPERSAMPLE
+    mall_rows = []
+    for row in rows.tolist():
+        start, end = offsets[row], offsets[row + 1]
+        points = list(zip(((x[start:end] - left) * SUPERSAMPLE).tolist(), ((y[start:end] - top) * SUPERSAMPLE).tolist()))
+        draw.polygon(points, fill=_worker_data['colors'][row])
+        if _worker_data['malls'][row]:
+            mall_rows.append(points)
+    # 商场hex边框画在所有填充之上
+    for points in mall_rows:
+        draw.line(points + points[:1], fill=MALL_OUTLINE, width=outline_width, joint='curve')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.resize((TILE_SIZE, TILE_SIZE), Image.BOX).save(path + '.tmp', format='PNG', compress_level=1)
+    os.replace(path + '.tmp', path)
+    return True
+
+
+def _render_tiles(tiles: List[Tile]) -> int:
+    return sum(_render_tile(tile) for tile in tiles)
+
+
+def write_viewer(output_dir: str, title: str, zooms: List[int], bounds: Tuple[float, float, float, float],
+                 legend: Optional[List[Tuple[str, str]]] = None) -> str:
+    """生成加载瓦片的查看页面（Leaflet），legend为 (颜色, 说明) 列表"""
+    lng_min, lat_min, lng_max, lat_max = bounds
+    legend_html = ''.join(f'<div><span style="display:inline-block;width:12px;height:12px;background:{color};'
+                          f'margin-right:6px"></span>POI {label}</div>' for color, label in legend or [])
+    if legend_html:
+        legend_html = (f'<div style="position:fixed;top:10px;right:10px;z-index:9999;background:rgba(0,0,0,0.7);'
+                       f'padding:10px;border-radius:5px;color:white;font-size:14px">{legend_html}</div>')
+    html = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css">
+<script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+<style>html, body, #map {{ height: 100%; margin: 0; background: #000; }}</style>
+</head>
+<body>
+<div id="map"></div>
+{legend_html}
+<script>
+var map = L.map('map', {{minZoom: {min(zooms)}, maxZoom: {max(zooms) + 2}}});
+L.tileLayer('https://{{s}}.basemaps.cartocdn.com/dark_all/{{z}}/{{x}}/{{y}}.png', {{
+    attribution: '&copy; OpenStreetMap &copy; CARTO', maxZoom: {max(zooms) + 2}
+}}).addTo(map);
+L.tileLayer('{{z}}/{{x}}/{{y}}.png', {{
+    minZoom: {min(zooms)}, maxZoom: {max(zooms) + 2}, maxNativeZoom: {max(zooms)}, attribution: '{title}'
+}}).addTo(map);
+map.fitBounds([[{lat_min}, {lng_min}], [{lat_max}, {lng_max}]]);
+</script>
+</body>
+</html>
+"""
+    viewer_path = os.path.join(output_dir, VIEWER_FILENAME)
+    with open(viewer_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return viewer_path
+
+
+def build_tile_pyramid(hexes: List[Dict[str, Any]], fill_colors: List[str], mall_flags: Sequence[bool],
+                       output_dir: str, zooms: Optional[List[int]] = None, workers: int = 1,
+                       title: str = 'H3网格POI密度',
+                       legend: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+    """渲染（或增量更新）hex瓦片金字塔并生成查看页面
+
+    fill_colors为每个hex的填充颜色（#rrggbb），mall_flags为每个hex是否为商场hex（画红色边框），
+    legend为查看页面的图例（如colormap.ColorScale.legend_entries()）
+    """
+    if Image is None:
+        raise ImportError("PIL不可用，无法生成瓦片")
+    zooms = sorted(set(zooms or DEFAULT_ZOOMS))
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    h3_indices = [hex_info['h3_index'] for hex_info in hexes]
+    signatures = hex_signatures(h3_indices, fill_colors, mall_flags)
+    old_state = load_state(output_dir)
+    tiles = sorted(dirty_tiles(old_state, signatures, zooms, output_dir))
+
+    rings = hex_rings(hexes)
+    init_args = (rings, list(fill_colors), [bool(flag) for flag in mall_flags], output_dir)
+    tasks = [tiles[i:i + TILES_PER_TASK] for i in range(0, len(tiles), TILES_PER_TASK)]
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(*init_args)
+        written = sum(_render_tiles(task) for task in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as executor:
+            written = sum(executor.map(_render_tiles, tasks))
+
+    save_state(output_dir, zooms, signatures)
+    all_coords = np.concatenate(rings) if rings else np.zeros((1, 2))
+    viewer_path = write_viewer(output_dir, title, zooms, (all_coords[:, 0].min(), all_coords[:, 1].min(),
+                                                          all_coords[:, 0].max(), all_coords[:, 1].max()),
+                               legend)
+    return {
+        'hexes': len(hexes),
+        'rendered_tiles': len(tiles),
+        'written_tiles': written,
+        'seconds': time.perf_counter() - start,
+        'viewer': viewer_path
+    }
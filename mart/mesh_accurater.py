@@ -1,17 +1,30 @@
 import json
 import os
+import sys
 import h3
 import folium
 from folium import plugins
 import numpy as np
 from datetime import datetime
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../in_city")))
+import poi_store
+import mall_classifier
+import grid_geometry
+from hex_coverage import CompactCoverage
+import geojson_layer
+import compact_layer
+from geojson_layer import DEFAULT_RENDER_MODE
+
 class MeshAccurater:
-    def __init__(self):
+    def __init__(self, render_mode=DEFAULT_RENDER_MODE):
         self.input_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../in_city/json"))
         self.html_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../mart/html"))
         self.json_output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../mart/json"))
         self.target_resolution = 10
+        # 地图渲染方式：geojson（每个图层一个GeoJson）、polygons（每个hex一个folium.Polygon）
+        # 或compact（只嵌入网格ID，边界和细分子网格由浏览器计算）
+        self.render_mode = geojson_layer.check_render_mode(render_mode)
         # 确保输出目录存在
         os.makedirs(self.html_output_dir, exist_ok=True)
         os.makedirs(self.json_output_dir, exist_ok=True)
@@ -20,86 +33,67 @@ class MeshAccurater:
         """加载城市的hex网格数据"""
         filepath = os.path.join(self.input_dir, filename)
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            city_data = grid_geometry.load_grid(filepath)
+            # 导入时已写入每个hex的商场数量则无需读取POI，否则只读取商场判断需要的名称和大类列
+            if mall_classifier.has_hex_counts(city_data):
+                return city_data
+            return poi_store.attach_pois(city_data, filepath, columns=['name', 'big_type'])
         except Exception as e:
             print(f"加载文件 {filename} 失败: {e}")
             return None
     
     def find_mall_hexes(self, city_data):
-        """找到包含商场的hex"""
-        mall_hexes = []
-        mall_keywords = ['商场', '购物', '商城', '百货', '超市', '大型超市', '商业综合体', 
-                        '购物中心', '商业中心', 'mall', 'shopping']
-        
-        for hex_data in city_data.get('hexes', []):
-            pois = hex_data.get('pois', [])
-            poi_types = hex_data.get('poi_type_distribution', {})
-            
-            # 检查POI类型分布
-            has_mall = False
-            for poi_type in poi_types.keys():
-                if any(keyword in poi_type.lower() for keyword in mall_keywords):
-                    has_mall = True
-                    break
-            
-            # 如果没有在类型中找到，检查具体POI
-            if not has_mall:
-                for poi in pois:
-                    poi_name = poi.get('name', '').lower()
-                    poi_type = poi.get('type', '').lower()
-                    if any(keyword in poi_name or keyword in poi_type for keyword in mall_keywords):
-                        has_mall = True
-                        break
-            
-            if has_mall:
-                mall_hexes.append(hex_data)
-                
-        return mall_hexes
+        """找到包含商场的hex（名称或大类中包含商场关键词）"""
+        hexes = city_data.get('hexes', [])
+        mask = mall_classifier.mall_hex_mask(city_data, 'keyword')
+        return [hexes[i] for i in np.flatnonzero(mask).tolist()]
     
     def subdivide_hex_to_resolution_10(self, hex_index):
-        """将hex细分到分辨率10"""
+        """将hex细分到分辨率10，返回只保存父网格的CompactCoverage，子网格在使用时再展开"""
         try:
-            # 获取当前hex的分辨率
-            current_res = h3.get_resolution(hex_index)
-            
-            if current_res >= self.target_resolution:
-                return [hex_index]
-            
-            # 递归细分到目标分辨率
-            children = [hex_index]
-            for res in range(current_res + 1, self.target_resolution + 1):
-                new_children = []
-                for child in children:
-                    new_children.extend(h3.cell_to_children(child, res))
-                children = new_children
-                
-            return children
+            # 分辨率已不低于目标分辨率时，以其在目标分辨率下的父网格表示
+            if h3.get_resolution(hex_index) > self.target_resolution:
+                hex_index = h3.cell_to_parent(hex_index, self.target_resolution)
+            return CompactCoverage([hex_index], self.target_resolution)
         except Exception as e:
             print(f"细分hex {hex_index} 失败: {e}")
-            return []
+            return CompactCoverage([], self.target_resolution)
     
-    def create_visualization_map(self, city_name, mall_hexes, subdivided_data):
-        """创建可视化地图"""
+    @staticmethod
+    def load_subdivided_coverage(subdivided_data):
+        """从输出数据中读取细分结果（兼容旧格式中展开的subdivided_hexes列表）"""
+        if 'subdivided_coverage' in subdivided_data:
+            return CompactCoverage.from_dict(subdivided_data['subdivided_coverage'])
+        return CompactCoverage.from_cells(subdivided_data.get('subdivided_hexes', []),
+                                          subdivided_data.get('target_resolution', 10))
+    
+    def create_visualization_map(self, city_name, mall_hexes, subdivided_data, render_mode=None):
+        """创建可视化地图（render_mode默认使用self.render_mode）"""
+        render_mode = geojson_layer.check_render_mode(render_mode or self.render_mode)
         if not mall_hexes:
             print(f"{city_name}: 未找到商场数据")
             return
             
-        # 计算地图中心
-        all_lats = []
-        all_lngs = []
-        for hex_data in mall_hexes:
-            center = hex_data.get('center', [])
-            if len(center) == 2:
-                all_lats.append(center[0])
-                all_lngs.append(center[1])
-                
-        if not all_lats:
-            print(f"{city_name}: 无法获取坐标数据")
-            return
-            
-        center_lat = np.mean(all_lats)
-        center_lng = np.mean(all_lngs)
+        # 计算地图中心（compact模式由商场hex压缩后的父网格得到，不逐个计算hex中心）
+        if render_mode == 'compact':
+            center_lat, center_lng = CompactCoverage.from_cells(
+                [hex_data['h3_index'] for hex_data in mall_hexes],
+                h3.get_resolution(mall_hexes[0]['h3_index'])).center()
+        else:
+            all_lats = []
+            all_lngs = []
+            for hex_data in mall_hexes:
+                center = hex_data.get('center', [])
+                if len(center) == 2:
+                    all_lats.append(center[0])
+                    all_lngs.append(center[1])
+
+            if not all_lats:
+                print(f"{city_name}: 无法获取坐标数据")
+                return
+
+            center_lat = np.mean(all_lats)
+            center_lng = np.mean(all_lngs)
         
         # 创建地图
         m = folium.Map(
@@ -109,40 +103,45 @@ class MeshAccurater:
         )
         
         # 添加原始商场hex（红色）
-        for hex_data in mall_hexes:
-            boundary = hex_data.get('boundary', [])
-            if boundary:
-                # 转换坐标格式 [lng, lat] -> [lat, lng]
-                folium_boundary = [[coord[1], coord[0]] for coord in boundary]
+        if render_mode == 'geojson':
+            self.add_geojson_layers(m, mall_hexes, subdivided_data)
+        elif render_mode == 'compact':
+            self.add_compact_layers(m, mall_hexes, subdivided_data)
+        else:
+            for hex_data in mall_hexes:
+                boundary = hex_data.get('boundary', [])
+                if boundary:
+                    # 转换坐标格式 [lng, lat] -> [lat, lng]
+                    folium_boundary = [[coord[1], coord[0]] for coord in boundary]
                 
-                folium.Polygon(
-                    locations=folium_boundary,
-                    color='red',
-                    weight=2,
-                    fillColor='red',
-                    fillOpacity=0.3,
-                    popup=f"原始商场hex: {hex_data.get('h3_index', 'N/A')}<br>"
-                          f"POI数量: {hex_data.get('poi_count', 0)}"
-                ).add_to(m)
+                    folium.Polygon(
+                        locations=folium_boundary,
+                        color='red',
+                        weight=2,
+                        fillColor='red',
+                        fillOpacity=0.3,
+                        popup=f"原始商场hex: {hex_data.get('h3_index', 'N/A')}<br>"
+                              f"POI数量: {hex_data.get('poi_count', 0)}"
+                    ).add_to(m)
         
-        # 添加细分后的hex（蓝色）
-        for hex_index in subdivided_data.get('subdivided_hexes', []):
-            try:
-                boundary_coords = h3.cell_to_boundary(hex_index)
-                # h3返回的是(lat, lng)格式
-                folium_boundary = [[coord[0], coord[1]] for coord in boundary_coords]
+            # 添加细分后的hex（蓝色），逐个展开子网格
+            for hex_index in self.load_subdivided_coverage(subdivided_data):
+                try:
+                    boundary_coords = h3.cell_to_boundary(hex_index)
+                    # h3返回的是(lat, lng)格式
+                    folium_boundary = [[coord[0], coord[1]] for coord in boundary_coords]
                 
-                folium.Polygon(
-                    locations=folium_boundary,
-                    color='blue',
-                    weight=1,
-                    fillColor='blue',
-                    fillOpacity=0.1,
-                    popup=f"细分hex: {hex_index}"
-                ).add_to(m)
-            except Exception as e:
-                print(f"绘制hex {hex_index} 失败: {e}")
-                continue
+                    folium.Polygon(
+                        locations=folium_boundary,
+                        color='blue',
+                        weight=1,
+                        fillColor='blue',
+                        fillOpacity=0.1,
+                        popup=f"细分hex: {hex_index}"
+                    ).add_to(m)
+                except Exception as e:
+                    print(f"绘制hex {hex_index} 失败: {e}")
+                    continue
         
         # 添加图例
         legend_html = '''
@@ -162,6 +161,50 @@ class MeshAccurater:
         m.save(output_file)
         print(f"地图已保存: {output_file}")
         
+    def add_geojson_layers(self, m, mall_hexes, subdivided_data):
+        """原始商场hex和细分后的hex各作为一个GeoJson图层加入地图"""
+        geojson_layer.add_geojson_layer(
+            m,
+            geojson_layer.hex_features([hex_data.get('h3_index', 'N/A') for hex_data in mall_hexes],
+                                       [{'poi_count': hex_data.get('poi_count', 0)} for hex_data in mall_hexes],
+                                       [hex_data.get('boundary') for hex_data in mall_hexes]),
+            style={'color': 'red', 'weight': 2, 'fillColor': 'red', 'fillOpacity': 0.3},
+            name='原始商场hex', popup=[('h3_index', '原始商场hex'), ('poi_count', 'POI数量')]
+        )
+        # 细分hex按压缩后的父网格分组，每组合并为一个MultiPolygon要素（res10网格边长约75米，坐标保留5位小数）
+        coverage = self.load_subdivided_coverage(subdivided_data)
+        features = [
+            geojson_layer.hex_group_feature(
+                h3.cell_to_children(parent, coverage.resolution),
+                {'parent_hex': parent, 'subdivided_count': h3.cell_to_children_size(parent, coverage.resolution)},
+                feature_id=i, precision=5)
+            for i, parent in enumerate(coverage.parent_ids())
+        ]
+        geojson_layer.add_geojson_layer(
+            m, features,
+            style={'color': 'blue', 'weight': 1, 'fillColor': 'blue', 'fillOpacity': 0.1},
+            name=f'细分hex(分辨率{coverage.resolution})',
+            tooltip=[('parent_hex', '父网格'), ('subdivided_count', '细分hex数量')]
+        )
+        folium.LayerControl().add_to(m)
+
+    def add_compact_layers(self, m, mall_hexes, subdivided_data):
+        """与add_geojson_layers相同的两个图层，只嵌入网格ID；细分hex只嵌入压缩后的父网格，由浏览器展开为子网格"""
+        compact_layer.add_compact_layer(
+            m, [hex_data['h3_index'] for hex_data in mall_hexes], 'red',
+            style={'color': 'red', 'weight': 2, 'fillOpacity': 0.3},
+            name='原始商场hex', columns=[('POI数量', [hex_data.get('poi_count', 0) for hex_data in mall_hexes])]
+        )
+        coverage = self.load_subdivided_coverage(subdivided_data)
+        compact_layer.add_compact_layer(
+            m, coverage.parents, 'blue',
+            style={'color': 'blue', 'weight': 1, 'fillOpacity': 0.1},
+            name=f'细分hex(分辨率{coverage.resolution})', children_res=coverage.resolution,
+            columns=[('细分hex数量', [h3.cell_to_children_size(parent, coverage.resolution)
+                                   for parent in coverage.parent_ids()])]
+        )
+        folium.LayerControl().add_to(m)
+
     def process_city(self, filename):
         """处理单个城市的数据"""
         print(f"\n处理文件: {filename}")
@@ -182,25 +225,23 @@ class MeshAccurater:
             print(f"{city_name}: 未找到商场数据")
             return
             
-        # 细分hex到分辨率10
-        all_subdivided_hexes = []
+        # 细分hex到分辨率10（只保存父网格和目标分辨率，子网格按需展开）
         hex_details = []
         
         for hex_data in mall_hexes:
             hex_index = hex_data.get('h3_index')
             if hex_index:
                 subdivided = self.subdivide_hex_to_resolution_10(hex_index)
-                all_subdivided_hexes.extend(subdivided)
                 
                 hex_details.append({
                     'original_hex': hex_index,
                     'subdivided_count': len(subdivided),
-                    'subdivided_hexes': subdivided,
                     'poi_count': hex_data.get('poi_count', 0),
                     'center': hex_data.get('center', [])
                 })
         
-        print(f"细分后总hex数量: {len(all_subdivided_hexes)}")
+        coverage = CompactCoverage([detail['original_hex'] for detail in hex_details], self.target_resolution)
+        print(f"细分后总hex数量: {len(coverage)}")
         
         # 输出文件路径
         json_output_file = os.path.join(self.json_output_dir, f"{city_name}_商场网格_分辨率10.json")
@@ -218,8 +259,9 @@ class MeshAccurater:
             'original_resolution': city_data.get('resolution', 7),
             'target_resolution': self.target_resolution,
             'original_mall_hexes': len(mall_hexes),
-            'subdivided_hexes_count': len(all_subdivided_hexes),
-            'subdivided_hexes': list(set(all_subdivided_hexes)),  # 去重
+            'subdivided_hexes_count': len(coverage),
+            # 所有细分hex（去重），用CompactCoverage.from_dict恢复
+            'subdivided_coverage': coverage.to_dict(),
             'hex_details': hex_details
         }
 
@@ -1,8 +1,12 @@
 import json
 import csv
 import os
+import sys
 from difflib import SequenceMatcher
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../in_city")))
+import coord_transform
+
 # 读取 JSON 文件
 def read_json(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -23,8 +27,25 @@ def write_json(file_path, data):
 def similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
+# 将匹配到的经纬度批量转换为WGS-84（与H3网格一致）
+def convert_coordinates(json_data, source='amap'):
+    matched = [shop for shop in json_data if isinstance(shop.get("经纬度"), dict)]
+    if not matched:
+        return json_data
+    
+    lng = [shop["经纬度"]["经度"] for shop in matched]
+    lat = [shop["经纬度"]["纬度"] for shop in matched]
+    wgs_lng, wgs_lat = coord_transform.to_wgs84(lng, lat, source)
+    for shop, shop_lng, shop_lat in zip(matched, wgs_lng.tolist(), wgs_lat.tolist()):
+        shop["经纬度"] = {
+            "经度": shop_lng,
+            "纬度": shop_lat
+        }
+        shop["坐标系"] = "wgs84"
+    return json_data
+
 # 根据城市匹配经纬度
-def match_coordinates_by_city(json_data, csv_dir):
+def match_coordinates_by_city(json_data, csv_dir, source='amap'):
     # 获取所有可用的城市CSV文件
     csv_files = [f for f in os.listdir(csv_dir) if f.endswith('.csv')]
     
@@ -106,7 +127,8 @@ def match_coordinates_by_city(json_data, csv_dir):
             shop["经纬度"] = "无对应城市数据"
     
     print(f"成功匹配 {matched_count} 个店铺的经纬度")
-    return json_data
+    # CSV中的坐标为高德GCJ-02坐标，与POI分配网格时使用同样的转换
+    return convert_coordinates(json_data, source)
 
 if __name__ == "__main__":
     json_file = "e:\\Deskep\\P_sdor\\mart\\json\\sales_customers_P_sdor.json"
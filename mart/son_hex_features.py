@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+son_hex特征构建
+把mesh_accurater.py找到的商场hex（father_hex，res7）细分为res10的son_hex，
+用POI存储中的h3_res10列把每个POI直接对应到son_hex，按son_hex分组计算POI、餐饮数量和密度（使用每个网格的实际面积）、
+各餐饮中类数量，以及匹配到的连锁餐厅的平均客单价，结果保存为列式表 xx市_son_hex_features.parquet（按h3_res10排序）。
+"""
+
+import os
+import sys
+import json
+import time
+import h3
+from h3.api import basic_int as h3_int
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../in_city")))
+import poi_store
+from poi_hex import latlng_to_cells
+from mesh_accurater import MeshAccurater
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+SON_RESOLUTION = 10
+FATHER_RESOLUTION = 7
+DINING_BIG_TYPE = "餐饮服务"
+MESH_SUFFIX = '_商场网格_分辨率10.json'
+FEATURES_SUFFIX = '_son_hex_features.parquet'
+# 各餐饮中类数量的列名前缀
+DINING_TYPE_PREFIX = 'restaurant_'
+
+
+def load_json(file_path: str) -> Any:
+    """读取JSON文件，失败时返回None"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"加载文件 {file_path} 时出错: {e}")
+        return None
+
+
+def father_hexes_from_mesh(mesh_data: Dict[str, Any]) -> List[str]:
+    """mesh_accurater输出中的商场hex（res7）"""
+    fathers = [detail['original_hex'] for detail in mesh_data.get('hex_details', []) if detail.get('original_hex')]
+    if fathers:
+        return fathers
+    # 没有hex_details时由细分结果的父网格得到（兼容旧格式中展开的subdivided_hexes列表）
+    coverage = MeshAccurater.load_subdivided_coverage(mesh_data)
+    return sorted({h3.cell_to_parent(h, FATHER_RESOLUTION) for h in coverage})
+
+
+def expand_son_cells(father_hexes: List[str], resolution: int = SON_RESOLUTION) -> Tuple[np.ndarray, np.ndarray]:
+    """展开所有father_hex的子网格，返回按网格ID排序的 (son_hex数组, 对应的father_hex数组)"""
+    fathers = sorted({h3.str_to_int(h) for h in father_hexes})
+    if not fathers:
+        empty = np.zeros(0, dtype=np.uint64)
+        return empty, empty.copy()
+
+    parts = [np.array(h3_int.cell_to_children(father, resolution), dtype=np.uint64) for father in fathers]
+    sons = np.concatenate(parts)
+    father_of_son = np.repeat(np.array(fathers, dtype=np.uint64), [len(part) for part in parts])
+    order = np.argsort(sons, kind='stable')
+    return sons[order], father_of_son[order]
+
+
+def read_father_pois(store_path: str, father_hexes: List[str]) -> pd.DataFrame:
+    """只读取father_hex内POI的res10网格和类别列"""
+    son_column = poi_store.cell_column(SON_RESOLUTION)
+    if not poi_store.has_columns(store_path, [son_column]):
+        raise ValueError(f"POI存储 {store_path} 中没有 {son_column} 列，请重新导入POI")
+    return poi_store.read_pois(store_path, columns=[son_column, 'big_type', 'mid_type'], h3_ids=father_hexes)
+
+
+def load_restaurant_prices(json_file_path: str) -> pd.DataFrame:
+    """读取restaraunt_matcher匹配到经纬度（WGS-84）的店铺，返回 lat/lng/price 表"""
+    shops = load_json(json_file_path) or []
+    rows = [
+        (shop['经纬度']['纬度'], shop['经纬度']['经度'], shop.get('客单价'))
+        for shop in shops if isinstance(shop.get('经纬度'), dict)
+    ]
+    restaurants = pd.DataFrame(rows, columns=['lat', 'lng', 'price'])
+    restaurants['price'] = pd.to_numeric(restaurants['price'], errors='coerce')
+    return restaurants.dropna()
+
+
+def positions_in(cells: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """keys在排序数组cells中的位置，不在其中的为-1"""
+    if len(cells) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.searchsorted(cells, keys)
+    pos_clipped = np.minimum(pos, len(cells) - 1)
+    return np.where(cells[pos_clipped] == keys, pos_clipped, -1)
+
+
+def build_son_hex_features(city_name: str, father_hexes: List[str], pois: pd.DataFrame,
+                           restaurants: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """按son_hex分组计算特征，每个son_hex一行（没有POI的son_hex也保留）"""
+    sons, fathers = expand_son_cells(father_hexes)
+    n = len(sons)
+    son_list = sons.tolist()
+
+    # 网格中心和实际面积（平方米）
+    centers = np.array([h3_int.cell_to_latlng(cell) for cell in son_list], dtype=np.float64).reshape(-1, 2)
+    area = np.fromiter((h3_int.cell_area(cell, 'm^2') for cell in son_list), dtype=np.float64, count=n)
+
+    pos = positions_in(sons, pois[poi_store.cell_column(SON_RESOLUTION)].to_numpy(dtype=np.uint64))
+    inside = pos >= 0
+    pos = pos[inside]
+    big_types = pois['big_type'].to_numpy(dtype=object)[inside]
+    mid_types = pois['mid_type'].to_numpy(dtype=object)[inside]
+
+    poi_count = np.bincount(pos, minlength=n)
+
+    # 餐饮POI数量，以及按餐饮中类的数量
+    dining = big_types == DINING_BIG_TYPE
+    dining_pos = pos[dining]
+    restaurant = np.bincount(dining_pos, minlength=n)
+    type_codes, type_names = pd.factorize(pd.Series(mid_types[dining], dtype=object), sort=True)
+    has_type = type_codes >= 0
+    type_counts = np.bincount(dining_pos[has_type] * len(type_names) + type_codes[has_type],
+                              minlength=n * len(type_names)).reshape(n, len(type_names))
+    restaurant_type = (type_counts > 0).sum(axis=1)
+
+    # 连锁餐厅平均客单价（没有餐厅的son_hex为NaN）
+    avg_price = np.full(n, np.nan)
+    if restaurants is not None and len(restaurants):
+        shop_pos = positions_in(sons, latlng_to_cells(restaurants['lat'].to_numpy(dtype=np.float64),
+                                                      restaurants['lng'].to_numpy(dtype=np.float64),
+                                                      SON_RESOLUTION))
+        matched = shop_pos >= 0
+        price_sum = np.bincount(shop_pos[matched], weights=restaurants['price'].to_numpy()[matched], minlength=n)
+        price_count = np.bincount(shop_pos[matched], minlength=n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_price = np.where(price_count > 0, price_sum / price_count, np.nan)
+
+    features = pd.DataFrame({
+        poi_store.cell_column(SON_RESOLUTION): sons,
+        'hex_id': [h3.int_to_str(cell) for cell in son_list],
+        'father_hex_id': [h3.int_to_str(cell) for cell in fathers.tolist()],
+        'city': city_name,
+        'lon': centers[:, 1],
+        'lat': centers[:, 0],
+        'area': area,
+        'poi': poi_count,
+        'poi_density': poi_count / area,
+        'restaurant': restaurant,
+        'restaurant_density': restaurant / area,
+        'restaurant_type': restaurant_type,
+        'restaurant_type_density': restaurant_type / area,
+        'restaurant_avg_price': avg_price,
+    })
+    for i, name in enumerate(type_names.tolist()):
+        features[f"{DINING_TYPE_PREFIX}{name}"] = type_counts[:, i]
+    return features
+
+
+def save_features(features: pd.DataFrame, output_path: str) -> None:
+    """保存为Parquet文件（先写临时文件再替换）"""
+    tmp_path = output_path + '.tmp'
+    pq.write_table(pa.Table.from_pandas(features, preserve_index=False), tmp_path, compression='zstd')
+    os.replace(tmp_path, output_path)
+
+
+def process_city(city_name: str, mesh_json_path: str, grid_json_path: str, output_path: str,
+                 restaurants: Optional[pd.DataFrame] = None) -> bool:
+    """构建单个城市的son_hex特征"""
+    print(f"\n处理城市: {city_name}")
+    mesh_data = load_json(mesh_json_path)
+    grid_data = load_json(grid_json_path)
+    if not mesh_data or not grid_data:
+        return False
+
+    store_path = poi_store.resolve_store_path(grid_data, grid_json_path)
+    if store_path is None or not os.path.exists(store_path):
+        print(f"{city_name}: 没有POI列式存储，请先运行poi_hex.py")
+        return False
+
+    start = time.perf_counter()
+    father_hexes = father_hexes_from_mesh(mesh_data)
+    try:
+        pois = read_father_pois(store_path, father_hexes)
+    except ValueError as e:
+        print(e)
+        return False
+    features = build_son_hex_features(city_name, father_hexes, pois, restaurants)
+    save_features(features, output_path)
+
+    print(f"{city_name}: {len(father_hexes)} 个father_hex, {len(features)} 个son_hex, "
+          f"{len(pois)} 条POI, 耗时 {time.perf_counter() - start:.2f}s")
+    print(f"特征已保存到: {output_path}")
+    return True
+
+
+def process_all_cities():
+    """处理mesh_accurater输出的所有城市"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    mesh_dir = os.path.join(script_dir, "json")
+    grid_dir = os.path.join(script_dir, "../in_city/json")
+
+    if not os.path.exists(mesh_dir):
+        print(f"目录不存在: {mesh_dir}")
+        return
+
+    if pq is None:
+        print("pyarrow不可用，无法保存son_hex特征")
+        return
+
+    restaurants = None
+    restaurant_json = os.path.join(mesh_dir, "sales_customers_P_sdor.json")
+    if os.path.exists(restaurant_json):
+        restaurants = load_restaurant_prices(restaurant_json)
+        print(f"读取到 {len(restaurants)} 个带经纬度和客单价的店铺")
+
+    for filename in sorted(os.listdir(mesh_dir)):
+        if not filename.endswith(MESH_SUFFIX):
+            continue
+        city_name = filename[:-len(MESH_SUFFIX)]
+        output_path = os.path.join(mesh_dir, f"{city_name}{FEATURES_SUFFIX}")
+        if os.path.exists(output_path):
+            print(f"{city_name}: son_hex特征已存在，跳过")
+            continue
+        process_city(city_name, os.path.join(mesh_dir, filename),
+                     os.path.join(grid_dir, f"{city_name}_h3_grid.json"), output_path, restaurants)
+
+
+if __name__ == "__main__":
+    process_all_cities()
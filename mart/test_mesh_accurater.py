@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+
+from mesh_accurater import MeshAccurater
+
+HEX = h3.latlng_to_cell(31.8206, 117.2272, 7)
+
+
+def test_old_and_new_subdivision_formats_load_the_same_coverage():
+    children = h3.cell_to_children(HEX, 10)
+    new = {'subdivided_coverage': MeshAccurater.load_subdivided_coverage(
+        {'subdivided_hexes': children, 'target_resolution': 10}).to_dict()}
+
+    assert new['subdivided_coverage']['parents'] == [HEX]
+    assert new['subdivided_coverage']['count'] == 343
+    for data in (new, {'subdivided_hexes': children, 'target_resolution': 10}):
+        coverage = MeshAccurater.load_subdivided_coverage(data)
+        assert sorted(coverage) == sorted(children)
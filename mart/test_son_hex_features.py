@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import h3
+import numpy as np
+import pandas as pd
+
+import son_hex_features
+from hex_coverage import CompactCoverage
+
+FATHER = h3.latlng_to_cell(31.8206, 117.2272, 7)
+
+
+def test_father_hexes_from_every_mesh_format():
+    children = h3.cell_to_children(FATHER, 10)
+    assert son_hex_features.father_hexes_from_mesh({'hex_details': [{'original_hex': FATHER}]}) == [FATHER]
+    assert son_hex_features.father_hexes_from_mesh(
+        {'subdivided_coverage': CompactCoverage([FATHER], 10).to_dict()}) == [FATHER]
+    # mesh_accurater旧版本输出的展开列表
+    assert son_hex_features.father_hexes_from_mesh(
+        {'subdivided_hexes': children, 'target_resolution': 10}) == [FATHER]
+
+
+def test_features_count_pois_per_son_hex():
+    sons = sorted(h3.cell_to_children(FATHER, 10))
+    outside = h3.cell_to_center_child(h3.grid_ring(FATHER, 1)[0], 10)
+    pois = pd.DataFrame({
+        'h3_res10': [h3.str_to_int(h) for h in (sons[0], sons[0], sons[0], sons[5], outside)],
+        'big_type': ['餐饮服务', '餐饮服务', '购物服务', '餐饮服务', '餐饮服务'],
+        'mid_type': ['中餐厅', '快餐厅', '商场', '中餐厅', '中餐厅'],
+    })
+    lat, lng = h3.cell_to_latlng(sons[0])
+    restaurants = pd.DataFrame({'lat': [lat, lat], 'lng': [lng, lng], 'price': [40.0, 60.0]})
+
+    features = son_hex_features.build_son_hex_features('合肥市', [FATHER], pois, restaurants)
+    assert features['hex_id'].tolist() == sons
+    assert (features['father_hex_id'] == FATHER).all()
+    first = features.iloc[0]
+    assert (first['poi'], first['restaurant'], first['restaurant_type']) == (3, 2, 2)
+    assert (first['restaurant_中餐厅'], first['restaurant_快餐厅']) == (1, 1)
+    assert first['restaurant_avg_price'] == 50.0
+    assert features['poi'].sum() == 4 and np.isnan(features['restaurant_avg_price'].iloc[1:]).all()
+    np.testing.assert_allclose(features['poi_density'], features['poi'] / features['area'])